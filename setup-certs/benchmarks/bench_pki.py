@@ -0,0 +1,234 @@
+"""
+Benchmarks des chemins critiques de la PKI.
+
+Points d'entrée mesurés :
+  - KeyManager.create_keypair / create_rsa_keypair   (type et taille de clé)
+  - CertManager.create_server_certificate            (type de clé CA, nombre de SAN)
+  - CertManager.create_client_certificate            (type de clé CA)
+  - CertManager.save_certificate_pem
+  - ELKCertGenerator.generate_all                    (nombre de services, workers)
+
+Les résultats sont écrits en JSON pour comparer les runs dans le temps.
+
+Usage (depuis setup-certs/) :
+    python benchmarks/bench_pki.py --output pki.json
+    python benchmarks/bench_pki.py --quick
+    python benchmarks/bench_pki.py --only keygen,sign --repeat 20
+"""
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import io
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+import cryptography
+import yaml
+from generate_certs import ELKCertGenerator
+from utils.CertificateManager import CertManager
+from utils.KeyManager import KeyManager, generate_private_key
+
+# (key_type, key_size) mesurés ; key_size n'a d'effet que pour RSA
+KEY_PARAMS = [
+    ("rsa", 2048),
+    ("rsa", 3072),
+    ("rsa", 4096),
+    ("ecdsa-p256", 0),
+    ("ecdsa-p384", 0),
+    ("ed25519", 0),
+]
+QUICK_KEY_PARAMS = [("rsa", 2048), ("ecdsa-p256", 0), ("ed25519", 0)]
+SAN_COUNTS = [0, 10, 100]
+SERVICE_COUNTS = [1, 10, 50]
+GROUPS = ("keygen", "sign", "save", "generate_all")
+
+
+def measure(func, repeat: int, setup=None) -> dict:
+    """
+    Exécute func `repeat` fois (sorties console ignorées) et résume les durées.
+
+    setup, s'il est fourni, est appelé avant chaque mesure hors chronométrage
+    et son résultat est passé à func.
+    """
+    durations = []
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            arg = setup() if setup else None
+            start = time.perf_counter()
+            func(arg) if setup else func()
+            durations.append(time.perf_counter() - start)
+
+    return {
+        "repeat": repeat,
+        "min_ms": round(min(durations) * 1000, 3),
+        "median_ms": round(statistics.median(durations) * 1000, 3),
+        "mean_ms": round(statistics.fmean(durations) * 1000, 3),
+        "stdev_ms": round(statistics.stdev(durations) * 1000, 3) if repeat > 1 else 0.0,
+    }
+
+
+def label(key_type: str, key_size: int) -> str:
+    return f"rsa-{key_size}" if key_type == "rsa" else key_type
+
+
+def make_ca(workdir: Path, key_type: str, key_size: int) -> CertManager:
+    """CertManager prêt à signer, avec une CA du type demandé."""
+    with redirect_stdout(io.StringIO()):
+        ca_key = generate_private_key(key_type, key_size)
+        ca_manager = CertManager(cert_path=workdir / "ca", key_CA=ca_key, cert_CA=None)
+        ca_cert = ca_manager.create_ca_certificate(private_key=ca_key)
+    return CertManager(cert_path=workdir / "service", key_CA=ca_key, cert_CA=ca_cert)
+
+
+def bench_keygen(workdir: Path, key_params: list, repeat: int) -> list[dict]:
+    results = []
+    key_manager = KeyManager(key_dir=workdir / "keys")
+    for key_type, key_size in key_params:
+        # RSA 4096 est très lent : on limite le nombre de répétitions
+        runs = max(1, repeat // 4) if key_size >= 4096 else repeat
+        stats = measure(lambda: key_manager.create_keypair("bench", key_type=key_type, key_size=key_size), runs)
+        results.append({"entry_point": "KeyManager.create_keypair", "key": label(key_type, key_size), **stats})
+        print(f"   keygen  {label(key_type, key_size):12s} {stats['median_ms']:10.3f} ms")
+    return results
+
+
+def bench_sign(workdir: Path, key_params: list, repeat: int) -> list[dict]:
+    results = []
+    for ca_type, ca_size in key_params:
+        cert_manager = make_ca(workdir, ca_type, ca_size)
+        leaf_key = generate_private_key("ecdsa-p256")
+
+        for san_count in SAN_COUNTS:
+            dns_names = [f"node-{i}.es.local" for i in range(san_count)]
+            stats = measure(lambda: cert_manager.create_server_certificate(
+                server_private_key=leaf_key, common_name="elasticsearch", dns_names=dns_names
+            ), repeat)
+            results.append({
+                "entry_point": "CertManager.create_server_certificate",
+                "ca_key": label(ca_type, ca_size),
+                "san_count": san_count,
+                **stats,
+            })
+            print(f"   server  CA {label(ca_type, ca_size):12s} SAN={san_count:<4d} {stats['median_ms']:10.3f} ms")
+
+        stats = measure(lambda: cert_manager.create_client_certificate(
+            client_private_key=leaf_key, common_name="logstash"
+        ), repeat)
+        results.append({"entry_point": "CertManager.create_client_certificate", "ca_key": label(ca_type, ca_size), **stats})
+        print(f"   client  CA {label(ca_type, ca_size):12s}          {stats['median_ms']:10.3f} ms")
+    return results
+
+
+def bench_save(workdir: Path, repeat: int) -> list[dict]:
+    cert_manager = make_ca(workdir, "ecdsa-p256", 0)
+    with redirect_stdout(io.StringIO()):
+        cert = cert_manager.create_server_certificate(
+            server_private_key=generate_private_key("ecdsa-p256"), common_name="elasticsearch"
+        )
+    target = workdir / "save" / "cert.pem"
+    stats = measure(lambda: CertManager.save_certificate_pem(cert, target), repeat)
+    print(f"   save    {'':12s} {stats['median_ms']:10.3f} ms")
+    return [{"entry_point": "CertManager.save_certificate_pem", **stats}]
+
+
+def write_config(path: Path, service_count: int, key_type: str, key_size: int, workers: int) -> None:
+    services = {
+        f"es-node-{i:03d}": {
+            "type": "server" if i % 2 == 0 else "client",
+            "key_type": key_type,
+            "key_size": key_size or 2048,
+            "validity_days": 365,
+            "dns_names": [f"es-node-{i:03d}.local"],
+        }
+        for i in range(service_count)
+    }
+    config = {
+        "ca": {"common_name": "Bench-CA", "key_type": key_type, "key_size": key_size or 2048},
+        "generation": {"workers": workers},
+        "key_pool": {"enabled": False},
+        "services": services,
+    }
+    path.write_text(yaml.safe_dump(config), encoding="utf-8")
+
+
+def bench_generate_all(workdir: Path, key_params: list, service_counts: list, repeat: int) -> list[dict]:
+    results = []
+    runs = max(1, repeat // 5)
+    for key_type, key_size in key_params:
+        for service_count in service_counts:
+            for workers in (1, 0):
+                config_path = workdir / "bench_config.yaml"
+                write_config(config_path, service_count, key_type, key_size, workers)
+
+                def fresh_output():
+                    return Path(tempfile.mkdtemp(dir=workdir, prefix="out-"))
+
+                stats = measure(
+                    lambda output_dir: ELKCertGenerator(config_path=config_path, output_dir=output_dir).generate_all(),
+                    runs,
+                    setup=fresh_output
+                )
+                results.append({
+                    "entry_point": "ELKCertGenerator.generate_all",
+                    "key": label(key_type, key_size),
+                    "services": service_count,
+                    "workers": workers or "cpu",
+                    **stats,
+                })
+                print(f"   gen_all {label(key_type, key_size):12s} services={service_count:<4d} "
+                      f"workers={workers or 'cpu':<4} {stats['median_ms']:10.1f} ms")
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks de génération PKI")
+    parser.add_argument("--repeat", type=int, default=10, help="Répétitions par mesure")
+    parser.add_argument("--quick", action="store_true", help="Jeu réduit de paramètres")
+    parser.add_argument("--only", default=",".join(GROUPS), help=f"Groupes à exécuter ({', '.join(GROUPS)})")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    groups = set(args.only.split(","))
+    key_params = QUICK_KEY_PARAMS if args.quick else KEY_PARAMS
+    service_counts = SERVICE_COUNTS[:2] if args.quick else SERVICE_COUNTS
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "cryptography": cryptography.__version__,
+        "platform": platform.platform(),
+        "repeat": args.repeat,
+        "benchmarks": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="setup-certs-bench-") as tmp:
+        workdir = Path(tmp)
+        if "keygen" in groups:
+            print("🔑 Génération de clés")
+            results["benchmarks"] += bench_keygen(workdir, key_params, args.repeat)
+        if "sign" in groups:
+            print("✍️  Signature de certificats")
+            results["benchmarks"] += bench_sign(workdir, key_params, args.repeat)
+        if "save" in groups:
+            print("💾 Écriture PEM")
+            results["benchmarks"] += bench_save(workdir, args.repeat)
+        if "generate_all" in groups:
+            print("🏭 Génération complète")
+            results["benchmarks"] += bench_generate_all(workdir, key_params, service_counts, args.repeat)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Résultats écrits dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
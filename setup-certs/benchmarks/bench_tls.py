@@ -0,0 +1,236 @@
+"""
+Benchmark des handshakes TLS avec les certificats générés.
+
+Pour chaque combinaison (clé CA, clé des services), ELKCertGenerator produit
+une PKI dans un dossier temporaire ; un serveur `ssl` local (loopback) et un
+client mesurent :
+  - handshakes complets (nouvelle session à chaque connexion)
+  - handshakes repris (ticket de session TLS réutilisé)
+avec et sans mTLS (certificat client exigé par le serveur).
+
+Chaque mesure va de connect() à la réception du premier octet envoyé par le
+serveur après son handshake : le coût des deux côtés est inclus.
+
+Usage (depuis setup-certs/) :
+    python benchmarks/bench_tls.py --output tls.json
+    python benchmarks/bench_tls.py --quick --handshakes 100
+    python benchmarks/bench_tls.py --tls-version 1.2
+"""
+from contextlib import redirect_stdout
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import io
+import json
+import platform
+import socket
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_DIR))
+
+import yaml
+from generate_certs import ELKCertGenerator
+
+# (clé CA, clé des services) : (key_type, key_size), key_size ne compte que pour RSA
+KEY_PARAMS = [
+    (("rsa", 4096), ("rsa", 2048)),   # valeurs actuelles de certs_config.yaml
+    (("rsa", 2048), ("rsa", 2048)),
+    (("rsa", 4096), ("rsa", 3072)),
+    (("rsa", 4096), ("ecdsa-p256", 0)),
+    (("ecdsa-p256", 0), ("ecdsa-p256", 0)),
+    (("ecdsa-p384", 0), ("ecdsa-p384", 0)),
+    (("ed25519", 0), ("ed25519", 0)),
+]
+QUICK_KEY_PARAMS = [KEY_PARAMS[0], KEY_PARAMS[4]]
+TLS_VERSIONS = {"1.2": ssl.TLSVersion.TLSv1_2, "1.3": ssl.TLSVersion.TLSv1_3}
+
+
+def label(key_type: str, key_size: int) -> str:
+    return f"rsa-{key_size}" if key_type == "rsa" else key_type
+
+
+def generate_pki(workdir: Path, ca_key: tuple, leaf_key: tuple) -> Path:
+    """Génère CA + certificat serveur + certificat client avec ELKCertGenerator."""
+    leaf_type, leaf_size = leaf_key
+    leaf = {"key_type": leaf_type, "key_size": leaf_size or 2048, "validity_days": 30}
+    config = {
+        "ca": {"common_name": "Bench-TLS-CA", "key_type": ca_key[0], "key_size": ca_key[1] or 2048},
+        "generation": {"workers": 1},
+        "key_pool": {"enabled": False},
+        "services": {
+            "server": {"type": "server", "dns_names": ["localhost"], "ip_addresses": ["127.0.0.1"], **leaf},
+            "client": {"type": "client", **leaf},
+        },
+    }
+    config_path = workdir / "certs_config.yaml"
+    config_path.write_text(yaml.safe_dump(config), encoding="utf-8")
+    output_dir = workdir / "certs_output"
+    with redirect_stdout(io.StringIO()):
+        ELKCertGenerator(config_path=config_path, output_dir=output_dir, quiet=True).generate_all()
+    return output_dir
+
+
+def server_context(output_dir: Path, tls_version: ssl.TLSVersion, mtls: bool) -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.minimum_version = context.maximum_version = tls_version
+    context.load_cert_chain(output_dir / "server" / "server_cert.pem", output_dir / "server" / "keys" / "server_private.pem")
+    if mtls:
+        context.verify_mode = ssl.CERT_REQUIRED
+        context.load_verify_locations(output_dir / "ca" / "ca_cert.pem")
+    return context
+
+
+def client_context(output_dir: Path, tls_version: ssl.TLSVersion, mtls: bool) -> ssl.SSLContext:
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = context.maximum_version = tls_version
+    context.load_verify_locations(output_dir / "ca" / "ca_cert.pem")
+    if mtls:
+        context.load_cert_chain(output_dir / "client" / "client_cert.pem", output_dir / "client" / "keys" / "client_private.pem")
+    return context
+
+
+class LoopbackTLSServer:
+    """Serveur TLS minimal : handshake, un octet envoyé, fermeture."""
+
+    def __init__(self, context: ssl.SSLContext):
+        self.context = context
+        self.listener = socket.create_server(("127.0.0.1", 0))
+        self.port = self.listener.getsockname()[1]
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.serve, daemon=True)
+
+    def serve(self) -> None:
+        while not self.stopped.is_set():
+            try:
+                conn, _ = self.listener.accept()
+            except OSError:
+                return  # listener fermé
+            try:
+                with self.context.wrap_socket(conn, server_side=True) as tls:
+                    tls.sendall(b"x")
+            except (ssl.SSLError, OSError):
+                pass  # client parti avant la fin (arrêt du benchmark)
+
+    def __enter__(self) -> "LoopbackTLSServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stopped.set()
+        self.listener.close()
+        self.thread.join(timeout=5)
+
+
+def handshake(context: ssl.SSLContext, port: int, session: ssl.SSLSession | None = None) -> tuple[float, ssl.SSLSession, bool]:
+    """
+    Une connexion complète.
+
+    Returns:
+        Durée (secondes), session à réutiliser, session effectivement reprise
+    """
+    start = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        with context.wrap_socket(sock, server_hostname="localhost", session=session) as tls:
+            # En TLS 1.3, le ticket de session arrive avec les premières données
+            tls.recv(1)
+            duration = time.perf_counter() - start
+            return duration, tls.session, tls.session_reused
+
+
+def summarize(durations: list[float]) -> dict:
+    ordered = sorted(durations)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "handshakes": len(ordered),
+        "per_second": round(len(ordered) / sum(ordered), 1),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def bench_pair(output_dir: Path, tls_version: ssl.TLSVersion, mtls: bool, count: int) -> dict:
+    """Mesure les handshakes complets puis repris pour une PKI et un mode."""
+    client = client_context(output_dir, tls_version, mtls)
+    with LoopbackTLSServer(server_context(output_dir, tls_version, mtls)) as server:
+        # Échauffement (chargement des clés, caches OpenSSL)
+        _, session, _ = handshake(client, server.port)
+
+        full = [handshake(client, server.port)[0] for _ in range(count)]
+
+        resumed, not_resumed = [], 0
+        for _ in range(count):
+            duration, new_session, reused = handshake(client, server.port, session)
+            resumed.append(duration)
+            if reused:
+                session = new_session  # Ticket à usage unique en TLS 1.3
+            else:
+                not_resumed += 1
+
+    return {"full": summarize(full), "resumed": {**summarize(resumed), "not_resumed": not_resumed}}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark des handshakes TLS des certificats générés")
+    parser.add_argument("--handshakes", type=int, default=300, help="Handshakes mesurés par série")
+    parser.add_argument("--quick", action="store_true", help="Jeu réduit de combinaisons de clés")
+    parser.add_argument("--tls-version", choices=sorted(TLS_VERSIONS), default="1.3")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON de résultats")
+    args = parser.parse_args()
+
+    tls_version = TLS_VERSIONS[args.tls_version]
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "openssl": ssl.OPENSSL_VERSION,
+        "platform": platform.platform(),
+        "tls_version": args.tls_version,
+        "handshakes": args.handshakes,
+        "benchmarks": [],
+    }
+
+    print(f"🤝 Handshakes TLS {args.tls_version} sur loopback ({args.handshakes} par série)")
+    print(f"   {'CA':<12} {'SERVICES':<12} {'MODE':<5} {'COMPLET/s':>10} {'p50':>8} {'p99':>8} {'REPRIS/s':>10} {'p50':>8} {'p99':>8}")
+
+    with tempfile.TemporaryDirectory(prefix="setup-certs-bench-tls-") as tmp:
+        for index, (ca_key, leaf_key) in enumerate(QUICK_KEY_PARAMS if args.quick else KEY_PARAMS):
+            workdir = Path(tmp) / str(index)
+            workdir.mkdir()
+            output_dir = generate_pki(workdir, ca_key, leaf_key)
+
+            for mtls in (False, True):
+                stats = bench_pair(output_dir, tls_version, mtls, args.handshakes)
+                results["benchmarks"].append({
+                    "ca_key": label(*ca_key),
+                    "service_key": label(*leaf_key),
+                    "mtls": mtls,
+                    **stats,
+                })
+                full, resumed = stats["full"], stats["resumed"]
+                print(
+                    f"   {label(*ca_key):<12} {label(*leaf_key):<12} {'mTLS' if mtls else 'TLS':<5} "
+                    f"{full['per_second']:>10.1f} {full['p50_ms']:>8.3f} {full['p99_ms']:>8.3f} "
+                    f"{resumed['per_second']:>10.1f} {resumed['p50_ms']:>8.3f} {resumed['p99_ms']:>8.3f}"
+                )
+                if resumed["not_resumed"]:
+                    print(f"   ⚠️  {resumed['not_resumed']} connexions sans reprise de session")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Résultats écrits dans {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
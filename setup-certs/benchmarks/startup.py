@@ -0,0 +1,146 @@
+"""
+Benchmark de démarrage du conteneur setup-certs.
+
+Mesure le temps mural de `main.py` dans deux situations :
+  - cold : volume vide, la CA et tous les certificats sont générés
+  - noop : tout est à jour, le run doit s'arrêter sans travail
+
+et détaille les imports du run noop avec `python -X importtime`.
+
+Usage (depuis setup-certs/) :
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 20 --output startup.json
+    python benchmarks/startup.py --compare startup_baseline.json --max-regression 0.2
+"""
+from pathlib import Path
+import argparse
+import json
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_DIR = Path(__file__).resolve().parent.parent
+
+# Modules qu'un run sans travail ne doit pas importer
+HEAVY_MODULES = ("cryptography", "yaml")
+
+
+def run_main(workdir: Path, *extra_args: str) -> subprocess.CompletedProcess:
+    """Lance main.py avec workdir comme répertoire courant (chemins relatifs de la config)."""
+    return subprocess.run(
+        [sys.executable, *extra_args, str(PROJECT_DIR / "main.py")],
+        cwd=workdir,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+def timed_runs(workdir: Path, runs: int) -> list[float]:
+    durations = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_main(workdir)
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def parse_importtime(stderr: str, top: int) -> dict:
+    """
+    Agrège la sortie de -X importtime.
+
+    Returns:
+        Le temps cumulé total et les `top` modules de premier niveau les plus coûteux
+    """
+    modules = []
+    for line in stderr.splitlines():
+        # Format : "import time: <self> | <cumulé> | <indentation><module>"
+        parts = line.removeprefix("import time:").split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue  # En-tête ou sortie du script
+        name = parts[2][1:]
+        modules.append({
+            "module": name.strip(),
+            "depth": (len(name) - len(name.lstrip())) // 2,
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1]),
+        })
+
+    top_level = [module for module in modules if module["depth"] == 0]
+    top_level.sort(key=lambda module: module["cumulative_us"], reverse=True)
+    return {
+        "total_us": sum(module["cumulative_us"] for module in top_level),
+        "heavy_modules_loaded": sorted({
+            module["module"].split(".")[0] for module in modules
+            if module["module"].split(".")[0] in HEAVY_MODULES
+        }),
+        "top": [{k: v for k, v in module.items() if k != "depth"} for module in top_level[:top]],
+    }
+
+
+def summarize(durations: list[float]) -> dict:
+    ordered = sorted(durations)
+    return {
+        "runs": len(durations),
+        "min_ms": round(ordered[0] * 1000, 2),
+        "median_ms": round(statistics.median(ordered) * 1000, 2),
+        "p90_ms": round(ordered[int(0.9 * (len(ordered) - 1))] * 1000, 2),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de démarrage de setup-certs")
+    parser.add_argument("--runs", type=int, default=10, help="Nombre de runs noop mesurés")
+    parser.add_argument("--top", type=int, default=15, help="Modules affichés dans le détail des imports")
+    parser.add_argument("--output", type=Path, default=None, help="Fichier JSON de résultats")
+    parser.add_argument("--compare", type=Path, default=None, help="Résultats de référence (JSON)")
+    parser.add_argument("--max-regression", type=float, default=0.25,
+                        help="Régression tolérée sur la médiane noop (0.25 = +25%%)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="setup-certs-bench-") as tmp:
+        workdir = Path(tmp)
+        shutil.copy(PROJECT_DIR / "certs_config.yaml", workdir / "certs_config.yaml")
+
+        cold = timed_runs(workdir, 1)
+        noop = timed_runs(workdir, args.runs)
+        imports = parse_importtime(run_main(workdir, "-X", "importtime").stderr, args.top)
+
+    results = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cold": summarize(cold),
+        "noop": summarize(noop),
+        "noop_imports": imports,
+    }
+
+    print(f"🚀 Cold start : {results['cold']['median_ms']} ms")
+    print(f"💤 Noop       : médiane {results['noop']['median_ms']} ms, p90 {results['noop']['p90_ms']} ms ({args.runs} runs)")
+    print(f"📦 Imports noop : {imports['total_us'] / 1000:.1f} ms")
+    for module in imports["top"]:
+        print(f"   {module['cumulative_us'] / 1000:8.2f} ms  {module['module']}")
+    if imports["heavy_modules_loaded"]:
+        print(f"⚠️  Modules lourds chargés par un run noop : {', '.join(imports['heavy_modules_loaded'])}")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"💾 Résultats écrits dans {args.output}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        ratio = results["noop"]["median_ms"] / baseline["noop"]["median_ms"] - 1
+        print(f"📊 Noop vs référence : {ratio:+.1%}")
+        if ratio > args.max_regression or imports["heavy_modules_loaded"]:
+            print("❌ Régression du démarrage")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
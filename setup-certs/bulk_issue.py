@@ -0,0 +1,356 @@
+from cryptography import x509
+from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.serialization import pkcs12
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Iterator
+import csv
+import io
+import json
+import os
+import re
+import tarfile
+import time
+from utils.CertificateManager import signing_hash, leaf_key_usage
+from utils.KeyManager import PrivateKey, generate_private_key
+from utils.Inventory import CertInventory, inventory_row
+from utils.Revocation import crl_distribution_extensions
+from utils.atomic_io import OutputTransaction
+
+BUNDLE_FORMATS = ("pem", "p12", "archive")
+
+# Le nom sert de chemin (dossier, fichiers, membres de l'archive) : ni séparateur ni '..'
+AGENT_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9._-]*$")
+# Fichiers écrits à la racine du dossier de sortie
+RESERVED_NAMES = {"ca_cert.pem", "agents.tar.gz"}
+
+
+def read_agents(input_path: Path) -> Iterator[dict]:
+    """
+    Lit les identités des agents en flux depuis un CSV ou un NDJSON.
+
+    Champs : name (obligatoire), dns_names (liste, ou séparés par ';' en CSV),
+    key_type, validity_days.
+    """
+    with open(input_path, 'r', encoding='utf-8', newline='') as f:
+        if input_path.suffix in (".ndjson", ".jsonl"):
+            rows = (json.loads(line) for line in f if line.strip())
+        else:
+            rows = csv.DictReader(f)
+
+        for row in rows:
+            name = (row.get("name") or "").strip()
+            if not name:
+                raise ValueError(f"Agent sans 'name' dans {input_path}: {row}")
+            if not AGENT_NAME.match(name) or ".." in name or name in RESERVED_NAMES:
+                raise ValueError(
+                    f"Nom d'agent invalide dans {input_path}: {name!r} "
+                    f"(lettres, chiffres, '.', '_', '-', sans '..')"
+                )
+            dns_names = row.get("dns_names") or []
+            if isinstance(dns_names, str):
+                dns_names = [dns for dns in dns_names.split(";") if dns]
+            yield {
+                "name": name,
+                "dns_names": dns_names,
+                "key_type": row.get("key_type") or None,
+                "validity_days": int(row["validity_days"]) if row.get("validity_days") else None,
+            }
+
+
+class ClientCertTemplate:
+    """
+    Parties d'un certificat client communes à tous les agents.
+
+    Le nom de l'émetteur, l'AuthorityKeyIdentifier, le hachage de signature
+    et les extensions fixes sont calculés une seule fois à partir de la CA.
+    """
+
+    def __init__(
+        self,
+        ca_key: PrivateKey,
+        ca_cert: x509.Certificate,
+        organization: str = "ELK-DevOps",
+        country: str = "MG",
+        crl_urls: tuple[str, str] | None = None
+    ):
+        self.ca_key = ca_key
+        self.issuer = ca_cert.subject
+        self.organization = organization
+        self.country = country
+        self.hash_algorithm = signing_hash(ca_key)
+        self.authority_key_id = x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key())
+        self.basic_constraints = x509.BasicConstraints(ca=False, path_length=None)
+        self.extended_key_usage = x509.ExtendedKeyUsage([ExtendedKeyUsageOID.CLIENT_AUTH])
+        self.crl_extensions = crl_distribution_extensions(*crl_urls) if crl_urls else []
+        self._key_usages = {}
+
+    def key_usage(self, public_key) -> x509.KeyUsage:
+        """KeyUsage mise en cache par type de clé."""
+        key_class = type(public_key)
+        if key_class not in self._key_usages:
+            self._key_usages[key_class] = leaf_key_usage(public_key)
+        return self._key_usages[key_class]
+
+    def sign(self, private_key: PrivateKey, common_name: str, dns_names: list[str], validity_days: int) -> x509.Certificate:
+        """Construit et signe le certificat client d'un agent."""
+        public_key = private_key.public_key()
+        now = datetime.now(timezone.utc)
+        builder = (
+            x509.CertificateBuilder()
+            .subject_name(x509.Name([
+                x509.NameAttribute(NameOID.COUNTRY_NAME, self.country),
+                x509.NameAttribute(NameOID.ORGANIZATION_NAME, self.organization),
+                x509.NameAttribute(NameOID.COMMON_NAME, common_name),
+            ]))
+            .issuer_name(self.issuer)
+            .public_key(public_key)
+            .serial_number(x509.random_serial_number())
+            .not_valid_before(now)
+            .not_valid_after(now + timedelta(days=validity_days))
+            .add_extension(self.basic_constraints, critical=True)
+            .add_extension(self.key_usage(public_key), critical=True)
+            .add_extension(self.extended_key_usage, critical=False)
+            .add_extension(x509.SubjectKeyIdentifier.from_public_key(public_key), critical=False)
+            .add_extension(self.authority_key_id, critical=False)
+        )
+        for extension in self.crl_extensions:
+            builder = builder.add_extension(extension, critical=False)
+        if dns_names:
+            builder = builder.add_extension(
+                x509.SubjectAlternativeName([x509.DNSName(dns) for dns in dns_names]),
+                critical=False,
+            )
+        return builder.sign(self.ca_key, self.hash_algorithm)
+
+
+# Contexte propre à chaque processus worker
+_worker_context = None
+
+
+def _init_worker(ca_key_pem: bytes, ca_cert_pem: bytes, options: dict) -> None:
+    """Désérialise la CA et prépare le gabarit une seule fois par worker."""
+    global _worker_context
+    ca_key = serialization.load_pem_private_key(ca_key_pem, password=None)
+    ca_cert = x509.load_pem_x509_certificate(ca_cert_pem)
+    _worker_context = {
+        "template": ClientCertTemplate(ca_key, ca_cert, crl_urls=options["crl_urls"]),
+        "ca_cert": ca_cert,
+        **options,
+    }
+
+
+def _issue_batch(agents: list[dict]) -> list[tuple[str, dict[str, bytes], dict]]:
+    """
+    Émet les certificats d'un lot d'agents dans un worker.
+
+    Returns:
+        Pour chaque agent : (nom, fichiers du bundle -> contenu, entrée d'inventaire)
+    """
+    ctx = _worker_context
+    bundles = []
+
+    for agent in agents:
+        name = agent["name"]
+        private_key = generate_private_key(agent["key_type"] or ctx["key_type"], ctx["key_size"])
+        cert = ctx["template"].sign(
+            private_key, name, agent["dns_names"], agent["validity_days"] or ctx["validity_days"]
+        )
+
+        if ctx["bundle_format"] == "p12":
+            password = ctx["p12_password"]
+            encryption = (
+                serialization.BestAvailableEncryption(password.encode()) if password
+                else serialization.NoEncryption()
+            )
+            files = {
+                f"{name}.p12": pkcs12.serialize_key_and_certificates(
+                    name.encode(), private_key, cert, [ctx["ca_cert"]], encryption
+                )
+            }
+        else:
+            files = {
+                f"{name}/{name}_cert.pem": cert.public_bytes(serialization.Encoding.PEM),
+                f"{name}/{name}_private.pem": private_key.private_bytes(
+                    encoding=serialization.Encoding.PEM,
+                    format=serialization.PrivateFormat.PKCS8,
+                    encryption_algorithm=serialization.NoEncryption()
+                ),
+            }
+        bundles.append((name, files, inventory_row(cert)))
+
+    return bundles
+
+
+def _batches(agents: Iterator[dict], batch_size: int) -> Iterator[list[dict]]:
+    batch = []
+    for agent in agents:
+        batch.append(agent)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class BulkIssuer:
+    """
+    Émission en masse de certificats clients mTLS (agents Filebeat/Metricbeat).
+
+    Les identités sont lues en flux, signées par lots dans un pool de
+    processus (au plus 2 lots en vol par worker) et préparées au fil de l'eau (visibles au commit final) :
+    un bundle par agent (paire PEM ou PKCS#12) ou une archive unique.
+
+    Usage:
+        issuer = BulkIssuer(ca_key, ca_cert, output_dir=Path("./certs_output/agents"))
+        issuer.issue(read_agents(Path("agents.csv")))
+    """
+
+    def __init__(
+        self,
+        ca_key: PrivateKey,
+        ca_cert: x509.Certificate,
+        output_dir: Path,
+        bundle_format: str = "pem",
+        key_type: str = "ecdsa-p256",
+        key_size: int = 2048,
+        validity_days: int = 365,
+        workers: int | None = None,
+        batch_size: int = 64,
+        p12_password: str | None = None,
+        allow_unencrypted_p12: bool = False,
+        crl_urls: tuple[str, str] | None = None,
+        inventory: CertInventory | None = None
+    ):
+        if bundle_format not in BUNDLE_FORMATS:
+            raise ValueError(f"Format de bundle inconnu: {bundle_format} (attendu: {', '.join(BUNDLE_FORMATS)})")
+        if bundle_format == "p12" and not p12_password:
+            # Un .p12 sans mot de passe contient la clé privée en clair
+            if not allow_unencrypted_p12:
+                raise ValueError("Bundles p12 sans mot de passe refusés : définissez BULK_P12_PASSWORD "
+                                 "(ou --p12-no-password pour les écrire en clair)")
+            print("⚠️  ATTENTION : BULK_P12_PASSWORD non défini, les bundles .p12 ne sont PAS chiffrés")
+        self.ca_key = ca_key
+        self.ca_cert = ca_cert
+        self.output_dir = output_dir
+        self.bundle_format = bundle_format
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.inventory = inventory
+        self.options = {
+            "bundle_format": bundle_format,
+            "key_type": key_type,
+            "key_size": key_size,
+            "validity_days": validity_days,
+            "p12_password": p12_password,
+            "crl_urls": crl_urls,
+        }
+
+    def issue(self, agents: Iterator[dict]) -> dict:
+        """
+        Émet les certificats de tous les agents.
+
+        Returns:
+            Statistiques : nombre de certificats, durée, certificats/seconde
+        """
+        ca_key_pem = self.ca_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        ca_cert_pem = self.ca_cert.public_bytes(serialization.Encoding.PEM)
+
+        # Tous les fichiers du run sont préparés puis mis en place en un seul commit :
+        # rien n'est visible dans le dossier de sortie si le run échoue. Les bundles
+        # partagent une seule arborescence de staging sous output_dir (pas un dossier
+        # de staging par agent), synchronisée en une fois au-delà de quelques centaines de fichiers
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        transaction = OutputTransaction(root=self.output_dir)
+        archive = None
+        if self.bundle_format == "archive":
+            archive = tarfile.open(transaction.stage_path(self.output_dir / "agents.tar.gz", 0o600), "w:gz")
+            self._add_to_archive(archive, "ca_cert.pem", ca_cert_pem, 0o644)
+        else:
+            transaction.write(self.output_dir / "ca_cert.pem", ca_cert_pem, 0o644)
+
+        print(f"\n🏭 Émission en masse : {self.workers} processus, lots de {self.batch_size}")
+        start = time.perf_counter()
+        issued = 0
+        rows = []
+
+        try:
+            with ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(ca_key_pem, ca_cert_pem, self.options)
+            ) as executor:
+                batches = _batches(agents, self.batch_size)
+                in_flight = set()
+
+                while True:
+                    # Fenêtre bornée : les identités restent lues en flux
+                    for batch in batches:
+                        in_flight.add(executor.submit(_issue_batch, batch))
+                        if len(in_flight) >= self.workers * 2:
+                            break
+                    if not in_flight:
+                        break
+
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        for name, files, row in future.result():
+                            self._write_bundle(files, archive, transaction)
+                            row["path"] = str(self._bundle_path(name))
+                            rows.append(row)
+                            issued += 1
+
+                    elapsed = time.perf_counter() - start
+                    print(f"   {issued} certificats ({issued / elapsed:.1f} certs/s)", end="\r")
+            if archive is not None:
+                archive.close()
+        except BaseException:
+            if archive is not None:
+                archive.close()
+            transaction.rollback()
+            raise
+
+        transaction.commit()
+        if self.inventory is not None:
+            # Enregistrés une fois les fichiers en place, en une seule transaction SQLite
+            self.inventory.add(rows)
+
+        elapsed = time.perf_counter() - start
+        stats = {
+            "issued": issued,
+            "seconds": round(elapsed, 3),
+            "certs_per_second": round(issued / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+        print(f"\n✅ {issued} certificats émis en {stats['seconds']}s ({stats['certs_per_second']} certs/s)")
+        print(f"   Sortie : {self.output_dir}")
+        return stats
+
+    def _bundle_path(self, name: str) -> Path:
+        """Emplacement du certificat d'un agent, tel qu'enregistré dans l'inventaire."""
+        if self.bundle_format == "archive":
+            return self.output_dir / "agents.tar.gz" / name / f"{name}_cert.pem"
+        if self.bundle_format == "p12":
+            return self.output_dir / f"{name}.p12"
+        return self.output_dir / name / f"{name}_cert.pem"
+
+    def _write_bundle(self, files: dict[str, bytes], archive: tarfile.TarFile | None, transaction: OutputTransaction) -> None:
+        for relative_path, data in files.items():
+            mode = 0o600 if relative_path.endswith(("_private.pem", ".p12")) else 0o644
+            if archive is not None:
+                self._add_to_archive(archive, relative_path, data, mode)
+            else:
+                transaction.write(self.output_dir / relative_path, data, mode)
+
+    @staticmethod
+    def _add_to_archive(archive: tarfile.TarFile, name: str, data: bytes, mode: int) -> None:
+        info = tarfile.TarInfo(name)
+        info.size = len(data)
+        info.mode = mode
+        info.mtime = int(time.time())
+        archive.addfile(info, io.BytesIO(data))
@@ -1,9 +1,96 @@
 from pathlib import Path
-import shutil
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING
 import os
-from utils.CertificateManager import CertManager
-from utils.KeyManager import KeyManager
+import stat
+from utils.Manifest import CertManifest, certificate_record, service_config_hash
 from utils.load_config import ConfigLoader
+from utils.atomic_io import atomic_write_bytes, remove_stale_staging, OutputTransaction
+from utils.Timing import PhaseTimer
+
+# cryptography et les modules qui en dépendent (CertManager, KeyManager,
+# KeyPool, CertVerifier), ainsi que le pool de processus, sont importés dans
+# les méthodes qui génèrent ou vérifient réellement un certificat : un run
+# sans travail ne les charge pas.
+if TYPE_CHECKING:
+    from utils.CertVerifier import VerificationResult
+    from utils.KeyPool import KeyPool
+
+
+# Propriétaire et permissions des fichiers générés (utilisateur elasticsearch
+# des images officielles ; Logstash et Kibana tournent avec le même UID)
+ES_UID = 1000
+ES_GID = 1000
+DIR_MODE = 0o755
+PUBLIC_FILE_MODE = 0o644   # Certificats et clés publiques
+PRIVATE_FILE_MODE = 0o640  # Clés privées et bundles : propriétaire + groupe elasticsearch
+
+
+def is_private_file(filename: str) -> bool:
+    """Indique si un fichier contient une clé privée."""
+    return "private" in filename.lower() or filename.endswith((".p12", ".tar.gz"))
+
+
+# Générateur propre à chaque processus worker (initialisé une seule fois par worker)
+_worker_generator = None
+
+
+def _init_worker(
+    config_path: Path,
+    output_dir: Path,
+    ca_key_pem: bytes,
+    ca_cert_pem: bytes,
+    quiet: bool = False,
+    transaction_id: str | None = None
+) -> None:
+    """
+    Initialise un processus worker avec la CA en lecture seule.
+    
+    La CA est transmise sous forme PEM (les objets cryptography ne sont pas
+    picklables) et désérialisée une seule fois par worker. Avec transaction_id,
+    les fichiers sont préparés pour la transaction du processus principal,
+    qui les met en place à son commit.
+    """
+    from cryptography import x509
+    from cryptography.hazmat.primitives import serialization
+    from multiprocessing import util
+    import sys
+    
+    if quiet:
+        devnull = open(os.devnull, "w")
+        sys.stdout = devnull
+        
+        def restore_stdout():
+            sys.stdout = sys.__stdout__
+            devnull.close()
+        
+        # Exécuté à l'arrêt du worker (qui sort par os._exit : atexit n'y est pas appelé)
+        util.Finalize(None, restore_stdout, exitpriority=0)
+    
+    global _worker_generator
+    _worker_generator = ELKCertGenerator(config_path=config_path, output_dir=output_dir, workers=1)
+    _worker_generator.ca_private_key = serialization.load_pem_private_key(ca_key_pem, password=None)
+    _worker_generator.ca_certificate = x509.load_pem_x509_certificate(ca_cert_pem)
+    if transaction_id is not None:
+        _worker_generator.transaction = OutputTransaction(transaction_id, root=output_dir)
+
+
+def _generate_service_in_worker(
+    service_name: str,
+    service_config: dict,
+    force: bool
+) -> tuple[dict | None, list[dict], list[tuple[Path, Path]]]:
+    """
+    Génère le certificat d'un service dans un processus worker.
+    
+    Returns:
+        L'entrée de manifest, les spans de chronométrage du worker et les
+        fichiers préparés pour la transaction du processus principal
+    """
+    record = _worker_generator.generate_service_certificate(service_name, service_config, force)
+    spans = [{**span, "worker": os.getpid()} for span in _worker_generator.timer.drain()]
+    transaction = _worker_generator.transaction
+    return record, spans, transaction.drain() if transaction is not None else []
 
 
 class ELKCertGenerator:
@@ -18,18 +105,77 @@ class ELKCertGenerator:
         generator.generate_all()
     """
     
-    def __init__(self, config_path: Path, output_dir: Path):
+    def __init__(self, config_path: Path, output_dir: Path, workers: int | None = None, quiet: bool = False):
         """
         Initialise le générateur.
         
         Args:
             config_path: Chemin vers certs_config.yaml
             output_dir: Dossier de sortie pour tous les certificats
+            workers: Nombre de processus pour générer les services
+                     (None = valeur de generation.workers dans la config,
+                     0 = un par CPU, 1 = séquentiel)
+            quiet: Supprime l'affichage étape par étape de generate_all
         """
-        self.config_loader = ConfigLoader(config_path)
+        self.config_path = config_path
         self.output_dir = output_dir
+        self.quiet = quiet
+        # Durée de chaque phase (rapport JSON via timer.write_report)
+        self.timer = PhaseTimer()
+        # Configuration validée mise en cache sous le hash du fichier (partagée avec les workers)
+        with self.timer.span("config"):
+            self.config_loader = ConfigLoader(config_path, cache_dir=self.output_dir / ".state" / "config_cache")
+        if workers is None:
+            workers = self.config_loader.get_generation_config().get('workers', 1)
+        self.workers = workers or os.cpu_count() or 1
+        
+        # Pool de clés pré-générées (optionnel, créé au premier usage)
+        self.key_pool_config = self.config_loader.get_key_pool_config()
+        self._key_pool = None
         self.ca_private_key = None
         self.ca_certificate = None
+        # Transaction d'écriture du run en cours (None = écriture atomique fichier par fichier)
+        self.transaction = None
+        
+        # Manifest des certificats émis (régénération incrémentale)
+        self.manifest_path = self.output_dir / ".state" / "manifest.json"
+        renew_before_days = self.config_loader.get_renewal_config().get('renew_before_days', 30)
+        self.renew_before = timedelta(days=renew_before_days)
+        
+        # Inventaire SQLite des certificats émis (requêtes sans lire de PEM)
+        self.inventory_path = self.output_dir / ".state" / "inventory.db"
+        
+        # Révocation : index des certificats révoqués et CRL publiées dans ca/crl/
+        self.revocation_config = self.config_loader.get_revocation_config()
+        self.revocation_path = self.output_dir / ".state" / "revocation.db"
+        self.crl_dir = self.output_dir / "ca" / "crl"
+        self.crl_urls = None
+        if self.revocation_config.get('crl_url'):
+            from utils.Revocation import FULL_CRL_NAME, DELTA_CRL_NAME
+            base_url = self.revocation_config['crl_url'].rstrip('/')
+            self.crl_urls = (f"{base_url}/{FULL_CRL_NAME}", f"{base_url}/{DELTA_CRL_NAME}")
+    
+    @staticmethod
+    def is_up_to_date(config_path: Path, output_dir: Path) -> bool:
+        """
+        Indique, sans parser la configuration ni lire de PEM, si le dernier
+        run couvre encore l'état actuel (voir CertManifest.is_up_to_date).
+        """
+        manifest_path = output_dir / ".state" / "manifest.json"
+        if not manifest_path.exists() or not config_path.exists():
+            return False
+        return CertManifest.load(manifest_path).is_up_to_date(config_path, output_dir)
+    
+    @property
+    def key_pool(self) -> "KeyPool | None":
+        """Pool de clés pré-générées, None si désactivé."""
+        if self._key_pool is None and self.key_pool_config.get('enabled', False):
+            from utils.KeyPool import KeyPool
+            self._key_pool = KeyPool(
+                pool_dir=Path(self.key_pool_config.get('path', './key_pool')),
+                depth=self.key_pool_config.get('depth', 2)
+            )
+        return self._key_pool
     
     def generate_or_load_ca(self) -> None:
         """
@@ -37,6 +183,9 @@ class ELKCertGenerator:
         
         Idempotence : Si la CA existe déjà, elle est chargée.
         """
+        from utils.CertificateManager import CertManager
+        from utils.KeyManager import KeyManager
+        
         ca_config = self.config_loader.get_ca_config()
         ca_path = self.output_dir / "ca"
         ca_key_dir = ca_path / "keys"
@@ -47,7 +196,7 @@ class ELKCertGenerator:
             print("♻️  CA existante détectée, chargement...")
             
             # Charger la clé privée existante (ne pas la régénérer !)
-            key_manager = KeyManager(key_dir=ca_key_dir)
+            key_manager = KeyManager(key_dir=ca_key_dir, key_pool=self.key_pool)
             ca_key_file = ca_key_dir / "ca_private.pem"
             
             if not ca_key_file.exists():
@@ -73,12 +222,15 @@ class ELKCertGenerator:
         print("\n🔑 Génération de la CA...")
         print(f"   Common Name: {ca_config.get('common_name', 'ELK-Root-CA')}")
         print(f"   Validité: {ca_config.get('validity_days', 3650)} jours")
-        print(f"   Taille clé: {ca_config.get('key_size', 4096)} bits")
+        print(f"   Type clé: {ca_config.get('key_type', 'rsa')}")
+        if ca_config.get('key_type', 'rsa') == 'rsa':
+            print(f"   Taille clé: {ca_config.get('key_size', 4096)} bits")
         
         # Générer la clé CA
-        key_manager = KeyManager(key_dir=ca_key_dir)
-        ca_keypair = key_manager.create_rsa_keypair(
+        key_manager = KeyManager(key_dir=ca_key_dir, key_pool=self.key_pool, transaction=self.transaction)
+        ca_keypair = key_manager.create_keypair(
             key_name="ca",
+            key_type=ca_config.get('key_type', 'rsa'),
             key_size=ca_config.get('key_size', 4096)
         )
         self.ca_private_key = ca_keypair["private_key"]
@@ -100,185 +252,585 @@ class ELKCertGenerator:
         )
         
         # Sauvegarder
-        CertManager.save_certificate_pem(self.ca_certificate, ca_cert_file)
+        CertManager.save_certificate_pem(self.ca_certificate, ca_cert_file, self.transaction)
         
         print(f"✅ CA générée et sauvegardée dans {ca_path}")
     
     def generate_service_certificate(
         self,
         service_name: str,
-        service_config: dict
-    ) -> bool:
+        service_config: dict,
+        force: bool = False
+    ) -> dict | None:
         """
         Génère un certificat pour un service spécifique.
         
         Args:
             service_name: Nom du service (ex: "elasticsearch")
             service_config: Configuration du service
+            force: Réémet le certificat même s'il existe déjà
             
         Returns:
-            True si généré, False si skip (déjà existant)
+            L'entrée de manifest du certificat généré, None si skip (déjà existant)
         """
+        from utils.CertificateManager import CertManager
+        from utils.KeyManager import KeyManager
+        
         service_path = self.output_dir / service_name
         service_key_dir = service_path / "keys"
         service_cert_file = service_path / f"{service_name}_cert.pem"
         
         # Vérifier si existe déjà
-        if service_cert_file.exists():
+        if service_cert_file.exists() and not force:
             print(f"♻️  {service_name}: Certificat existant, skip")
-            return False
+            return None
         
         print(f"\n📋 Génération: {service_name}")
         print(f"   Type: {service_config.get('type', 'unknown')}")
         print(f"   Validité: {service_config.get('validity_days', 365)} jours")
+        print(f"   Type clé: {service_config.get('key_type', 'rsa')}")
         
         # Générer la clé du service
-        key_manager = KeyManager(key_dir=service_key_dir)
-        service_keypair = key_manager.create_rsa_keypair(
-            key_name=service_name,
-            key_size=service_config.get('key_size', 2048)
-        )
+        key_manager = KeyManager(key_dir=service_key_dir, key_pool=self.key_pool, transaction=self.transaction)
+        with self.timer.span("keygen", service=service_name):
+            service_keypair = key_manager.create_keypair(
+                key_name=service_name,
+                key_type=service_config.get('key_type', 'rsa'),
+                key_size=service_config.get('key_size', 2048)
+            )
         service_private_key = service_keypair["private_key"]
         
         # Créer le CertManager avec la CA
         cert_manager = CertManager(
             cert_path=service_path,
             key_CA=self.ca_private_key,
-            cert_CA=self.ca_certificate
+            cert_CA=self.ca_certificate,
+            crl_urls=self.crl_urls
         )
         
         # Générer le certificat selon le type
         service_type = service_config.get('type')
         
-        if service_type == "server":
-            service_cert = cert_manager.create_server_certificate(
-                server_private_key=service_private_key,
-                common_name=service_name,
-                dns_names=service_config.get('dns_names', []),
-                ip_addresses=service_config.get('ip_addresses', []),
-                validity_days=service_config.get('validity_days', 365)
-            )
-        elif service_type == "client":
-            service_cert = cert_manager.create_client_certificate(
-                client_private_key=service_private_key,
-                common_name=service_name,
-                validity_days=service_config.get('validity_days', 365)
-            )
-        else:
-            raise ValueError(f"Type de service inconnu: {service_type}")
-        
-        # Sauvegarder le certificat
-        CertManager.save_certificate_pem(service_cert, service_cert_file)
+        with self.timer.span("sign", service=service_name):
+            if service_type == "server":
+                service_cert = cert_manager.create_server_certificate(
+                    server_private_key=service_private_key,
+                    common_name=service_name,
+                    dns_names=service_config.get('dns_names', []),
+                    ip_addresses=service_config.get('ip_addresses', []),
+                    validity_days=service_config.get('validity_days', 365)
+                )
+            elif service_type == "client":
+                service_cert = cert_manager.create_client_certificate(
+                    client_private_key=service_private_key,
+                    common_name=service_name,
+                    validity_days=service_config.get('validity_days', 365)
+                )
+            else:
+                raise ValueError(f"Type de service inconnu: {service_type}")
         
-        # Copier ca_cert.pem dans le dossier du service
-        ca_cert_copy = service_path / "ca_cert.pem"
-        if not ca_cert_copy.exists():
-            ca_source = self.output_dir / "ca" / "ca_cert.pem"
-            shutil.copy(ca_source, ca_cert_copy)
-            print(f"   📋 ca_cert.pem copié pour vérification")
+        with self.timer.span("save", service=service_name):
+            # Sauvegarder le certificat
+            CertManager.save_certificate_pem(service_cert, service_cert_file, self.transaction)
+            
+            # Copier ca_cert.pem dans le dossier du service (toujours à jour avec la CA ;
+            # copié depuis la mémoire : dans une transaction, ca/ n'est écrit qu'au commit)
+            ca_cert_copy = service_path / "ca_cert.pem"
+            if force or not ca_cert_copy.exists():
+                from cryptography.hazmat.primitives import serialization
+                ca_pem = self.ca_certificate.public_bytes(serialization.Encoding.PEM)
+                if self.transaction is not None:
+                    self.transaction.write(ca_cert_copy, ca_pem)
+                else:
+                    atomic_write_bytes(ca_cert_copy, ca_pem)
+                print(f"   📋 ca_cert.pem copié pour vérification")
         
         print(f"✅ {service_name}: Certificat généré")
-        return True
+        return certificate_record(service_cert, service_config_hash(service_config))
     
-    def generate_all_services(self) -> None:
+    def generate_all_services(self, services_config: dict | None = None, force: bool = False) -> dict[str, dict]:
         """
-        Génère les certificats pour tous les services de la configuration.
+        Génère les certificats des services.
+        
+        Args:
+            services_config: Services à générer (tous ceux de la configuration par défaut)
+            force: Réémet les certificats même s'ils existent déjà
+            
+        Returns:
+            Les entrées de manifest des certificats générés (nom -> entrée)
         """
         print("\n" + "="*60)
         print("CERTIFICATS DES SERVICES")
         print("="*60)
         
-        services_config = self.config_loader.get_services_config()
+        # Parcours à la demande : seuls les services à générer sont conservés,
+        # les templates ne sont pas développés d'un bloc
+        services = self.config_loader.iter_services() if services_config is None else services_config.items()
+        
+        # Les services dont le certificat existe déjà ne sont pas envoyés aux workers
+        pending = {}
+        for service_name, service_config in services:
+            if force or not (self.output_dir / service_name / f"{service_name}_cert.pem").exists():
+                pending[service_name] = service_config
+            else:
+                print(f"♻️  {service_name}: Certificat existant, skip")
+        workers = min(self.workers, len(pending))
+        
+        if workers <= 1:
+            records = {}
+            for service_name, service_config in pending.items():
+                record = self.generate_service_certificate(service_name, service_config, force)
+                if record is not None:
+                    records[service_name] = record
+            return records
+        
+        print(f"⚡ Génération parallèle : {len(pending)} services sur {workers} processus")
+        return self.generate_services_parallel(pending, workers, force)
+    
+    def generate_services_parallel(self, services_config: dict, workers: int, force: bool = False) -> dict[str, dict]:
+        """
+        Génère les certificats des services dans un pool de processus.
+        
+        La génération des clés RSA est liée au CPU : chaque service est traité
+        dans son propre processus. La CA (clé + certificat) est transmise une
+        seule fois à chaque worker et n'est jamais modifiée.
+        
+        Args:
+            services_config: Services à générer (nom -> configuration)
+            workers: Nombre de processus
+            force: Réémet les certificats même s'ils existent déjà
+            
+        Returns:
+            Les entrées de manifest des certificats générés (nom -> entrée)
+        """
+        from concurrent.futures import ProcessPoolExecutor, as_completed
+        from cryptography.hazmat.primitives import serialization
+        
+        ca_key_pem = self.ca_private_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        )
+        ca_cert_pem = self.ca_certificate.public_bytes(serialization.Encoding.PEM)
+        
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(
+                self.config_path, self.output_dir, ca_key_pem, ca_cert_pem, self.quiet,
+                self.transaction.transaction_id if self.transaction is not None else None
+            )
+        ) as executor:
+            futures = {
+                executor.submit(_generate_service_in_worker, name, config, force): name
+                for name, config in services_config.items()
+            }
+            records = {}
+            for future in as_completed(futures):
+                # Propage la première erreur d'un worker
+                record, spans, staged = future.result()
+                self.timer.merge(spans)
+                if self.transaction is not None:
+                    self.transaction.adopt(staged)
+                if record is not None:
+                    records[futures[future]] = record
+        return records
+    
+    def plan_renewals(self, manifest: CertManifest) -> dict[str, str]:
+        """
+        Détermine les services à réémettre à partir du manifest.
+        
+        Un certificat est réémis si son fichier manque, si la configuration
+        effective du service a changé ou s'il entre dans la fenêtre de
+        renouvellement. Seuls les certificats absents du manifest (émis avant
+        son introduction) sont lus pour y être enregistrés.
+        
+        Args:
+            manifest: Manifest des certificats émis
+            
+        Returns:
+            Les services à réémettre (nom -> raison)
+        """
+        plan = {}
         
-        for service_name, service_config in services_config.items():
-            self.generate_service_certificate(service_name, service_config)
+        for service_name, service_config in self.config_loader.iter_services():
+            cert_file = self.output_dir / service_name / f"{service_name}_cert.pem"
+            config_hash = service_config_hash(service_config)
+            
+            if not cert_file.exists():
+                plan[service_name] = "certificat absent"
+                continue
+            
+            if service_name not in manifest.services:
+                # Certificat existant non suivi : on l'adopte tel quel
+                from cryptography import x509
+                cert = x509.load_pem_x509_certificate(cert_file.read_bytes())
+                manifest.services[service_name] = certificate_record(cert, config_hash)
+                print(f"📒 {service_name}: Certificat existant ajouté au manifest")
+            
+            reason = manifest.renewal_reason(service_name, config_hash, self.renew_before)
+            if reason is not None:
+                plan[service_name] = reason
+        
+        return plan
     
     def generate_all(self) -> None:
         """
         Génère tous les certificats : CA + services.
         
         Point d'entrée principal pour générer l'ensemble de l'infrastructure PKI.
+        Chaque phase est chronométrée (self.timer) ; en mode quiet, seule une
+        ligne de résultat est affichée.
         """
+        import contextlib
+        
+        with contextlib.ExitStack() as stack:
+            if self.quiet:
+                devnull = stack.enter_context(open(os.devnull, "w"))
+                stack.enter_context(contextlib.redirect_stdout(devnull))
+            with self.timer.span("generate_all"):
+                records = self._generate_all()
+        
+        total_ms = self.timer.summary()["generate_all"]["total_ms"]
+        if self.quiet:
+            print(f"✅ {len(records)} certificats (ré)émis en {total_ms:.0f} ms")
+        else:
+            self.timer.print_summary(parent="generate_all")
+    
+    def _generate_all(self) -> dict[str, dict]:
+        """Corps de generate_all. Returns: les entrées de manifest (ré)émises."""
         print("\n" + "🔐 GÉNÉRATION DES CERTIFICATS ELK ".center(60, "="))
         print()
         
         # Charger la configuration
         ca_config = self.config_loader.get_ca_config()
-        services_config = self.config_loader.get_services_config()
+        # Seuls les noms sont listés ici : les configurations des services
+        # (templates développés) ne sont construites que pour ceux à (ré)émettre
+        service_names = list(self.config_loader.iter_service_names())
         
         print(f"✅ Configuration chargée")
         print(f"   CA: {ca_config.get('common_name', 'ELK-Root-CA')}")
-        print(f"   Services: {', '.join(services_config.keys())}")
+        if len(service_names) <= 10:
+            print(f"   Services: {', '.join(service_names)}")
+        else:
+            print(f"   Services: {len(service_names)} (dont templates développés)")
+        
+        # Déterminer ce qui doit être (ré)émis
+        with self.timer.span("plan"):
+            manifest = CertManifest.load(self.manifest_path)
+            new_ca = not (self.output_dir / "ca" / "ca_cert.pem").exists()
+            if new_ca:
+                plan = {service_name: "nouvelle CA" for service_name in service_names}
+            else:
+                plan = self.plan_renewals(manifest)
+        
+        # Les services retirés de la configuration ne sont plus suivis
+        known_services = set(service_names)
+        manifest.services = {
+            service_name: record for service_name, record in manifest.services.items()
+            if service_name in known_services
+        }
+        
+        if not plan:
+            # Rien à faire : ni la CA ni aucun certificat n'est chargé
+            with self.timer.span("manifest"):
+                manifest.mark_up_to_date(self.config_path, self.renew_before)
+                manifest.save()
+            print(f"\n✅ Tous les certificats sont à jour (manifest: {self.manifest_path})")
+            with self.timer.span("fix_permissions"):
+                self.fix_permissions()
+            return {}
         
         # Générer/charger la CA
         print("\n" + "="*60)
         print("CERTIFICATE AUTHORITY")
         print("="*60)
         
-        self.generate_or_load_ca()
+        # CA et services sont écrits dans une seule transaction : aucun fichier
+        # n'est mis en place tant que tout n'est pas généré. Les renames du commit
+        # restent successifs (certificat puis clé, voir OutputTransaction)
+        remove_stale_staging(self.output_dir)
+        transaction = self.transaction = OutputTransaction(root=self.output_dir)
+        try:
+            with self.timer.span("ca"):
+                self.generate_or_load_ca()
+                manifest.ca = certificate_record(self.ca_certificate)
+            
+            # Générer les certificats des services
+            for service_name, reason in plan.items():
+                print(f"🔄 {service_name}: à (ré)émettre ({reason})")
+            planned_config = {
+                service_name: service_config
+                for service_name, service_config in self.config_loader.iter_services()
+                if service_name in plan
+            }
+            with self.timer.span("services", count=len(plan)):
+                records = self.generate_all_services(planned_config, force=True)
+        except BaseException:
+            transaction.rollback()
+            raise
+        finally:
+            self.transaction = None
+        
+        with self.timer.span("commit", files=len(transaction.staged)):
+            committed = transaction.commit()
+        print(f"\n💾 {committed} fichiers mis en place (commit atomique)")
+        with self.timer.span("manifest"):
+            manifest.services.update(records)
+            manifest.mark_up_to_date(self.config_path, self.renew_before)
+            manifest.save()
+        with self.timer.span("inventory"):
+            self.record_inventory(
+                [self.output_dir / "ca" / "ca_cert.pem"]
+                + [self.output_dir / service_name / f"{service_name}_cert.pem" for service_name in records]
+            )
         
-        # Générer les certificats des services
-        self.generate_all_services()
+        # Premières CRL, pour que les points de distribution des certificats répondent
+        if self.crl_urls is not None and not any(self.crl_dir.glob("*.crl")):
+            with self.timer.span("crl"):
+                self.publish_crls(full=True)
         
         # Corriger les permissions
-        self.fix_permissions()
+        with self.timer.span("fix_permissions"):
+            self.fix_permissions()
+        
+        # Récapitulatif (inclut la vérification des chaînes)
+        with self.timer.span("summary"):
+            self.display_summary({service_name: planned_config[service_name] for service_name in records})
+        
+        # Remplir le pool pour le prochain run
+        if self.key_pool is not None and self.key_pool_config.get('refill', False):
+            with self.timer.span("key_pool_refill"):
+                self.fill_key_pool()
+        
+        return records
+    
+    def key_pool_slots(self) -> set[tuple[str, int]]:
+        """Couples (key_type, key_size) utilisés par la CA et les services."""
+        ca_config = self.config_loader.get_ca_config()
+        slots = {(ca_config.get('key_type', 'rsa'), ca_config.get('key_size', 4096))}
+        for _, service_config in self.config_loader.iter_services():
+            slots.add((service_config.get('key_type', 'rsa'), service_config.get('key_size', 2048)))
+        return slots
+    
+    def fill_key_pool(self, depth: int | None = None) -> None:
+        """
+        Remplit le pool de clés pour tous les types/tailles de la configuration.
+        
+        Args:
+            depth: Nombre de clés à garder prêtes par type/taille
+                   (None = key_pool.depth de la configuration)
+        """
+        if self.key_pool is None:
+            raise ValueError("Le pool de clés est désactivé (key_pool.enabled: false).")
+        
+        print("\n" + "="*60)
+        print("POOL DE CLÉS")
+        print("="*60)
+        
+        for key_type, key_size in sorted(self.key_pool_slots()):
+            generated = self.key_pool.fill(key_type, key_size, depth)
+            available = self.key_pool.available(key_type, key_size)
+            print(f"🔑 {self.key_pool.slot_dir(key_type, key_size).name}: {available} clés prêtes (+{generated})")
+    
+    def record_inventory(self, cert_files: list[Path]) -> int:
+        """
+        Enregistre des certificats dans l'inventaire.
+        
+        Appelé avec les seuls certificats qui viennent d'être émis : le PEM
+        est encore dans le cache disque et l'inventaire reste à jour sans
+        jamais relire l'ensemble des dossiers.
+        """
+        from cryptography import x509
+        from utils.Inventory import CertInventory, inventory_row
+        
+        inventory = CertInventory(self.inventory_path)
+        try:
+            return inventory.add(
+                inventory_row(x509.load_pem_x509_certificate(cert_file.read_bytes()), cert_file)
+                for cert_file in cert_files
+            )
+        finally:
+            inventory.close()
+    
+    def rebuild_inventory(self) -> int:
+        """
+        Reconstruit l'inventaire à partir des PEM présents dans output_dir
+        (CA, services, agents émis en masse au format PEM).
+        """
+        from utils.Inventory import CertInventory
+        
+        CertInventory(self.inventory_path).clear()
+        # Les copies de ca_cert.pem dans chaque dossier de service ne sont pas des certificats distincts
+        cert_files = [
+            cert_file
+            for pattern in ("*/*_cert.pem", "*/*/*_cert.pem")
+            for cert_file in sorted(self.output_dir.glob(pattern))
+            if cert_file.name != "ca_cert.pem"
+        ]
+        count = self.record_inventory([self.output_dir / "ca" / "ca_cert.pem", *cert_files])
+        print(f"📇 Inventaire reconstruit : {count} certificats ({self.inventory_path})")
+        return count
+    
+    def revoke(self, target: str, reason: str = "unspecified", publish: bool = True) -> bool:
+        """
+        Révoque un certificat.
+        
+        Args:
+            target: Nom d'un service, chemin d'un certificat PEM (ex: un agent)
+                    ou numéro de série en hexadécimal
+            reason: Raison RFC 5280 (keyCompromise, superseded, cessationOfOperation...)
+            publish: Publie aussitôt une nouvelle delta CRL
+            
+        Returns:
+            False si le certificat était déjà révoqué
+        """
+        from cryptography import x509
+        from utils.Revocation import RevocationStore
+        
+        manifest = CertManifest.load(self.manifest_path)
+        not_valid_after = subject = None
+        
+        if target in manifest.services:
+            record = manifest.services[target]
+            serial = int(record["serial"], 16)
+            not_valid_after = datetime.fromisoformat(record["not_valid_after"])
+            subject = target
+        elif Path(target).is_file():
+            cert = x509.load_pem_x509_certificate(Path(target).read_bytes())
+            serial = cert.serial_number
+            not_valid_after = cert.not_valid_after_utc
+            subject = cert.subject.rfc4514_string()
+        else:
+            try:
+                serial = int(target, 16)
+            except ValueError:
+                raise KeyError(f"Ni service connu, ni fichier, ni numéro de série: {target}")
+        
+        store = RevocationStore(self.revocation_path)
+        try:
+            revoked = store.revoke(serial, reason, not_valid_after, subject)
+        finally:
+            store.close()
+        
+        if not revoked:
+            print(f"ℹ️  {target}: déjà révoqué (série {serial:x})")
+            return False
+        print(f"🚫 {target}: révoqué (série {serial:x}, raison {reason})")
         
-        # Récapitulatif
-        self.display_summary()
+        if target in manifest.services:
+            # Le service sera réémis au prochain run (le chemin rapide est invalidé)
+            manifest.services[target]["revoked"] = True
+            manifest.config_file_hash = None
+            manifest.save()
+            print(f"   Relancez la génération pour réémettre {target}")
+        
+        if publish:
+            self.publish_crls()
+        return True
     
-    def fix_permissions(self) -> None:
+    def publish_crls(self, full: bool | None = None) -> dict:
+        """
+        Publie la delta CRL (et la CRL complète si nécessaire) dans ca/crl/.
+        
+        Args:
+            full: Force (True) ou interdit (False) une CRL complète ;
+                  None = décision automatique (voir RevocationStore.publish)
+        """
+        from utils.Revocation import RevocationStore
+        
+        if self.ca_private_key is None:
+            self.generate_or_load_ca()
+        
+        store = RevocationStore(self.revocation_path)
+        try:
+            stats = store.publish(
+                self.ca_private_key,
+                self.ca_certificate,
+                self.crl_dir,
+                full=full,
+                full_validity=timedelta(days=self.revocation_config.get('full_crl_days', 7)),
+                delta_validity=timedelta(hours=self.revocation_config.get('delta_crl_hours', 24)),
+                max_delta_entries=self.revocation_config.get('max_delta_entries', 1000)
+            )
+        finally:
+            store.close()
+        
+        if stats["full"]:
+            print(f"📜 CRL complète n°{stats['crl_number']} : {stats['full_entries']} certificats révoqués")
+        print(f"📜 Delta CRL n°{stats['crl_number']} (base {stats['base_crl_number']}) : {stats['delta_entries']} entrées")
+        print(f"   Publiées dans {self.crl_dir}")
+        return stats
+    
+    def fix_permissions(self, verbose: bool = False) -> dict[str, int]:
         """
         Corrige les permissions des fichiers de certificats.
         
         Les fichiers de certificats doivent être lisibles par Elasticsearch (uid 1000).
-        Les clés privées doivent être lisibles uniquement par le propriétaire.
+        Les clés privées ne sont lisibles que par le propriétaire et son groupe.
+        
+        Un seul parcours (os.scandir) : chaque entrée est stat-ée une fois et
+        chmod/chown ne sont appelés que si le mode ou le propriétaire diffèrent.
+        
+        Args:
+            verbose: Affiche chaque fichier modifié
+            
+        Returns:
+            Compteurs : entrées parcourues, modes et propriétaires corrigés
         """
         print("\n" + "="*60)
         print("CORRECTION DES PERMISSIONS")
         print("="*60)
         
         # Vérifier si on tourne en root
-        if os.getuid() != 0:
+        is_root = os.getuid() == 0
+        if not is_root:
             print("⚠️  Avertissement : Ce script doit tourner en root pour changer le propriétaire des fichiers")
             print("   Les permissions seront définies mais le propriétaire restera inchangé")
         
+        stats = {"scanned": 0, "chmod": 0, "chown": 0}
+        
+        def apply(path: str, st: os.stat_result, mode: int) -> None:
+            stats["scanned"] += 1
+            changed = []
+            if stat.S_IMODE(st.st_mode) != mode:
+                os.chmod(path, mode)
+                stats["chmod"] += 1
+                changed.append(f"{mode:o}")
+            if is_root and (st.st_uid, st.st_gid) != (ES_UID, ES_GID):
+                os.chown(path, ES_UID, ES_GID)
+                stats["chown"] += 1
+                changed.append(f"{ES_UID}:{ES_GID}")
+            if verbose and changed:
+                print(f"✅ {os.path.relpath(path, self.output_dir)} ({', '.join(changed)})")
+        
         try:
-            # Parcourir tous les fichiers dans output_dir
-            for root, dirs, files in os.walk(self.output_dir):
-                root_path = Path(root)
-                
-                # Permissions pour les dossiers: 755 (rwxr-xr-x)
-                os.chmod(root_path, 0o755)
-                
-                # Changer le propriétaire pour Elasticsearch (UID 1000, GID 1000)
-                if os.getuid() == 0:
-                    os.chown(root_path, 1000, 1000)
-                
-                for file in files:
-                    file_path = root_path / file
-                    
-                    if "private" in file.lower() or file_path.parent.name == "keys":
-                        # Clés privées: 644 (rw-r--r--) pour permettre la lecture par Elasticsearch
-                        os.chmod(file_path, 0o644)
-                        print(f"✅ Permissions clé privée  : {file_path.relative_to(self.output_dir)} (644)")
-                    else:
-                        # Certificats publics: 644 (rw-r--r--)
-                        os.chmod(file_path, 0o644)
-                        print(f"✅ Permissions certificat : {file_path.relative_to(self.output_dir)} (644)")
-                    
-                    # Changer le propriétaire pour Elasticsearch (UID 1000, GID 1000)
-                    if os.getuid() == 0:
-                        os.chown(file_path, 1000, 1000)
+            root = os.fspath(self.output_dir)
+            apply(root, os.stat(root), DIR_MODE)
+            stack = [root]
             
-            if os.getuid() == 0:
-                print(f"\n✅ Permissions et propriétaire corrigés pour tous les fichiers")
-                print(f"   Propriétaire: elasticsearch (UID 1000, GID 1000)")
+            while stack:
+                with os.scandir(stack.pop()) as entries:
+                    for entry in entries:
+                        st = entry.stat(follow_symlinks=False)
+                        if stat.S_ISDIR(st.st_mode):
+                            apply(entry.path, st, DIR_MODE)
+                            stack.append(entry.path)
+                        elif stat.S_ISREG(st.st_mode):
+                            apply(entry.path, st, PRIVATE_FILE_MODE if is_private_file(entry.name) else PUBLIC_FILE_MODE)
+            
+            print(f"✅ {stats['scanned']} entrées vérifiées : {stats['chmod']} modes corrigés, {stats['chown']} propriétaires corrigés")
+            print(f"   Clés privées: {PRIVATE_FILE_MODE:o}, certificats: {PUBLIC_FILE_MODE:o}, dossiers: {DIR_MODE:o}")
+            if is_root:
+                print(f"   Propriétaire: elasticsearch (UID {ES_UID}, GID {ES_GID})")
             else:
-                print(f"\n✅ Permissions corrigées (propriétaire inchangé)")
+                print(f"   Propriétaire inchangé")
             
         except Exception as e:
             print(f"❌ Erreur lors de la correction des permissions : {e}")
             raise
+        
+        return stats
     
     def verify_certificate_chain(self, service_name: str) -> bool:
         """
@@ -290,54 +842,65 @@ class ELKCertGenerator:
         Returns:
             True si valide, False sinon
         """
-        import subprocess
+        for name, service_config in self.config_loader.iter_services():
+            if name == service_name:
+                results = self.verify_all_certificates({service_name: service_config})
+                return results[0].valid
+        raise KeyError(f"Service inconnu: {service_name}")
+    
+    def verify_all_certificates(self, services_config: dict | None = None) -> list["VerificationResult"]:
+        """
+        Vérifie tous les certificats des services en une seule passe, sans openssl.
         
-        ca_cert = self.output_dir / "ca" / "ca_cert.pem"
-        service_cert = self.output_dir / service_name / f"{service_name}_cert.pem"
+        La CA est chargée une fois ; chaque certificat est contrôlé (signature,
+        validité, EKU et SAN selon son type).
         
-        if not service_cert.exists():
-            print(f"⚠️  Certificat {service_name} introuvable")
-            return False
-        
-        try:
-            result = subprocess.run(
-                ["openssl", "verify", "-CAfile", str(ca_cert), str(service_cert)],
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
+        Args:
+            services_config: Services à vérifier (tous par défaut)
             
-            if result.returncode == 0:
-                print(f"✅ {service_name}: Chaîne de confiance valide")
-                return True
+        Returns:
+            Un VerificationResult par service
+        """
+        from cryptography import x509
+        from utils.CertVerifier import CertVerifier
+        
+        if services_config is None:
+            services_config = self.config_loader.iter_services()
+        
+        ca_cert = self.ca_certificate
+        if ca_cert is None:
+            ca_cert = x509.load_pem_x509_certificate((self.output_dir / "ca" / "ca_cert.pem").read_bytes())
+        
+        with self.timer.span("verify"):
+            results = CertVerifier(ca_cert).verify_all(self.output_dir, services_config)
+        
+        for result in results:
+            if result.valid:
+                print(f"✅ {result.service_name}: Chaîne de confiance valide")
             else:
-                print(f"❌ {service_name}: Erreur de validation")
-                print(f"   {result.stderr.strip()}")
-                return False
-                
-        except subprocess.TimeoutExpired:
-            print(f"⚠️  {service_name}: Timeout lors de la validation")
-            return False
-        except FileNotFoundError:
-            print(f"⚠️  openssl n'est pas installé (validation ignorée)")
-            return False
+                print(f"❌ {result.service_name}: Erreur de validation")
+                for error in result.errors:
+                    print(f"   {error}")
+        
+        return results
 
-    def display_summary(self) -> None:
+    def display_summary(self, issued_services: dict | None = None) -> None:
         """
         Affiche un récapitulatif de la génération.
+        
+        Args:
+            issued_services: Services à valider (tous par défaut)
         """
         print("\n" + "="*60)
         print("✅ GÉNÉRATION TERMINÉE")
         print("="*60 + "\n")
         
-        services_config = self.config_loader.get_services_config()
-        
         print(f"📁 Structure des certificats dans {self.output_dir}/")
         print(f"   ├── ca/")
         print(f"   │   ├── ca_cert.pem")
         print(f"   │   └── keys/ca_private.pem")
         
-        for service_name in services_config.keys():
+        for service_name in self.config_loader.iter_service_names():
             print(f"   ├── {service_name}/")
             print(f"   │   ├── {service_name}_cert.pem")
             print(f"   │   ├── ca_cert.pem (copie)")
@@ -345,8 +908,7 @@ class ELKCertGenerator:
         
         # Validation automatique
         print(f"\n🔍 Validation des certificats:")
-        for service_name in services_config.keys():
-            self.verify_certificate_chain(service_name)
+        self.verify_all_certificates(issued_services)
         
         print(f"\n💡 Commandes de vérification manuelles :")
         print(f"   # Vérifier le certificat Elasticsearch")
@@ -1,34 +1,196 @@
 from generate_certs import ELKCertGenerator
+from utils.Timing import PhaseTimer
 from pathlib import Path
+import argparse
+import os
 
-def main():
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Génération des certificats TLS de la stack ELK")
+    parser.add_argument("--quiet", action="store_true", help="N'affiche que le résultat de la génération")
+    parser.add_argument("--timings", type=Path, default=None, help="Écrit un rapport JSON de la durée des phases")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("generate", help="Génère la CA et les certificats des services (par défaut)")
+
+    fill_parser = subparsers.add_parser("fill-key-pool", help="Pré-génère des clés dans le pool")
+    fill_parser.add_argument("--depth", type=int, default=None,
+                             help="Clés à garder prêtes par type/taille (défaut: key_pool.depth)")
+
+    renew_parser = subparsers.add_parser("renew", help="Démon de renouvellement des certificats avant expiration")
+    renew_parser.add_argument("--once", action="store_true",
+                              help="Renouvelle les certificats arrivés à échéance puis s'arrête")
+
+    bulk_parser = subparsers.add_parser("bulk", help="Émission en masse de certificats clients pour les agents")
+    bulk_parser.add_argument("--input", type=Path, required=True,
+                             help="Identités des agents (.csv ou .ndjson)")
+    bulk_parser.add_argument("--output", type=Path, default=Path("./certs_output/agents"),
+                             help="Dossier de sortie (défaut: certs_output/agents)")
+    bulk_parser.add_argument("--format", choices=("pem", "p12", "archive"), default="pem",
+                             help="Bundle par agent (pem, p12) ou archive unique agents.tar.gz")
+    bulk_parser.add_argument("--key-type", default="ecdsa-p256", help="Type de clé par défaut des agents")
+    bulk_parser.add_argument("--key-size", type=int, default=2048, help="Taille des clés RSA")
+    bulk_parser.add_argument("--validity-days", type=int, default=365)
+    bulk_parser.add_argument("--workers", type=int, default=None, help="Processus (défaut: un par CPU)")
+    bulk_parser.add_argument("--batch-size", type=int, default=64, help="Agents par lot envoyé à un worker")
+    bulk_parser.add_argument("--p12-no-password", action="store_true",
+                             help="Autorise les bundles p12 non chiffrés quand BULK_P12_PASSWORD n'est pas défini")
+
+    revoke_parser = subparsers.add_parser("revoke", help="Révoque un certificat et publie une delta CRL")
+    revoke_parser.add_argument("target",
+                               help="Nom de service, chemin d'un certificat PEM ou numéro de série (hexadécimal)")
+    revoke_parser.add_argument("--reason", default="unspecified",
+                               help="Raison RFC 5280 : keyCompromise, superseded, cessationOfOperation...")
+    revoke_parser.add_argument("--no-publish", action="store_true", help="Ne publie pas de nouvelle CRL")
+
+    crl_parser = subparsers.add_parser("crl", help="Publie les CRL (delta, et complète si nécessaire)")
+    crl_parser.add_argument("--full", action="store_true", default=None, help="Force une CRL complète")
+
+    inventory_parser = subparsers.add_parser("inventory", help="Interroge l'inventaire des certificats émis")
+    # Options communes aux requêtes, acceptées après la sous-commande (inventory expiring --json)
+    query_options = argparse.ArgumentParser(add_help=False)
+    query_options.add_argument("--all", action="store_true", help="Inclut les certificats remplacés")
+    query_options.add_argument("--json", action="store_true", help="Sortie JSON")
+    inventory_subparsers = inventory_parser.add_subparsers(dest="inventory_command", required=True)
+    inventory_subparsers.add_parser("list", help="Tous les certificats", parents=[query_options])
+    expiring_parser = inventory_subparsers.add_parser("expiring", help="Certificats qui expirent bientôt",
+                                                      parents=[query_options])
+    expiring_parser.add_argument("--days", type=int, default=30)
+    host_parser = inventory_subparsers.add_parser("host", help="Certificats d'un hôte (CN ou SAN)",
+                                                  parents=[query_options])
+    host_parser.add_argument("host")
+    inventory_subparsers.add_parser("rebuild", help="Reconstruit l'inventaire depuis les PEM")
+
+    return parser.parse_args(argv)
+
+
+def show_inventory(rows: list[dict], as_json: bool = False) -> None:
+    """Affiche des entrées d'inventaire (tableau ou JSON)."""
+    if as_json:
+        import json
+        print(json.dumps(rows, indent=2))
+        return
+    if not rows:
+        print("ℹ️  Aucun certificat")
+        return
+    print(f"{'EXPIRATION':<12} {'TYPE':<7} {'CN':<24} {'CLÉ':<11} {'SÉRIE':<12} CHEMIN")
+    for row in rows:
+        print(
+            f"{row['not_valid_after'][:10]:<12} {row['cert_type']:<7} {row['common_name']:<24} "
+            f"{row['key_algorithm']:<11} {row['serial'][:12]:<12} {row['path']}"
+            + ("" if row['current'] else "  (remplacé)")
+        )
+    print(f"📇 {len(rows)} certificats")
+
+
+def main(argv=None):
     """Point d'entrée du script de génération."""
-    
+    args = parse_args(argv)
+
     # Configuration
     config_path = Path("./certs_config.yaml")
     output_dir = Path("./certs_output")
-    
+
+    # Chemin rapide : rien à (ré)émettre, on s'arrête avant tout import lourd
+    if args.command in (None, "generate"):
+        timer = PhaseTimer()
+        with timer.span("up_to_date_check"):
+            up_to_date = ELKCertGenerator.is_up_to_date(config_path, output_dir)
+        if up_to_date:
+            print(f"✅ Certificats à jour ({output_dir}), rien à faire")
+            if args.timings:
+                timer.write_report(args.timings)
+            return 0
+
+    # Requêtes d'inventaire : ni configuration ni PEM à charger
+    if args.command == "inventory" and args.inventory_command != "rebuild":
+        from datetime import timedelta
+        from utils.Inventory import CertInventory
+        inventory = CertInventory(output_dir / ".state" / "inventory.db")
+        try:
+            if args.inventory_command == "expiring":
+                rows = inventory.expiring(timedelta(days=args.days), include_superseded=args.all)
+            elif args.inventory_command == "host":
+                rows = inventory.for_host(args.host, include_superseded=args.all)
+            else:
+                rows = inventory.all(include_superseded=args.all)
+        finally:
+            inventory.close()
+        show_inventory(rows, args.json)
+        return 0
+
     try:
         # Créer le générateur
         generator = ELKCertGenerator(
             config_path=config_path,
-            output_dir=output_dir
+            output_dir=output_dir,
+            quiet=args.quiet
         )
-        
+
+        if args.command == "fill-key-pool":
+            generator.fill_key_pool(depth=args.depth)
+            return 0
+
+        if args.command == "renew":
+            from renew_daemon import CertRenewalDaemon
+            CertRenewalDaemon(generator).run(once=args.once)
+            return 0
+
+        if args.command == "inventory":
+            generator.rebuild_inventory()
+            return 0
+
+        if args.command == "bulk":
+            from bulk_issue import BulkIssuer, read_agents
+            from utils.Inventory import CertInventory
+            generator.generate_or_load_ca()
+            BulkIssuer(
+                ca_key=generator.ca_private_key,
+                ca_cert=generator.ca_certificate,
+                output_dir=args.output,
+                bundle_format=args.format,
+                key_type=args.key_type,
+                key_size=args.key_size,
+                validity_days=args.validity_days,
+                workers=args.workers,
+                batch_size=args.batch_size,
+                p12_password=os.getenv("BULK_P12_PASSWORD"),
+                allow_unencrypted_p12=args.p12_no_password,
+                crl_urls=generator.crl_urls,
+                inventory=CertInventory(generator.inventory_path)
+            ).issue(read_agents(args.input))
+            return 0
+
+        if args.command == "revoke":
+            generator.revoke(args.target, reason=args.reason, publish=not args.no_publish)
+            return 0
+
+        if args.command == "crl":
+            generator.publish_crls(full=args.full)
+            return 0
+
         # Générer tous les certificats
         generator.generate_all()
-        
+        if args.timings:
+            generator.timer.write_report(args.timings)
+            if not args.quiet:
+                print(f"⏱️  Rapport de durée écrit dans {args.timings}")
+
         return 0
-        
+
     except FileNotFoundError as e:
         print(f"❌ Erreur : {e}")
         print(f"   Assurez-vous que {config_path} existe.")
         return 1
-    
+
     except KeyError as e:
         print(f"❌ Configuration invalide : {e}")
         return 1
-    
+
+    except ValueError as e:
+        print(f"❌ Entrée invalide : {e}")
+        return 1
+
     except Exception as e:
         print(f"❌ Erreur inattendue : {e}")
         import traceback
@@ -38,4 +200,4 @@ def main():
 
 if __name__ == "__main__":
     import sys
-    sys.exit(main())
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,253 @@
+from datetime import datetime, timedelta, timezone
+import hashlib
+import heapq
+import signal
+import threading
+from generate_certs import ELKCertGenerator
+from utils.Manifest import CertManifest
+from utils.atomic_io import OutputTransaction, remove_stale_staging
+
+# Délai avant de réessayer après un réveil en échec (doublé à chaque échec, borné par max_sleep)
+RETRY_DELAY = 30
+
+
+class CertRenewalDaemon:
+    """
+    Renouvelle les certificats des services avant leur expiration.
+
+    Une seule file de priorité (heap) ordonnée sur la date de renouvellement
+    (not_valid_after - renew_before) : à chaque réveil, seules les échéances
+    arrivées sont retirées de la file, renouvelées puis replacées à leur
+    nouvelle date, sans rescanner les dossiers. La configuration n'est relue
+    que lorsque son hash change ; le plan est alors recalculé à partir du
+    manifest : les services retirés ne sont plus suivis, les services
+    ajoutés ou modifiés sont émis.
+
+    Clé et certificat d'un service sont préparés dans une OutputTransaction
+    puis mis en place par rename atomique, certificat avant clé (voir
+    OutputTransaction pour la fenêtre entre les deux renames) ; Elasticsearch
+    (file watcher SSL) recharge alors le nouveau certificat sans redémarrage.
+
+    Usage:
+        daemon = CertRenewalDaemon(generator)
+        daemon.run()
+    """
+
+    def __init__(self, generator: ELKCertGenerator, max_sleep: int = 3600):
+        """
+        Args:
+            generator: Générateur configuré (CA, services, manifest)
+            max_sleep: Durée maximale d'un sommeil en secondes
+                       (borne la dérive d'horloge après une mise en veille)
+        """
+        self.generator = generator
+        self.max_sleep = max_sleep
+        self.stop_event = threading.Event()
+        self.schedule: list[tuple[datetime, str]] = []
+        self.manifest: CertManifest | None = None
+        self.config_hash: str | None = None
+        # Services dont la validité est plus courte que la fenêtre de
+        # renouvellement (nom -> config_hash) : plus renouvelés tant que
+        # leur configuration ne change pas
+        self.short_lived: dict[str, str] = {}
+
+    def build_schedule(self, manifest: CertManifest) -> None:
+        """Construit la file des échéances à partir du manifest (services de la configuration)."""
+        self.schedule = []
+        service_names = set(self.generator.config_loader.iter_service_names())
+        for service_name, record in manifest.services.items():
+            if service_name in service_names and service_name not in self.short_lived:
+                self.schedule.append((self.due_date(record), service_name))
+        heapq.heapify(self.schedule)
+
+    def due_date(self, record: dict) -> datetime:
+        """Date à laquelle un certificat doit être renouvelé."""
+        return datetime.fromisoformat(record["not_valid_after"]) - self.generator.renew_before
+
+    def read_config_hash(self) -> str:
+        return hashlib.sha256(self.generator.config_path.read_bytes()).hexdigest()
+
+    def start(self) -> None:
+        """Synchronisation initiale : CA, certificats manquants ou obsolètes, manifest."""
+        self.generator.generate_all()
+        if self.generator.ca_private_key is None:
+            self.generator.generate_or_load_ca()
+
+        self.config_hash = self.read_config_hash()
+        self.manifest = CertManifest.load(self.generator.manifest_path)
+        self.build_schedule(self.manifest)
+
+        if self.manifest.ca and self.due_date(self.manifest.ca) <= datetime.now(timezone.utc):
+            print("⚠️  La CA arrive à expiration : régénérez-la (supprimez ca/) puis relancez setup")
+
+        print(f"\n⏰ Démon de renouvellement démarré ({len(self.schedule)} certificats suivis)")
+
+    def renew_due(self) -> list[str]:
+        """
+        Renouvelle les certificats arrivés à échéance (ou re-planifie si la
+        configuration a changé).
+
+        Returns:
+            Les services (ré)émis
+        """
+        config_hash = self.read_config_hash()
+        if config_hash != self.config_hash:
+            self.config_hash = config_hash
+            return self.replan()
+
+        now = datetime.now(timezone.utc)
+        due = []
+        while self.schedule and self.schedule[0][0] <= now:
+            due.append(heapq.heappop(self.schedule))
+        if not due:
+            return []
+
+        try:
+            return self.renew({service_name: "expiration proche" for _, service_name in due})
+        except BaseException:
+            # Les échéances restent dans la file pour le prochain essai
+            for entry in due:
+                heapq.heappush(self.schedule, entry)
+            raise
+
+    def replan(self) -> list[str]:
+        """
+        Relit la configuration et le manifest, puis (ré)émet les certificats
+        manquants, modifiés ou arrivés à échéance et reconstruit la file.
+
+        Returns:
+            Les services (ré)émis
+        """
+        generator = self.generator
+        previous_config = generator.config_loader.config
+        try:
+            generator.config_loader.load_config()  # Cache .state : le YAML n'est validé qu'une fois
+        except Exception as e:
+            generator.config_loader.config = previous_config
+            print(f"⚠️  Configuration invalide, la précédente est conservée : {e}")
+        else:
+            renew_before_days = generator.config_loader.get_renewal_config().get('renew_before_days', 30)
+            generator.renew_before = timedelta(days=renew_before_days)
+        self.manifest = CertManifest.load(generator.manifest_path)
+
+        plan = {
+            service_name: reason for service_name, reason in generator.plan_renewals(self.manifest).items()
+            if not (reason == "expiration proche"
+                    and self.short_lived.get(service_name) == self.manifest.services[service_name].get("config_hash"))
+        }
+
+        # Les services retirés de la configuration ne sont plus suivis
+        service_names = set(generator.config_loader.iter_service_names())
+        self.manifest.services = {
+            service_name: record for service_name, record in self.manifest.services.items()
+            if service_name in service_names
+        }
+        self.short_lived = {
+            service_name: config_hash for service_name, config_hash in self.short_lived.items()
+            if service_name in service_names
+        }
+
+        renewed = self.renew(plan)
+        self.build_schedule(self.manifest)
+        return renewed
+
+    def renew(self, plan: dict[str, str]) -> list[str]:
+        """
+        (Ré)émet les services du plan dans une transaction et replace leurs
+        nouvelles échéances dans la file.
+
+        Args:
+            plan: Services à (ré)émettre (nom -> raison)
+
+        Returns:
+            Les services (ré)émis
+        """
+        generator = self.generator
+        manifest = self.manifest
+        now = datetime.now(timezone.utc)
+
+        records = {}
+        if plan:
+            for service_name, reason in plan.items():
+                print(f"🔄 {service_name}: renouvellement ({reason})")
+            planned_config = {
+                service_name: service_config
+                for service_name, service_config in generator.config_loader.iter_services()
+                if service_name in plan
+            }
+            remove_stale_staging(generator.output_dir)
+            transaction = generator.transaction = OutputTransaction(root=generator.output_dir)
+            try:
+                records = generator.generate_all_services(planned_config, force=True)
+            except BaseException:
+                transaction.rollback()
+                raise
+            finally:
+                generator.transaction = None
+            transaction.commit()
+
+        for service_name, record in records.items():
+            self.short_lived.pop(service_name, None)
+            next_due = self.due_date(record)
+            if next_due <= now:
+                # validity_days <= renew_before_days : on renouvellerait en boucle
+                print(f"⚠️  {service_name}: validité plus courte que la fenêtre de renouvellement, plus suivi")
+                self.short_lived[service_name] = record.get("config_hash")
+            else:
+                heapq.heappush(self.schedule, (next_due, service_name))
+
+        manifest.services.update(records)
+        manifest.mark_up_to_date(generator.config_path, generator.renew_before)
+        manifest.save()
+        if records:
+            generator.record_inventory([
+                generator.output_dir / service_name / f"{service_name}_cert.pem"
+                for service_name in records
+            ])
+            generator.fix_permissions()
+        return list(records)
+
+    def run(self, once: bool = False) -> None:
+        """
+        Boucle principale du démon.
+
+        Une erreur (chargement de la CA, génération, écriture, commit) est
+        journalisée et le réveil est réessayé après un délai croissant ;
+        avec once, elle est propagée.
+
+        Args:
+            once: Traite les échéances dues puis s'arrête
+        """
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: self.stop_event.set())
+
+        announced = None
+        failures = 0
+        while not self.stop_event.is_set():
+            try:
+                if self.manifest is None:
+                    self.start()
+                self.renew_due()
+            except Exception as e:
+                if once:
+                    raise
+                failures += 1
+                delay = min(RETRY_DELAY * 2 ** (failures - 1), self.max_sleep)
+                print(f"❌ Échec du renouvellement ({type(e).__name__}: {e}), nouvel essai dans {delay}s")
+                self.stop_event.wait(delay)
+                continue
+            failures = 0
+            if once:
+                break
+
+            # File vide : le prochain réveil (max_sleep) vérifie la configuration
+            wait = self.max_sleep
+            if self.schedule:
+                next_due, service_name = self.schedule[0]
+                if announced != self.schedule[0]:
+                    print(f"💤 Prochain renouvellement: {service_name} le {next_due:%Y-%m-%d %H:%M} UTC")
+                    announced = self.schedule[0]
+                wait = (next_due - datetime.now(timezone.utc)).total_seconds()
+            self.stop_event.wait(min(max(wait, 0), self.max_sleep))
+
+        print("👋 Démon de renouvellement arrêté")
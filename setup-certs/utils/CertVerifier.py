@@ -0,0 +1,148 @@
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.x509.oid import ExtendedKeyUsageOID
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable
+from dataclasses import dataclass, field
+import ipaddress
+
+# EKU attendue selon le type de service (certs_config.yaml)
+EXPECTED_EKU = {
+    "server": ExtendedKeyUsageOID.SERVER_AUTH,
+    "client": ExtendedKeyUsageOID.CLIENT_AUTH,
+}
+# Noms affichés dans les erreurs
+EKU_NAMES = {
+    ExtendedKeyUsageOID.SERVER_AUTH: "serverAuth",
+    ExtendedKeyUsageOID.CLIENT_AUTH: "clientAuth",
+}
+
+
+@dataclass
+class VerificationResult:
+    """Résultat de la vérification d'un certificat de service."""
+    service_name: str
+    valid: bool
+    errors: list[str] = field(default_factory=list)
+    not_valid_after: datetime | None = None
+
+
+@dataclass
+class CertVerifier:
+    """
+    Vérifie en mémoire les certificats des services contre la CA.
+
+    Remplace `openssl verify` : la CA est chargée une seule fois et chaque
+    certificat est vérifié sans processus externe (signature, émetteur,
+    validité, BasicConstraints, EKU et SAN selon le type de service).
+    """
+    ca_cert: x509.Certificate
+
+    def verify(
+        self,
+        service_name: str,
+        cert: x509.Certificate,
+        service_config: dict,
+        now: datetime | None = None
+    ) -> VerificationResult:
+        """
+        Vérifie un certificat de service.
+
+        Args:
+            service_name: Nom du service (CN attendu)
+            cert: Certificat à vérifier
+            service_config: Configuration du service (type, dns_names, ip_addresses)
+            now: Date de référence (maintenant par défaut)
+
+        Returns:
+            Un VerificationResult listant toutes les erreurs trouvées
+        """
+        now = now or datetime.now(timezone.utc)
+        errors = []
+
+        # 1. Signature et émetteur
+        try:
+            cert.verify_directly_issued_by(self.ca_cert)
+        except (ValueError, TypeError, InvalidSignature) as e:
+            errors.append(f"Non signé par la CA: {e}")
+
+        # 2. Période de validité (du certificat et de la CA)
+        if not cert.not_valid_before_utc <= now <= cert.not_valid_after_utc:
+            errors.append(f"Hors période de validité ({cert.not_valid_before_utc} → {cert.not_valid_after_utc})")
+        if now > self.ca_cert.not_valid_after_utc:
+            errors.append(f"CA expirée depuis {self.ca_cert.not_valid_after_utc}")
+
+        # 3. Ce ne doit pas être une CA
+        try:
+            if cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca:
+                errors.append("BasicConstraints ca=True sur un certificat de service")
+        except x509.ExtensionNotFound:
+            errors.append("BasicConstraints absente")
+
+        # 4. ExtendedKeyUsage selon le type
+        service_type = service_config.get('type')
+        expected_eku = EXPECTED_EKU.get(service_type)
+        if expected_eku is None:
+            errors.append(f"Type de service inconnu: {service_type}")
+        else:
+            try:
+                eku = cert.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+                if expected_eku not in eku:
+                    errors.append(f"EKU {EKU_NAMES.get(expected_eku, expected_eku.dotted_string)} manquante")
+            except x509.ExtensionNotFound:
+                errors.append("ExtendedKeyUsage absente")
+
+        # 5. SAN : un serveur doit couvrir son nom et tous les noms/IP configurés
+        if service_type == "server":
+            try:
+                san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+                dns_names = set(san.get_values_for_type(x509.DNSName))
+                ip_addresses = set(san.get_values_for_type(x509.IPAddress))
+            except x509.ExtensionNotFound:
+                dns_names, ip_addresses = set(), set()
+
+            for dns in [service_name, *service_config.get('dns_names', [])]:
+                if dns not in dns_names:
+                    errors.append(f"SAN DNS manquant: {dns}")
+            for ip in service_config.get('ip_addresses', []):
+                if ipaddress.ip_address(ip) not in ip_addresses:
+                    errors.append(f"SAN IP manquante: {ip}")
+
+        return VerificationResult(
+            service_name=service_name,
+            valid=not errors,
+            errors=errors,
+            not_valid_after=cert.not_valid_after_utc
+        )
+
+    def verify_all(self, output_dir: Path, services_config: dict | Iterable[tuple[str, dict]]) -> list[VerificationResult]:
+        """
+        Vérifie tous les certificats de services en une seule passe.
+
+        Args:
+            output_dir: Dossier contenant <service>/<service>_cert.pem
+            services_config: Configuration des services (nom -> config), ou
+                             couples (nom, config) parcourus à la demande
+
+        Returns:
+            Un VerificationResult par service, dans l'ordre de la configuration
+        """
+        now = datetime.now(timezone.utc)
+        results = []
+
+        items = services_config.items() if isinstance(services_config, dict) else services_config
+        for service_name, service_config in items:
+            cert_file = output_dir / service_name / f"{service_name}_cert.pem"
+            try:
+                cert = x509.load_pem_x509_certificate(cert_file.read_bytes())
+            except FileNotFoundError:
+                results.append(VerificationResult(service_name, False, [f"Certificat introuvable: {cert_file}"]))
+                continue
+            except ValueError as e:
+                results.append(VerificationResult(service_name, False, [f"PEM invalide: {e}"]))
+                continue
+
+            results.append(self.verify(service_name, cert, service_config, now))
+
+        return results
@@ -1,26 +1,75 @@
 from cryptography import x509
 from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
 from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.primitives import serialization
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import List
 import ipaddress
 from dataclasses import dataclass
+from utils.KeyManager import PrivateKey
+from utils.atomic_io import atomic_write_bytes, OutputTransaction
+
+
+def signing_hash(private_key: PrivateKey) -> hashes.HashAlgorithm | None:
+    """
+    Choisit l'algorithme de hachage adapté à la clé de signature.
+    
+    - Ed25519 : aucun (l'algorithme intègre son propre hachage)
+    - ECDSA P-384 : SHA-384 (même niveau de sécurité que la courbe)
+    - RSA / ECDSA P-256 : SHA-256
+    """
+    if isinstance(private_key, ed25519.Ed25519PrivateKey):
+        return None
+    if isinstance(private_key, ec.EllipticCurvePrivateKey) and private_key.curve.key_size >= 384:
+        return hashes.SHA384()
+    return hashes.SHA256()
+
+
+def leaf_key_usage(public_key) -> x509.KeyUsage:
+    """
+    KeyUsage d'un certificat serveur/client.
+    
+    key_encipherment n'a de sens que pour RSA (échange de clé RSA) :
+    avec ECDSA/Ed25519, TLS n'utilise que la signature.
+    """
+    return x509.KeyUsage(
+        digital_signature=True,    # Peut signer des données
+        key_encipherment=isinstance(public_key, rsa.RSAPublicKey),  # Peut chiffrer des clés (TLS RSA)
+        content_commitment=False,
+        data_encipherment=False,
+        key_agreement=False,
+        key_cert_sign=False,       # NE peut PAS signer de certificats
+        crl_sign=False,
+        encipher_only=False,
+        decipher_only=False,
+    )
+
 
 @dataclass
 class CertManager:
     cert_path: Path
-    key_CA: rsa.RSAPrivateKey
+    key_CA: PrivateKey
     cert_CA: x509.Certificate
+    # (URL de la CRL complète, URL de la delta CRL) intégrées aux certificats émis
+    crl_urls: tuple[str, str] | None = None
     
     def __post_init__(self):
         self.cert_path.parent.mkdir(parents=True, exist_ok=True)
 
+    def add_crl_distribution_points(self, builder: x509.CertificateBuilder) -> x509.CertificateBuilder:
+        """Ajoute les points de distribution des CRL si la révocation est configurée."""
+        if self.crl_urls is None:
+            return builder
+        from utils.Revocation import crl_distribution_extensions
+        for extension in crl_distribution_extensions(*self.crl_urls):
+            builder = builder.add_extension(extension, critical=False)
+        return builder
+
     def create_client_certificate(
         self,
-        client_private_key: rsa.RSAPrivateKey,
+        client_private_key: PrivateKey,
         common_name: str,
         validity_days: int = 365
         ) -> x509.Certificate:
@@ -56,7 +105,7 @@ class CertManager:
         print(f"   Type    : CLIENT (authentification)")
     
         # 3. Construire le certificat
-        cert = (
+        builder = (
             x509.CertificateBuilder()
             .subject_name(subject)
             .issuer_name(issuer)
@@ -73,17 +122,7 @@ class CertManager:
         
             # EXTENSION 2 : KeyUsage
             .add_extension(
-                x509.KeyUsage(
-                    digital_signature=True,    # Peut signer des données
-                    key_encipherment=True,     # Peut chiffrer des clés (TLS)
-                    content_commitment=False,
-                    data_encipherment=False,
-                    key_agreement=False,
-                    key_cert_sign=False,       # NE peut PAS signer de certificats
-                    crl_sign=False,
-                    encipher_only=False,
-                    decipher_only=False,
-                ),
+                leaf_key_usage(client_private_key.public_key()),
                 critical=True,
             )
             .add_extension(
@@ -102,15 +141,16 @@ class CertManager:
                 x509.AuthorityKeyIdentifier.from_issuer_public_key(self.key_CA.public_key()),
                 critical=False,
             )
-            .sign(self.key_CA, hashes.SHA256())
         )
+        # EXTENSION 6 : CRL Distribution Points (si la révocation est configurée)
+        cert = self.add_crl_distribution_points(builder).sign(self.key_CA, signing_hash(self.key_CA))
     
         print(f"✅ Certificat client créé (valide {validity_days} jours)\n")
     
         return cert
     
     def create_server_certificate(self,
-        server_private_key: rsa.RSAPrivateKey,
+        server_private_key: PrivateKey,
         common_name: str,
         dns_names: List[str] = None,
         ip_addresses: List[str] = None,
@@ -172,7 +212,7 @@ class CertManager:
             print(f"   + IP: {ip}")
     
         # 4. Construire le certificat
-        cert = (
+        builder = (
             x509.CertificateBuilder()
             .subject_name(subject)
             .issuer_name(issuer)  # ← Différent du subject !
@@ -190,17 +230,7 @@ class CertManager:
         
         # EXTENSION 2 : KeyUsage
         .add_extension(
-            x509.KeyUsage(
-                digital_signature=True,    # Peut signer des données
-                key_encipherment=True,     # Peut chiffrer des clés (TLS)
-                content_commitment=False,
-                data_encipherment=False,
-                key_agreement=False,
-                key_cert_sign=False,       # NE PEUT PAS signer des certificats
-                crl_sign=False,
-                encipher_only=False,
-                decipher_only=False,
-            ),
+            leaf_key_usage(server_private_key.public_key()),
             critical=True,
         )
         
@@ -230,9 +260,13 @@ class CertManager:
             critical=False,
         )
         
-        # 5. SIGNER avec la CLÉ PRIVÉE DE LA CA (pas la clé du serveur !)
-        .sign(self.key_CA, hashes.SHA256())
     )
+        
+        # EXTENSION 7 : CRL Distribution Points (si la révocation est configurée)
+        builder = self.add_crl_distribution_points(builder)
+        
+        # 5. SIGNER avec la CLÉ PRIVÉE DE LA CA (pas la clé du serveur !)
+        cert = builder.sign(self.key_CA, signing_hash(self.key_CA))
     
         print(f"✅ Certificat serveur créé (valide {validity_days} jours)")
         print(f"   Signé par : {issuer.get_attributes_for_oid(NameOID.COMMON_NAME)[0].value}\n")
@@ -285,9 +319,11 @@ class CertManager:
         print(comparison)
         print("="*60 + "\n")
 
-    def save_certificate_pem(cert: x509.Certificate, filepath: Path) -> None:
+    def save_certificate_pem(cert: x509.Certificate, filepath: Path, transaction: OutputTransaction | None = None) -> None:
         """
         Sauvegarde un certificat au format PEM.
+        
+        Avec une transaction, le fichier n'est visible qu'à son commit.
     
         Format PEM pour certificat :
         -----BEGIN CERTIFICATE-----
@@ -297,9 +333,10 @@ class CertManager:
         print(f"💾 Sauvegarde du certificat dans {filepath}...")
 
         pem_bytes = cert.public_bytes(encoding=serialization.Encoding.PEM)
-        filepath.parent.mkdir(parents=True, exist_ok=True)
-        filepath.write_bytes(pem_bytes)
-        filepath.chmod(0o644)
+        if transaction is not None:
+            transaction.write(filepath, pem_bytes, 0o644)
+        else:
+            atomic_write_bytes(filepath, pem_bytes, 0o644)
     
         print(f"✅ Certificat sauvegardé")
 
@@ -358,7 +395,7 @@ class CertManager:
         ])
 
     def create_ca_certificate(self,
-        private_key: rsa.RSAPrivateKey,
+        private_key: PrivateKey,
         common_name: str = "ELK-CA",
         validity_days: int = 3650,  # 10 ans
         organization: str = "ELK-DevOps",
@@ -434,7 +471,7 @@ class CertManager:
             )
             
             # 3. Signer le certificat avec la clé privée de la CA
-            .sign(private_key, hashes.SHA256())
+            .sign(private_key, signing_hash(private_key))
         )
         
         print(f"✅ Certificat CA créé (valide {validity_days} jours)")
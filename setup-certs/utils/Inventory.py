@@ -0,0 +1,185 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+import sqlite3
+
+# Les requêtes n'ont pas besoin de cryptography : seul inventory_row
+# (appelé à l'émission d'un certificat) l'importe.
+if TYPE_CHECKING:
+    from cryptography import x509
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS certs (
+    serial TEXT PRIMARY KEY,            -- numéro de série en hexadécimal
+    common_name TEXT NOT NULL,
+    cert_type TEXT NOT NULL,            -- ca, server, client
+    fingerprint TEXT NOT NULL,          -- SHA-256
+    key_algorithm TEXT NOT NULL,        -- rsa-2048, ecdsa-p256, ed25519...
+    path TEXT NOT NULL,
+    not_valid_before TEXT NOT NULL,     -- ISO 8601 UTC : l'ordre lexical est l'ordre chronologique
+    not_valid_after TEXT NOT NULL,
+    current INTEGER NOT NULL DEFAULT 1  -- 0 = remplacé par un certificat plus récent au même chemin
+);
+CREATE INDEX IF NOT EXISTS certs_not_valid_after ON certs (not_valid_after);
+CREATE INDEX IF NOT EXISTS certs_common_name ON certs (common_name);
+CREATE INDEX IF NOT EXISTS certs_path ON certs (path);
+CREATE TABLE IF NOT EXISTS sans (
+    name TEXT NOT NULL,                 -- DNS ou IP
+    serial TEXT NOT NULL,
+    PRIMARY KEY (name, serial)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = (
+    "serial", "common_name", "cert_type", "fingerprint", "key_algorithm",
+    "path", "not_valid_before", "not_valid_after", "current",
+)
+
+
+def key_algorithm(public_key) -> str:
+    """Nom de l'algorithme de clé, dans la notation de key_type."""
+    from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
+
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return f"rsa-{public_key.key_size}"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        return f"ecdsa-p{public_key.curve.key_size}"
+    if isinstance(public_key, ed25519.Ed25519PublicKey):
+        return "ed25519"
+    return type(public_key).__name__
+
+
+def inventory_row(cert: "x509.Certificate", path: Path | str | None = None) -> dict:
+    """
+    Entrée d'inventaire d'un certificat (dictionnaire simple, picklable).
+
+    Le type est déduit des extensions : CA (BasicConstraints), serveur ou
+    client (ExtendedKeyUsage).
+    """
+    from cryptography import x509
+    from cryptography.x509.oid import NameOID, ExtendedKeyUsageOID
+    from cryptography.hazmat.primitives import hashes
+
+    try:
+        is_ca = cert.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        is_ca = False
+    try:
+        usages = cert.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value
+    except x509.ExtensionNotFound:
+        usages = []
+    try:
+        san = cert.extensions.get_extension_for_class(x509.SubjectAlternativeName).value
+        sans = [str(name) for name in san.get_values_for_type(x509.DNSName)]
+        sans += [str(ip) for ip in san.get_values_for_type(x509.IPAddress)]
+    except x509.ExtensionNotFound:
+        sans = []
+
+    if is_ca:
+        cert_type = "ca"
+    elif ExtendedKeyUsageOID.SERVER_AUTH in usages:
+        cert_type = "server"
+    else:
+        cert_type = "client"
+
+    common_names = cert.subject.get_attributes_for_oid(NameOID.COMMON_NAME)
+    return {
+        "serial": format(cert.serial_number, "x"),
+        "common_name": common_names[0].value if common_names else "",
+        "cert_type": cert_type,
+        "fingerprint": cert.fingerprint(hashes.SHA256()).hex(),
+        "key_algorithm": key_algorithm(cert.public_key()),
+        "path": str(path) if path is not None else "",
+        "not_valid_before": cert.not_valid_before_utc.isoformat(),
+        "not_valid_after": cert.not_valid_after_utc.isoformat(),
+        "sans": sans,
+    }
+
+
+class CertInventory:
+    """
+    Inventaire SQLite des certificats émis (certs_output/.state/inventory.db).
+
+    Chaque émission y enregistre une ligne (série, CN, type, SAN, empreinte,
+    algorithme, chemin, validité) : les questions courantes (« qu'est-ce qui
+    expire dans 30 jours ? », « quels certificats pour l'hôte X ? ») sont
+    des requêtes indexées, sans lire aucun PEM.
+
+    Usage:
+        inventory = CertInventory(Path("certs_output/.state/inventory.db"))
+        inventory.add([inventory_row(cert, path)])
+        inventory.expiring(timedelta(days=30))
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def add(self, rows: Iterable[dict]) -> int:
+        """
+        Enregistre des certificats en une seule transaction.
+
+        Un certificat enregistré au même chemin qu'un précédent remplace
+        celui-ci (current = 0), qui reste dans l'historique.
+
+        Returns:
+            Nombre de certificats enregistrés
+        """
+        count = 0
+        with self.db:
+            for row in rows:
+                if row["path"]:
+                    self.db.execute(
+                        "UPDATE certs SET current = 0 WHERE path = ? AND serial != ?",
+                        (row["path"], row["serial"])
+                    )
+                self.db.execute(
+                    f"INSERT OR REPLACE INTO certs ({', '.join(COLUMNS)}) VALUES ({', '.join('?' * len(COLUMNS))})",
+                    tuple(row.get(column, 1) for column in COLUMNS)
+                )
+                self.db.executemany(
+                    "INSERT OR IGNORE INTO sans (name, serial) VALUES (?, ?)",
+                    [(name.lower(), row["serial"]) for name in row["sans"]]
+                )
+                count += 1
+        return count
+
+    def _query(self, where: str, params: tuple, include_superseded: bool) -> list[dict]:
+        if not include_superseded:
+            where = f"({where}) AND current = 1"
+        cursor = self.db.execute(
+            f"SELECT *, (SELECT group_concat(name, ',') FROM sans WHERE sans.serial = certs.serial) AS sans "
+            f"FROM certs WHERE {where} ORDER BY not_valid_after",
+            params
+        )
+        return [
+            {**dict(row), "sans": row["sans"].split(",") if row["sans"] else []}
+            for row in cursor
+        ]
+
+    def expiring(self, within: timedelta, include_superseded: bool = False, now: datetime | None = None) -> list[dict]:
+        """Certificats qui expirent d'ici `within` (déjà expirés compris)."""
+        now = now or datetime.now(timezone.utc)
+        return self._query("not_valid_after <= ?", ((now + within).isoformat(),), include_superseded)
+
+    def for_host(self, host: str, include_superseded: bool = False) -> list[dict]:
+        """Certificats dont le CN ou un SAN (DNS/IP) correspond à `host`."""
+        return self._query(
+            "common_name = ? OR serial IN (SELECT serial FROM sans WHERE name = ?)",
+            (host, host.lower()),
+            include_superseded
+        )
+
+    def all(self, include_superseded: bool = False) -> list[dict]:
+        return self._query("1 = 1", (), include_superseded)
+
+    def clear(self) -> None:
+        with self.db:
+            self.db.execute("DELETE FROM certs")
+            self.db.execute("DELETE FROM sans")
@@ -1,34 +1,72 @@
-from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.asymmetric import rsa, ec, ed25519
 from cryptography.hazmat.primitives import serialization
 from pathlib import Path
 from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from utils.atomic_io import atomic_write_bytes
+from utils.load_config import KEY_TYPES
+
+if TYPE_CHECKING:
+    from utils.KeyPool import KeyPool
+    from utils.atomic_io import OutputTransaction
+
+PrivateKey = rsa.RSAPrivateKey | ec.EllipticCurvePrivateKey | ed25519.Ed25519PrivateKey
+
+_EC_CURVES = {
+    "ecdsa-p256": ec.SECP256R1,
+    "ecdsa-p384": ec.SECP384R1,
+}
+
+
+def generate_private_key(key_type: str = "rsa", key_size: int = 2048) -> PrivateKey:
+    """
+    Génère une clé privée du type demandé.
+
+    key_size n'est utilisé que pour RSA : la taille des clés ECDSA et Ed25519
+    est fixée par la courbe.
+    """
+    if key_type == "rsa":
+        return rsa.generate_private_key(public_exponent=65537, key_size=key_size)
+    if key_type in _EC_CURVES:
+        return ec.generate_private_key(_EC_CURVES[key_type]())
+    if key_type == "ed25519":
+        return ed25519.Ed25519PrivateKey.generate()
+    raise ValueError(f"Type de clé inconnu: {key_type} (attendu: {', '.join(KEY_TYPES)})")
+
 
 @dataclass
 class KeyManager:
     key_dir : Path
+    key_pool: "KeyPool | None" = None
+    transaction: "OutputTransaction | None" = None
 
     def __post_init__(self):
         self.key_dir.mkdir(parents=True, exist_ok=True)
-    
-    def load_private_key(self, key_path: Path) -> rsa.RSAPrivateKey:
-        """Charge une clé privée existante depuis un fichier PEM."""
+
+    def load_private_key(self, key_path: Path) -> PrivateKey:
+        """Charge une clé privée existante (RSA, ECDSA ou Ed25519) depuis un fichier PEM."""
         if not key_path.exists():
             raise FileNotFoundError(f"Clé privée introuvable: {key_path}")
-        
+
         with open(key_path, 'rb') as f:
             private_key = serialization.load_pem_private_key(
                 f.read(),
                 password=None  # Pas de mot de passe pour l'instant
             )
-        
+
+        if not isinstance(private_key, PrivateKey):
+            raise ValueError(f"Type de clé non supporté dans {key_path}: {type(private_key).__name__}")
+
         print(f"✅ Clé privée chargée: {key_path}")
         return private_key
-    
-    def create_rsa_keypair(self, key_name: str, key_size: int = 2048):
-        private_key = rsa.generate_private_key(
-            public_exponent=65537,
-            key_size=key_size,
-        )
+
+    def create_keypair(self, key_name: str, key_type: str = "rsa", key_size: int = 2048):
+        # Clé pré-générée si disponible, génération à la volée sinon
+        private_key = None
+        if self.key_pool is not None:
+            private_key = self.key_pool.take(key_type, key_size)
+        if private_key is None:
+            private_key = generate_private_key(key_type, key_size)
         public_key = private_key.public_key()
 
         private_pem = private_key.private_bytes(
@@ -44,17 +82,18 @@ class KeyManager:
         private_key_path = self.key_dir / f"{key_name}_private.pem"
         public_key_path = self.key_dir / f"{key_name}_public.pem"
 
-        with open(private_key_path, 'wb') as f:
-            f.write(private_pem)
-            private_key_path.chmod(0o600)  # Restrict permissions
-        
-        with open(public_key_path, 'wb') as f:
-            f.write(public_pem)
-            public_key_path.chmod(0o644)  # Public key can be more permissive
+        # Écriture atomique : jamais de clé partielle ni de fenêtre en 644
+        # (dans la transaction du run si elle existe, visible à son commit)
+        write = self.transaction.write if self.transaction is not None else atomic_write_bytes
+        write(private_key_path, private_pem, 0o600)  # Restrict permissions
+        write(public_key_path, public_pem, 0o644)  # Public key can be more permissive
 
         return {
             "private_key": private_key,
             "public_key": public_key,
             "private_key_path": private_key_path,
             "public_key_path": public_key_path
-        }
\ No newline at end of file
+        }
+
+    def create_rsa_keypair(self, key_name: str, key_size: int = 2048):
+        return self.create_keypair(key_name, key_type="rsa", key_size=key_size)
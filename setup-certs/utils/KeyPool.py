@@ -0,0 +1,108 @@
+from cryptography.hazmat.primitives import serialization
+from pathlib import Path
+from dataclasses import dataclass
+import os
+import uuid
+from utils.KeyManager import PrivateKey, generate_private_key
+
+
+@dataclass
+class KeyPool:
+    """
+    Réserve sur disque de clés privées pré-générées.
+
+    Les clés sont rangées par algorithme et taille :
+        key_pool/
+        ├── rsa-4096/<uuid>.pem
+        ├── rsa-2048/<uuid>.pem
+        └── ecdsa-p256/<uuid>.pem
+
+    Chaque clé n'est distribuée qu'une seule fois : elle est réclamée par un
+    rename atomique (sûr entre processus) puis supprimée du pool.
+    """
+    pool_dir: Path
+    depth: int = 2
+
+    def __post_init__(self):
+        self.pool_dir.mkdir(parents=True, exist_ok=True)
+        self.pool_dir.chmod(0o700)
+
+    def slot_dir(self, key_type: str, key_size: int) -> Path:
+        """Dossier du pool pour un type/taille de clé."""
+        name = f"rsa-{key_size}" if key_type == "rsa" else key_type
+        return self.pool_dir / name
+
+    def available(self, key_type: str, key_size: int) -> int:
+        """Nombre de clés prêtes pour ce type/taille."""
+        slot = self.slot_dir(key_type, key_size)
+        if not slot.exists():
+            return 0
+        return sum(1 for _ in slot.glob("*.pem"))
+
+    def take(self, key_type: str, key_size: int) -> PrivateKey | None:
+        """
+        Retire une clé du pool.
+
+        Returns:
+            La clé privée, ou None si le pool est vide pour ce type/taille
+        """
+        slot = self.slot_dir(key_type, key_size)
+        if not slot.exists():
+            return None
+
+        for entry in slot.glob("*.pem"):
+            claimed = entry.with_name(f"{entry.stem}.claimed-{os.getpid()}")
+            try:
+                os.rename(entry, claimed)
+            except FileNotFoundError:
+                continue  # Déjà prise par un autre processus
+
+            try:
+                # Une clé lisible par d'autres utilisateurs est compromise : on la jette
+                if claimed.stat().st_mode & 0o077:
+                    print(f"⚠️  Clé du pool avec permissions trop larges, ignorée: {entry.name}")
+                    continue
+                private_key = serialization.load_pem_private_key(claimed.read_bytes(), password=None)
+            finally:
+                claimed.unlink(missing_ok=True)
+
+            print(f"♻️  Clé {slot.name} prise dans le pool")
+            return private_key
+
+        return None
+
+    def fill(self, key_type: str, key_size: int, depth: int | None = None) -> int:
+        """
+        Complète le pool jusqu'à `depth` clés pour ce type/taille.
+
+        Les clés sont écrites dans un fichier temporaire créé en 600 puis
+        renommées : take() ne voit jamais de fichier partiel.
+
+        Returns:
+            Nombre de clés générées
+        """
+        depth = self.depth if depth is None else depth
+        slot = self.slot_dir(key_type, key_size)
+        slot.mkdir(parents=True, exist_ok=True)
+        slot.chmod(0o700)
+
+        generated = 0
+        while self.available(key_type, key_size) < depth:
+            private_key = generate_private_key(key_type, key_size)
+            private_pem = private_key.private_bytes(
+                encoding=serialization.Encoding.PEM,
+                format=serialization.PrivateFormat.PKCS8,
+                encryption_algorithm=serialization.NoEncryption()
+            )
+
+            name = uuid.uuid4().hex
+            tmp_path = slot / f"{name}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(private_pem)
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp_path, slot / f"{name}.pem")
+            generated += 1
+
+        return generated
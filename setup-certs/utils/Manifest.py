@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+import hashlib
+import json
+from utils.atomic_io import atomic_write_bytes
+
+# Ce module ne dépend pas de cryptography : main.py l'utilise pour décider,
+# avant tout import lourd, si un run a quelque chose à faire.
+if TYPE_CHECKING:
+    from cryptography import x509
+
+# Valeurs par défaut appliquées par ELKCertGenerator : elles font partie
+# de la configuration effective d'un service (et donc de son hash)
+SERVICE_DEFAULTS = {
+    "type": None,
+    "key_type": "rsa",
+    "key_size": 2048,
+    "validity_days": 365,
+    "dns_names": [],
+    "ip_addresses": [],
+}
+
+
+def service_config_hash(service_config: dict) -> str:
+    """Hash SHA-256 de la configuration effective d'un service."""
+    effective = {**SERVICE_DEFAULTS, **service_config}
+    # key_size n'a d'effet que pour RSA
+    if effective["key_type"] != "rsa":
+        effective["key_size"] = None
+    encoded = json.dumps(effective, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def file_hash(path: Path) -> str:
+    """Hash SHA-256 du contenu d'un fichier."""
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def certificate_record(cert: "x509.Certificate", config_hash: str | None = None) -> dict:
+    """Entrée de manifest décrivant un certificat émis."""
+    from cryptography.hazmat.primitives import hashes
+
+    record = {
+        "fingerprint": cert.fingerprint(hashes.SHA256()).hex(),
+        "serial": format(cert.serial_number, "x"),
+        "not_valid_after": cert.not_valid_after_utc.isoformat(),
+    }
+    if config_hash is not None:
+        record["config_hash"] = config_hash
+    return record
+
+
+@dataclass
+class CertManifest:
+    """
+    Manifest des certificats émis (certs_output/.state/manifest.json).
+
+    Pour chaque service : hash de la configuration effective, empreinte,
+    numéro de série et date d'expiration du certificat. Il permet de
+    décider sans lire aucun PEM si un certificat doit être réémis.
+    """
+    path: Path
+    ca: dict = field(default_factory=dict)
+    services: dict[str, dict] = field(default_factory=dict)
+    config_file_hash: str | None = None
+    next_renewal: str | None = None
+
+    @classmethod
+    def load(cls, path: Path) -> "CertManifest":
+        """Charge le manifest (vide s'il n'existe pas encore)."""
+        if not path.exists():
+            return cls(path=path)
+        data = json.loads(path.read_text(encoding="utf-8"))
+        return cls(
+            path=path,
+            ca=data.get("ca", {}),
+            services=data.get("services", {}),
+            config_file_hash=data.get("config_file_hash"),
+            next_renewal=data.get("next_renewal")
+        )
+
+    def save(self) -> None:
+        """Écrit le manifest de façon atomique (fichier temporaire + rename)."""
+        data = json.dumps({
+            "ca": self.ca,
+            "services": self.services,
+            "config_file_hash": self.config_file_hash,
+            "next_renewal": self.next_renewal,
+        }, indent=2, sort_keys=True)
+        atomic_write_bytes(self.path, data.encode("utf-8"))
+
+    def mark_up_to_date(self, config_path: Path, renew_before: timedelta) -> None:
+        """
+        Enregistre l'état d'un run complet réussi.
+
+        Le hash du fichier de configuration et la prochaine échéance de
+        renouvellement permettent au run suivant de conclure sans rien charger.
+        """
+        self.config_file_hash = file_hash(config_path)
+        due_dates = [
+            datetime.fromisoformat(record["not_valid_after"]) - renew_before
+            for record in self.services.values()
+        ]
+        self.next_renewal = min(due_dates).isoformat() if due_dates else None
+
+    def is_up_to_date(self, config_path: Path, output_dir: Path, now: datetime | None = None) -> bool:
+        """
+        Chemin rapide : vrai si le dernier run couvre l'état actuel.
+
+        Aucun PEM n'est lu et le YAML n'est pas parsé : seuls le hash du
+        fichier de configuration, la prochaine échéance et l'existence des
+        fichiers de certificats sont contrôlés.
+        """
+        if self.config_file_hash is None or self.config_file_hash != file_hash(config_path):
+            return False
+        now = now or datetime.now(timezone.utc)
+        if self.next_renewal is not None and datetime.fromisoformat(self.next_renewal) <= now:
+            return False
+        if not (output_dir / "ca" / "ca_cert.pem").exists():
+            return False
+        return all(
+            (output_dir / service_name / f"{service_name}_cert.pem").exists()
+            for service_name in self.services
+        )
+
+    def renewal_reason(
+        self,
+        service_name: str,
+        config_hash: str,
+        renew_before: timedelta,
+        now: datetime | None = None
+    ) -> str | None:
+        """
+        Indique pourquoi un service doit être réémis.
+
+        Returns:
+            La raison ("inconnu", "révoqué", "configuration modifiée", "expiration proche"),
+            ou None si le certificat enregistré est à jour
+        """
+        now = now or datetime.now(timezone.utc)
+        record = self.services.get(service_name)
+        if record is None:
+            return "inconnu"
+        if record.get("revoked"):
+            return "révoqué"
+        if record.get("config_hash") != config_hash:
+            return "configuration modifiée"
+        if datetime.fromisoformat(record["not_valid_after"]) - renew_before <= now:
+            return "expiration proche"
+        return None
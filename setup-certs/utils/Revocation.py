@@ -0,0 +1,237 @@
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+import sqlite3
+from utils.CertificateManager import signing_hash
+from utils.KeyManager import PrivateKey
+from utils.atomic_io import atomic_write_bytes
+
+FULL_CRL_NAME = "ca.crl"
+DELTA_CRL_NAME = "ca-delta.crl"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS revoked (
+    serial TEXT PRIMARY KEY,         -- numéro de série en hexadécimal
+    revoked_at TEXT NOT NULL,
+    reason TEXT NOT NULL,
+    not_valid_after TEXT,            -- NULL si inconnu : l'entrée reste dans les CRL
+    subject TEXT,
+    crl_number INTEGER               -- première CRL qui contient l'entrée (NULL = pas encore publiée)
+);
+CREATE INDEX IF NOT EXISTS revoked_crl_number ON revoked (crl_number);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def crl_distribution_extensions(full_url: str, delta_url: str) -> list[x509.ExtensionType]:
+    """
+    Extensions pointant vers les CRL de la CA.
+
+    - CRLDistributionPoints : CRL complète
+    - FreshestCRL : delta CRL, plus petite et rafraîchie plus souvent
+    """
+    def points(url: str) -> list[x509.DistributionPoint]:
+        return [x509.DistributionPoint(
+            full_name=[x509.UniformResourceIdentifier(url)],
+            relative_name=None,
+            reasons=None,
+            crl_issuer=None
+        )]
+
+    return [x509.CRLDistributionPoints(points(full_url)), x509.FreshestCRL(points(delta_url))]
+
+
+class RevocationStore:
+    """
+    Index persistant des certificats révoqués (SQLite, clé = numéro de série).
+
+    Chaque révocation est rattachée au numéro de la première CRL qui la
+    publie. Une CRL complète contient toutes les révocations encore valides ;
+    une delta CRL ne contient que celles publiées depuis la dernière CRL
+    complète (sa base), ce qui évite aux consommateurs de retélécharger
+    toute la liste à chaque rafraîchissement.
+
+    Usage:
+        store = RevocationStore(Path("certs_output/.state/revocation.db"))
+        store.revoke(serial, "keyCompromise")
+        store.publish(ca_key, ca_cert, Path("certs_output/ca/crl"))
+    """
+
+    def __init__(self, db_path: Path):
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(_SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def _meta(self, key: str) -> str | None:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value) -> None:
+        self.db.execute(
+            "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value",
+            (key, str(value))
+        )
+
+    def revoke(
+        self,
+        serial: int,
+        reason: str = "unspecified",
+        not_valid_after: datetime | None = None,
+        subject: str | None = None
+    ) -> bool:
+        """
+        Enregistre la révocation d'un certificat.
+
+        Args:
+            serial: Numéro de série du certificat
+            reason: Raison RFC 5280 (ex: "keyCompromise", "superseded")
+            not_valid_after: Expiration du certificat (l'entrée sort des CRL ensuite)
+            subject: Sujet, pour information
+
+        Returns:
+            False si le certificat était déjà révoqué
+        """
+        x509.ReasonFlags(reason)  # ValueError si la raison est inconnue
+        with self.db:
+            cursor = self.db.execute(
+                "INSERT OR IGNORE INTO revoked (serial, revoked_at, reason, not_valid_after, subject) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    format(serial, "x"),
+                    datetime.now(timezone.utc).isoformat(),
+                    reason,
+                    not_valid_after.isoformat() if not_valid_after else None,
+                    subject,
+                )
+            )
+        return cursor.rowcount == 1
+
+    def is_revoked(self, serial: int) -> bool:
+        return self.db.execute(
+            "SELECT 1 FROM revoked WHERE serial = ?", (format(serial, "x"),)
+        ).fetchone() is not None
+
+    def reset_if_new_ca(self, ca_cert: x509.Certificate) -> None:
+        """Les numéros de série d'une ancienne CA n'ont plus de sens : on repart de zéro."""
+        fingerprint = ca_cert.fingerprint(hashes.SHA256()).hex()
+        known = self._meta("ca_fingerprint")
+        if known == fingerprint:
+            return
+        with self.db:
+            if known is not None:
+                self.db.execute("DELETE FROM revoked")
+                self.db.execute("DELETE FROM meta")
+            self._set_meta("ca_fingerprint", fingerprint)
+
+    def _revoked_entries(self, query: str, params: tuple) -> list[x509.RevokedCertificate]:
+        return [
+            x509.RevokedCertificateBuilder()
+            .serial_number(int(serial, 16))
+            .revocation_date(datetime.fromisoformat(revoked_at))
+            .add_extension(x509.CRLReason(x509.ReasonFlags(reason)), critical=False)
+            .build()
+            for serial, revoked_at, reason in self.db.execute(query, params)
+        ]
+
+    def _build_crl(
+        self,
+        ca_key: PrivateKey,
+        ca_cert: x509.Certificate,
+        crl_number: int,
+        next_update: timedelta,
+        revoked: list[x509.RevokedCertificate],
+        delta_base: int | None = None
+    ) -> x509.CertificateRevocationList:
+        now = datetime.now(timezone.utc)
+        extensions = [
+            x509.Extension(x509.CRLNumber.oid, False, x509.CRLNumber(crl_number)),
+            x509.Extension(
+                x509.AuthorityKeyIdentifier.oid, False,
+                x509.AuthorityKeyIdentifier.from_issuer_public_key(ca_key.public_key())
+            ),
+        ]
+        if delta_base is not None:
+            extensions.append(x509.Extension(x509.DeltaCRLIndicator.oid, True, x509.DeltaCRLIndicator(delta_base)))
+
+        # Liste passée d'un coup au builder : add_revoked_certificate recopie
+        # la liste à chaque appel (quadratique sur des dizaines de milliers d'entrées)
+        builder = x509.CertificateRevocationListBuilder(
+            issuer_name=ca_cert.subject,
+            last_update=now,
+            next_update=now + next_update,
+            extensions=extensions,
+            revoked_certificates=revoked
+        )
+        return builder.sign(ca_key, signing_hash(ca_key))
+
+    def publish(
+        self,
+        ca_key: PrivateKey,
+        ca_cert: x509.Certificate,
+        crl_dir: Path,
+        full: bool | None = None,
+        full_validity: timedelta = timedelta(days=7),
+        delta_validity: timedelta = timedelta(hours=24),
+        max_delta_entries: int = 1000
+    ) -> dict:
+        """
+        Publie une delta CRL et, si nécessaire, une nouvelle CRL complète.
+
+        Une CRL complète est émise si full=True, s'il n'y en a pas encore,
+        si la delta dépasserait max_delta_entries ou si la CRL complète
+        expirerait avant la prochaine delta.
+
+        Returns:
+            Numéro de CRL, base, nombre d'entrées de chaque CRL
+        """
+        self.reset_if_new_ca(ca_cert)
+        now = datetime.now(timezone.utc)
+        crl_number = int(self._meta("crl_number") or 0) + 1
+        base = self._meta("base_crl_number")
+        base_next_update = self._meta("base_next_update")
+
+        with self.db:
+            self.db.execute("UPDATE revoked SET crl_number = ? WHERE crl_number IS NULL", (crl_number,))
+
+            if full is None:
+                full = (
+                    base is None
+                    or not (crl_dir / FULL_CRL_NAME).exists()
+                    or datetime.fromisoformat(base_next_update) <= now + delta_validity
+                    or self.db.execute(
+                        "SELECT COUNT(*) FROM revoked WHERE crl_number > ?", (int(base),)
+                    ).fetchone()[0] > max_delta_entries
+                )
+
+            stats = {"crl_number": crl_number, "full": full}
+            if full:
+                # Les certificats expirés n'ont plus besoin de figurer dans la CRL
+                revoked = self._revoked_entries(
+                    "SELECT serial, revoked_at, reason FROM revoked "
+                    "WHERE not_valid_after IS NULL OR not_valid_after > ?",
+                    (now.isoformat(),)
+                )
+                crl = self._build_crl(ca_key, ca_cert, crl_number, full_validity, revoked)
+                atomic_write_bytes(crl_dir / FULL_CRL_NAME, crl.public_bytes(serialization.Encoding.DER), 0o644)
+                base = crl_number
+                self._set_meta("base_crl_number", base)
+                self._set_meta("base_next_update", (now + full_validity).isoformat())
+                stats["full_entries"] = len(revoked)
+
+            delta = self._revoked_entries(
+                "SELECT serial, revoked_at, reason FROM revoked WHERE crl_number > ?", (int(base),)
+            )
+            crl = self._build_crl(ca_key, ca_cert, crl_number, delta_validity, delta, delta_base=int(base))
+            atomic_write_bytes(crl_dir / DELTA_CRL_NAME, crl.public_bytes(serialization.Encoding.DER), 0o644)
+            self._set_meta("crl_number", crl_number)
+
+        stats.update(base_crl_number=int(base), delta_entries=len(delta))
+        return stats
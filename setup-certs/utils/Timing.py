@@ -0,0 +1,99 @@
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import json
+import os
+import time
+from utils.atomic_io import atomic_write_bytes
+
+
+class PhaseTimer:
+    """
+    Mesure la durée des phases d'une génération (spans imbriqués).
+
+    Chaque span enregistre son nom, son parent, son début et sa durée.
+    Les instants viennent de time.perf_counter (horloge monotone du système
+    sous Linux) : les spans mesurés dans les workers peuvent être fusionnés
+    dans la chronologie du processus principal.
+
+    Usage:
+        timer = PhaseTimer()
+        with timer.span("ca"):
+            ...
+        timer.write_report(Path("timings.json"))
+    """
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.spans: list[dict] = []
+        self._stack: list[str] = []
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[None]:
+        """Chronomètre le bloc ; attrs (ex: service="kibana") sont joints au span."""
+        parent = self._stack[-1] if self._stack else None
+        self._stack.append(name)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self._stack.pop()
+            self.spans.append({"name": name, "parent": parent, "start": start, "end": end, **attrs})
+
+    def drain(self) -> list[dict]:
+        """Retire et renvoie les spans enregistrés (envoyés par un worker)."""
+        spans, self.spans = self.spans, []
+        return spans
+
+    def merge(self, spans: list[dict], **attrs) -> None:
+        """Ajoute les spans d'un worker ; les spans racines sont rattachés au span courant."""
+        parent = self._stack[-1] if self._stack else None
+        for span in spans:
+            self.spans.append({**span, "parent": span["parent"] or parent, **attrs})
+
+    def summary(self) -> dict[str, dict]:
+        """Cumul par nom de phase : nombre d'occurrences et durée totale."""
+        phases = {}
+        for span in self.spans:
+            phase = phases.setdefault(span["name"], {"count": 0, "total_ms": 0.0})
+            phase["count"] += 1
+            phase["total_ms"] += (span["end"] - span["start"]) * 1000
+        for phase in phases.values():
+            phase["total_ms"] = round(phase["total_ms"], 3)
+        return phases
+
+    def report(self) -> dict:
+        """Rapport JSON : durée totale, cumul par phase et chronologie des spans."""
+        def ms(instant: float) -> float:
+            return round((instant - self.origin) * 1000, 3)
+
+        return {
+            "pid": os.getpid(),
+            "total_ms": ms(time.perf_counter()),
+            "phases": self.summary(),
+            "spans": sorted(
+                (
+                    {
+                        **{k: v for k, v in span.items() if k not in ("start", "end")},
+                        "start_ms": ms(span["start"]),
+                        "duration_ms": round((span["end"] - span["start"]) * 1000, 3),
+                    }
+                    for span in self.spans
+                ),
+                key=lambda span: span["start_ms"]
+            ),
+        }
+
+    def write_report(self, path: Path) -> None:
+        atomic_write_bytes(path, json.dumps(self.report(), indent=2).encode("utf-8"))
+
+    def print_summary(self, parent: str | None = None) -> None:
+        """Affiche la durée cumulée des phases directement sous `parent`."""
+        phases = {}
+        for span in self.spans:
+            if span["parent"] == parent:
+                phases[span["name"]] = phases.get(span["name"], 0.0) + (span["end"] - span["start"]) * 1000
+        print("\n⏱️  Durée des phases :")
+        for name, total_ms in phases.items():
+            print(f"   {name:<16} {total_ms:10.1f} ms")
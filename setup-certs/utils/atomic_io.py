@@ -0,0 +1,267 @@
+from pathlib import Path
+import os
+import stat
+import tempfile
+
+
+def atomic_write_bytes(path: Path, data: bytes, mode: int = 0o644) -> None:
+    """
+    Écrit un fichier de façon atomique (fichier temporaire + fsync + rename).
+
+    Un lecteur (ex: le file watcher SSL d'Elasticsearch) voit soit l'ancien
+    contenu complet, soit le nouveau, jamais un PEM partiel. Si le fichier
+    existe déjà, son mode et son propriétaire sont conservés pour que le
+    remplacement reste lisible par le service qui l'utilise.
+
+    Args:
+        path: Fichier de destination
+        data: Contenu à écrire
+        mode: Permissions d'un nouveau fichier
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    owner = None
+    try:
+        st = path.stat()
+        mode = stat.S_IMODE(st.st_mode)
+        owner = (st.st_uid, st.st_gid)
+    except FileNotFoundError:
+        pass
+
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        os.fchmod(fd, mode)
+        if owner is not None and os.getuid() == 0:
+            os.fchown(fd, *owner)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+STAGING_PREFIX = ".staging-"
+
+# Au-delà de ce nombre de fichiers, un commit fait un sync() global avant et
+# après les renames au lieu d'un fsync par fichier et par dossier
+BATCH_SYNC_THRESHOLD = 256
+
+
+def _fsync_path(path: Path) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def remove_stale_staging(root: Path) -> int:
+    """Supprime les dossiers de staging laissés par un run interrompu."""
+    import shutil
+
+    removed = 0
+    for pattern in (f"{STAGING_PREFIX}*", f"*/{STAGING_PREFIX}*", f"*/*/{STAGING_PREFIX}*"):
+        for staging_dir in root.glob(pattern):
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+class OutputTransaction:
+    """
+    Écriture transactionnelle d'un lot de fichiers (clés, certificats).
+
+    Les fichiers sont préparés dans une arborescence de staging par run, avec
+    leurs permissions finales dès la création. Sous `root`, elle est placée
+    au plus haut dossier du même système de fichiers que la destination
+    (chaque dossier de certs_output peut être un volume Docker distinct) :
+    un run de milliers d'agents n'a qu'un seul dossier de staging. Hors de
+    `root` (ou sans root), le staging est un dossier voisin de la destination.
+
+    Au commit, les fichiers sont mis en place par rename atomique, certificats
+    avant clés privées. Durabilité :
+      - petit lot : fsync de chaque fichier préparé avant les renames, puis
+        un fsync par dossier de destination ; seuls les fichiers de la
+        transaction sont synchronisés (le système de fichiers est partagé
+        avec les données Elasticsearch sous Docker) ;
+      - au-delà de BATCH_SYNC_THRESHOLD fichiers : un sync() avant les
+        renames et un après, au lieu de milliers de fsync.
+
+    Aucun fichier partiel n'est jamais visible. Les renames restent
+    successifs : un rechargement du file watcher SSL d'Elasticsearch entre
+    le rename d'un certificat et celui de sa clé voit le nouveau certificat
+    avec l'ancienne clé. Ce rechargement échoue, Elasticsearch garde alors
+    le contexte SSL précédent, et le rename de la clé déclenche le
+    rechargement suivant, qui réussit.
+
+    Usage:
+        with OutputTransaction(root=Path("certs_output")) as transaction:
+            transaction.write(Path("certs_output/kibana/kibana_cert.pem"), pem, 0o644)
+        # commit à la sortie du bloc, rollback en cas d'exception
+    """
+
+    def __init__(self, transaction_id: str | None = None, root: Path | None = None):
+        """
+        Args:
+            transaction_id: Identifiant partagé avec les workers qui préparent
+                            des fichiers pour cette transaction (généré si None)
+            root: Dossier de sortie sous lequel l'arborescence de staging est partagée
+        """
+        import uuid
+        self.transaction_id = transaction_id or uuid.uuid4().hex
+        self.root = root
+        # destination -> fichier préparé
+        self.staged: dict[Path, Path] = {}
+        # dossier de destination -> dossier de staging (créé au premier usage)
+        self._staging_dirs: dict[Path, Path] = {}
+
+    @property
+    def staging_name(self) -> str:
+        return f"{STAGING_PREFIX}{self.transaction_id}"
+
+    def _staging_dir(self, directory: Path) -> Path:
+        """Dossier de staging des fichiers destinés à `directory`."""
+        staging_dir = self._staging_dirs.get(directory)
+        if staging_dir is not None:
+            return staging_dir
+
+        if self.root is None or not directory.is_relative_to(self.root):
+            staging_dir = directory / self.staging_name
+        else:
+            existing = directory
+            while not existing.exists() and existing != self.root:
+                existing = existing.parent
+            device = existing.stat().st_dev
+            # Remonte tant que le dossier parent est sur le même système de fichiers
+            top = existing
+            while top != self.root and top.parent.stat().st_dev == device:
+                top = top.parent
+            staging_dir = top / self.staging_name / directory.relative_to(top)
+
+        staging_dir.mkdir(parents=True, exist_ok=True)
+        self._staging_dirs[directory] = staging_dir
+        return staging_dir
+
+    def stage_path(self, path: Path, mode: int = 0o644) -> Path:
+        """
+        Crée le fichier préparé (vide, permissions finales) qui remplacera `path`.
+
+        Pour les contenus écrits en flux (ex: archive tar) ; write() couvre
+        le cas d'un contenu déjà en mémoire.
+        """
+        owner = None
+        try:
+            st = path.stat()
+            mode = stat.S_IMODE(st.st_mode)
+            owner = (st.st_uid, st.st_gid)
+        except FileNotFoundError:
+            pass
+
+        staged = self._staging_dir(path.parent) / path.name
+        if path in self.staged:
+            # Même destination préparée deux fois : la dernière écriture l'emporte
+            self.staged.pop(path).unlink()
+        fd = os.open(staged, os.O_WRONLY | os.O_CREAT | os.O_EXCL, mode)
+        try:
+            os.fchmod(fd, mode)  # Indépendant de l'umask
+            if owner is not None and os.getuid() == 0:
+                os.fchown(fd, *owner)
+        finally:
+            os.close(fd)
+
+        self.staged[path] = staged
+        return staged
+
+    def write(self, path: Path, data: bytes, mode: int = 0o644) -> None:
+        """Prépare l'écriture de `data` dans `path` (visible au commit)."""
+        staged = self.stage_path(path, mode)
+        with open(staged, 'wb') as f:
+            f.write(data)
+
+    def adopt(self, staged: list[tuple[Path, Path]]) -> None:
+        """Reprend des fichiers préparés par un worker avec le même transaction_id."""
+        self.staged.update((path, staged_file) for staged_file, path in staged)
+
+    def drain(self) -> list[tuple[Path, Path]]:
+        """Retire et renvoie les fichiers préparés (côté worker, pour adopt)."""
+        staged, self.staged = self.staged, {}
+        return [(staged_file, path) for path, staged_file in staged.items()]
+
+    def _staging_tops(self) -> set[Path]:
+        """Racines des arborescences de staging (fichiers adoptés compris)."""
+        tops = set()
+        for staged in self.staged.values():
+            for parent in staged.parents:
+                if parent.name == self.staging_name:
+                    tops.add(parent)
+                    break
+        return tops
+
+    def commit(self) -> int:
+        """
+        Met en place tous les fichiers préparés.
+
+        Returns:
+            Nombre de fichiers mis en place
+        """
+        import shutil
+
+        staging_tops = self._staging_tops()
+        directories = {path.parent for path in self.staged}
+        batch = len(self.staged) > BATCH_SYNC_THRESHOLD
+
+        if batch:
+            os.sync()
+        else:
+            for staged in self.staged.values():
+                _fsync_path(staged)
+
+        synced_directories = set(directories)
+        for directory in directories:
+            if not directory.exists():
+                directory.mkdir(parents=True, exist_ok=True)
+                synced_directories.add(directory.parent)  # Entrée du nouveau dossier
+        # Clés privées en dernier : voir la docstring de la classe
+        keys = []
+        for path, staged in self.staged.items():
+            if path.name.endswith("_private.pem"):
+                keys.append((path, staged))
+            else:
+                os.replace(staged, path)
+        for path, staged in keys:
+            os.replace(staged, path)
+
+        if batch:
+            os.sync()
+        else:
+            for directory in synced_directories:
+                _fsync_path(directory)
+
+        for staging_top in staging_tops:
+            shutil.rmtree(staging_top, ignore_errors=True)
+
+        count = len(self.staged)
+        self.staged = {}
+        return count
+
+    def rollback(self) -> None:
+        """Abandonne les fichiers préparés : les fichiers en place ne changent pas."""
+        import shutil
+
+        for staging_top in self._staging_tops():
+            shutil.rmtree(staging_top, ignore_errors=True)
+        for staged in self.staged.values():
+            staged.unlink(missing_ok=True)
+        self.staged = {}
+
+    def __enter__(self) -> "OutputTransaction":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.commit()
+        else:
+            self.rollback()
@@ -1,37 +1,292 @@
-import yaml
 from pathlib import Path
-from dataclasses import dataclass
-    
+from typing import Iterator
+import hashlib
+import ipaddress
+import json
+from utils.atomic_io import atomic_write_bytes
+
+# Types de clés supportés (valeurs de key_type dans certs_config.yaml)
+KEY_TYPES = ("rsa", "ecdsa-p256", "ecdsa-p384", "ed25519")
+SERVICE_TYPES = ("server", "client")
+
+# Schéma des champs d'un service : nom -> type Python attendu
+SERVICE_FIELDS = {
+    "type": str,
+    "key_type": str,
+    "key_size": int,
+    "validity_days": int,
+    "dns_names": list,
+    "ip_addresses": list,
+}
+CA_FIELDS = {
+    "common_name": str,
+    "validity_days": int,
+    "key_type": str,
+    "key_size": int,
+    "organization": str,
+    "country": str,
+}
+# Version du format de la configuration validée mise en cache : à incrémenter quand
+# le schéma ou l'expansion changent (le code du module entre aussi dans la clé)
+CONFIG_CACHE_VERSION = 2
+
+# Champs propres à un template (les autres sont les valeurs par défaut partagées)
+TEMPLATE_FIELDS = {
+    "name": str,
+    "range": list,
+}
+
+
+def expand_template(template: dict, defaults: dict | None = None) -> Iterator[tuple[str, dict]]:
+    """
+    Développe un template de services, instance par instance.
+
+    Exemple :
+        name: "es-node-{index:02d}"
+        range: [1, 3]                 # bornes incluses, pas optionnel
+        type: server
+        dns_names: ["{name}.es.local"]
+
+    produit es-node-01, es-node-02, es-node-03. Les chaînes (y compris dans
+    les listes) sont interpolées avec {name} et {index}.
+    """
+    start, end, *step = template["range"]
+    shared = {**(defaults or {}), **{k: v for k, v in template.items() if k not in TEMPLATE_FIELDS}}
+
+    for index in range(start, end + 1, step[0] if step else 1):
+        name = template["name"].format(index=index)
+        yield name, {
+            key: _interpolate(value, name=name, index=index)
+            for key, value in shared.items()
+        }
+
+
+def _interpolate(value, **variables):
+    if isinstance(value, str):
+        return value.format(**variables)
+    if isinstance(value, list):
+        return [_interpolate(item, **variables) for item in value]
+    return value
+
+
+def _check_fields(errors: list[str], where: str, values: dict, fields: dict, allowed_extra: tuple = ()) -> None:
+    for key, value in values.items():
+        if key in allowed_extra:
+            continue
+        if key not in fields:
+            errors.append(f"{where}: champ inconnu '{key}'")
+        elif not isinstance(value, fields[key]) or isinstance(value, bool):
+            errors.append(f"{where}.{key}: {fields[key].__name__} attendu, {type(value).__name__} trouvé")
+
+
+def _check_service(errors: list[str], where: str, service: dict, is_template: bool = False) -> None:
+    _check_fields(errors, where, service, SERVICE_FIELDS, tuple(TEMPLATE_FIELDS) if is_template else ())
+    if not is_template and service.get("type") not in SERVICE_TYPES:
+        errors.append(f"{where}.type: attendu {' ou '.join(SERVICE_TYPES)}, trouvé {service.get('type')!r}")
+    if "key_type" in service and service["key_type"] not in KEY_TYPES:
+        errors.append(f"{where}.key_type: attendu {', '.join(KEY_TYPES)}, trouvé {service['key_type']!r}")
+    if not is_template:
+        for ip in service.get("ip_addresses", []):
+            try:
+                ipaddress.ip_address(ip)
+            except ValueError:
+                errors.append(f"{where}.ip_addresses: adresse invalide {ip!r}")
+
+
+def validate_config(config: dict) -> None:
+    """
+    Valide la configuration contre le schéma des certificats.
+
+    Toutes les erreurs sont collectées puis levées ensemble.
+
+    Raises:
+        ValueError: si la configuration est invalide
+    """
+    errors = []
+
+    if not isinstance(config.get("ca"), dict):
+        errors.append("ca: section manquante ou invalide")
+    else:
+        _check_fields(errors, "ca", config["ca"], CA_FIELDS)
+        if config["ca"].get("key_type", "rsa") not in KEY_TYPES:
+            errors.append(f"ca.key_type: attendu {', '.join(KEY_TYPES)}")
+
+    defaults = config.get("service_defaults") or {}
+    if not isinstance(defaults, dict):
+        errors.append("service_defaults: dictionnaire attendu")
+        defaults = {}
+    else:
+        _check_fields(errors, "service_defaults", defaults, SERVICE_FIELDS)
+
+    services = config.get("services") or {}
+    templates = config.get("service_templates") or []
+    if not isinstance(services, dict):
+        errors.append("services: dictionnaire attendu")
+        services = {}
+    if not isinstance(templates, list):
+        errors.append("service_templates: liste attendue")
+        templates = []
+    if not services and not templates:
+        errors.append("services: aucun service ni template défini")
+
+    names = set()
+    for name, service in services.items():
+        if not isinstance(service, dict):
+            errors.append(f"services.{name}: dictionnaire attendu")
+            continue
+        _check_service(errors, f"services.{name}", {**defaults, **service})
+        names.add(name)
+
+    for i, template in enumerate(templates):
+        where = f"service_templates[{i}]"
+        if not isinstance(template, dict) or "name" not in template or "range" not in template:
+            errors.append(f"{where}: 'name' et 'range' sont obligatoires")
+            continue
+        bounds = template["range"]
+        if not (2 <= len(bounds) <= 3 and all(isinstance(b, int) and not isinstance(b, bool) for b in bounds)):
+            errors.append(f"{where}.range: [début, fin] ou [début, fin, pas] attendu")
+            continue
+        if len(bounds) == 3 and bounds[2] <= 0:
+            errors.append(f"{where}.range: pas strictement positif attendu, trouvé {bounds[2]}")
+            continue
+        _check_service(errors, where, {**defaults, **template}, is_template=True)
+        if {**defaults, **template}.get("type") not in SERVICE_TYPES:
+            errors.append(f"{where}.type: attendu {' ou '.join(SERVICE_TYPES)}")
+
+        # Seuls les noms sont développés ici, pas les configurations
+        start, end, *step = bounds
+        for index in range(start, end + 1, step[0] if step else 1):
+            try:
+                name = template["name"].format(index=index)
+            except (KeyError, ValueError) as e:
+                errors.append(f"{where}.name: gabarit invalide ({e})")
+                break
+            if name in names:
+                errors.append(f"{where}: service '{name}' défini plusieurs fois")
+            names.add(name)
+
+    if errors:
+        raise ValueError("Configuration invalide :\n  - " + "\n  - ".join(errors))
+
 
 class ConfigLoader:
-    def __init__(self, config_path: Path):
+    def __init__(self, config_path: Path, cache_dir: Path | None = None):
+        """
+        Args:
+            config_path: Chemin vers certs_config.yaml
+            cache_dir: Dossier du cache de configuration validée (désactivé si None)
+        """
         self.config_path = config_path
+        self.cache_dir = cache_dir
         self.config = None
+        self._services = None
         self.load_config()
-    
+
     def load_config(self) -> dict:
+        """
+        Charge et valide la configuration.
+
+        Le résultat validé est mis en cache (JSON) sous le hash du fichier et
+        de la version du code de validation : tant que ni certs_config.yaml ni
+        ce module ne changent, ni le YAML ni la validation ne sont refaits.
+        """
         try:
             if not self.config_path.exists() or not self.config_path.is_file():
                 raise FileNotFoundError(f"Le fichier de configuration {self.config_path} est introuvable.")
-            with open(self.config_path, 'r', encoding='utf-8') as file:
-                self.config = yaml.safe_load(file)
+            raw = self.config_path.read_bytes()
+            cache_file = None
+            if self.cache_dir is not None:
+                cache_file = self.cache_dir / f"{self._cache_key(raw)}.json"
+                if cache_file.exists():
+                    self.config = json.loads(cache_file.read_text(encoding='utf-8'))
+                    return self.config
+
+            import yaml  # Import différé : inutile quand le chemin rapide de main.py suffit
+            try:
+                self.config = yaml.safe_load(raw)
+            except yaml.YAMLError as yaml_error:
+                raise Exception(f"Erreur lors du chargement du YAML: {yaml_error}")
             if not isinstance(self.config, dict):
                 raise ValueError("Le fichier de configuration doit contenir un dictionnaire YAML valide.")
+            validate_config(self.config)
+
+            if cache_file is not None:
+                self._write_cache(cache_file)
+            return self.config
         except FileNotFoundError as fnf_error:
             raise fnf_error
-        except yaml.YAMLError as yaml_error:
-            raise Exception(f"Erreur lors du chargement du YAML: {yaml_error}")
         except ValueError as val_error:
             raise val_error
         except Exception as e:
             raise Exception(f"Erreur lors de l'initialisation: {e}")
-    
+
+    @staticmethod
+    def _cache_key(raw: bytes) -> str:
+        digest = hashlib.sha256(f"v{CONFIG_CACHE_VERSION}\0".encode())
+        digest.update(Path(__file__).read_bytes())
+        digest.update(raw)
+        return digest.hexdigest()
+
+    def _write_cache(self, cache_file: Path) -> None:
+        """Écrit le cache et supprime les entrées des versions précédentes."""
+        for old_entry in self.cache_dir.glob("*.json"):
+            if old_entry != cache_file:
+                old_entry.unlink(missing_ok=True)
+        data = json.dumps(self.config, sort_keys=True, default=str)
+        atomic_write_bytes(cache_file, data.encode('utf-8'))
+
     def get_ca_config(self) -> dict[str, str | int]:
         if self.config is None or 'ca' not in self.config:
             raise KeyError("La configuration de l'autorité de certification est manquante.")
         return self.config['ca']
-    
-    def get_services_config(self) -> dict[str, dict[str, str | int]]:
-        if self.config is None or 'services' not in self.config:
+
+    def iter_services(self) -> Iterator[tuple[str, dict]]:
+        """
+        Parcourt les services (nom, configuration) à la demande.
+
+        Services explicites d'abord, puis instances des templates, développées
+        une par une ; service_defaults s'applique à tous.
+        """
+        if self.config is None or ('services' not in self.config and 'service_templates' not in self.config):
             raise KeyError("La configuration des services est manquante.")
-        return self.config['services']
\ No newline at end of file
+        defaults = self.config.get('service_defaults') or {}
+        for name, service in (self.config.get('services') or {}).items():
+            yield name, {**defaults, **service}
+        for template in self.config.get('service_templates') or []:
+            yield from expand_template(template, defaults)
+
+    def iter_service_names(self) -> Iterator[str]:
+        """Noms des services, dans l'ordre de iter_services, sans développer leur configuration."""
+        if self.config is None or ('services' not in self.config and 'service_templates' not in self.config):
+            raise KeyError("La configuration des services est manquante.")
+        yield from self.config.get('services') or {}
+        for template in self.config.get('service_templates') or []:
+            start, end, *step = template["range"]
+            for index in range(start, end + 1, step[0] if step else 1):
+                yield template["name"].format(index=index)
+
+    def get_services_config(self) -> dict[str, dict[str, str | int]]:
+        """Tous les services (templates développés), construits au premier appel."""
+        if self._services is None:
+            self._services = dict(self.iter_services())
+        return self._services
+
+    def get_generation_config(self) -> dict[str, int]:
+        if self.config is None:
+            raise KeyError("La configuration n'est pas chargée.")
+        return self.config.get('generation') or {}
+
+    def get_key_pool_config(self) -> dict[str, str | int | bool]:
+        if self.config is None:
+            raise KeyError("La configuration n'est pas chargée.")
+        return self.config.get('key_pool') or {}
+
+    def get_renewal_config(self) -> dict[str, int]:
+        if self.config is None:
+            raise KeyError("La configuration n'est pas chargée.")
+        return self.config.get('renewal') or {}
+
+    def get_revocation_config(self) -> dict[str, str | int]:
+        if self.config is None:
+            raise KeyError("La configuration n'est pas chargée.")
+        return self.config.get('revocation') or {}
@@ -0,0 +1,272 @@
+from dataclasses import dataclass, field
+from elasticsearch import AsyncElasticsearch, NotFoundError
+import asyncio
+import difflib
+import hashlib
+import json
+import os
+import re
+import tempfile
+
+# Fields the server adds to an action when they are not given: filled on the
+# desired side so that a policy written without them is not seen as changed.
+ACTION_DEFAULTS = {
+    "delete": {"delete_searchable_snapshot": True},
+    "searchable_snapshot": {"force_merge_index": True},
+    "allocate": {"include": {}, "exclude": {}, "require": {}},
+    # 8.14+
+    "shrink": {"allow_write_after_shrink": False},
+    "downsample": {"wait_timeout": "1d"},
+    "migrate": {"enabled": True},
+}
+
+# Server-side metadata returned by GET but never part of what we apply
+SERVER_FIELDS = {"version", "modified_date", "modified_date_millis", "created_date", "created_date_millis", "in_use_by"}
+
+_BYTE_UNITS = {"pb": 1024 ** 5, "tb": 1024 ** 4, "gb": 1024 ** 3, "mb": 1024 ** 2, "kb": 1024, "b": 1}
+_TIME_UNITS = {"d": 86_400_000_000_000, "h": 3_600_000_000_000, "m": 60_000_000_000, "s": 1_000_000_000,
+               "ms": 1_000_000, "micros": 1000, "nanos": 1}
+_BYTE_VALUE = re.compile(r"^(\d+(?:\.\d+)?)\s*(b|kb|mb|gb|tb|pb)$", re.IGNORECASE)
+_TIME_VALUE = re.compile(r"^(\d+)(nanos|micros|ms|s|m|h|d)$")
+
+
+def _largestUnit(amount: int, units: dict[str, int]) -> str:
+    """Largest unit that represents amount exactly: 1024mb -> 1gb, 72h -> 3d."""
+    if amount == 0:
+        return "0"
+    for unit, size in units.items():
+        if amount % size == 0:
+            return f"{amount // size}{unit}"
+    return str(amount)
+
+
+@dataclass
+class Resource:
+    kind: str   # ilm_policy, index_template, component_template, snapshot_repository, slm_policy
+    name: str
+    body: dict
+    # Keys ("kind/name") of resources that must be applied first
+    dependsOn: tuple[str, ...] = field(default=())
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}/{self.name}"
+
+
+def canonical(value, units: bool = True):
+    """
+    Canonical form used for comparison.
+
+    Scalars become strings (settings come back as "1", "true"), and with
+    units=True byte sizes and durations are rewritten in their largest exact
+    unit ("1GB" and "1024mb" both become "1gb", "72h" becomes "3d"). Mappings are compared with units=False: date formats
+    and field values are kept as written.
+    """
+    if value is None:
+        return None
+    if isinstance(value, dict):
+        return {key: canonical(item, units) for key, item in sorted(value.items()) if item is not None}
+    if isinstance(value, list):
+        return [canonical(item, units) for item in value]
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, str) and units:
+        if match := _BYTE_VALUE.match(value):
+            return _largestUnit(int(float(match.group(1)) * _BYTE_UNITS[match.group(2).lower()]), _BYTE_UNITS)
+        if match := _TIME_VALUE.match(value):
+            return _largestUnit(int(match.group(1)) * _TIME_UNITS[match.group(2)], _TIME_UNITS)
+    return str(value)
+
+def flattenSettings(settings: dict, prefix: str = "") -> dict:
+    """{"index": {"lifecycle": {"name": x}}} and {"index.lifecycle.name": x} give the same result."""
+    flat = {}
+    for key, value in settings.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flattenSettings(value, f"{path}."))
+        else:
+            flat[path if path.startswith("index.") else f"index.{path}"] = value
+    return flat
+
+def normalizePolicy(policy: dict) -> dict:
+    phases = {}
+    for phaseName, phase in policy.get("phases", {}).items():
+        actions = {
+            actionName: {**ACTION_DEFAULTS.get(actionName, {}), **(action or {})}
+            for actionName, action in phase.get("actions", {}).items()
+        }
+        phases[phaseName] = {"min_age": phase.get("min_age", "0ms"), "actions": actions}
+    return canonical({"phases": phases, "_meta": policy.get("_meta")})
+
+def _normalizeTemplateBlock(template: dict) -> dict:
+    return {
+        "settings": canonical(flattenSettings(template.get("settings") or {})),
+        "mappings": canonical(template.get("mappings") or {}, units=False),
+        "aliases": canonical(template.get("aliases") or {}),
+    }
+
+def normalizeComponentTemplate(body: dict) -> dict:
+    return {
+        "template": _normalizeTemplateBlock(body.get("template") or {}),
+        "_meta": canonical(body.get("_meta") or {}),
+    }
+
+def normalizeIndexTemplate(body: dict) -> dict:
+    dataStream = body.get("data_stream")
+    if dataStream is not None:
+        dataStream = {"hidden": False, "allow_custom_routing": False, **dataStream}
+    normalized = {
+        **canonical({key: value for key, value in body.items() if key not in ("template", *SERVER_FIELDS)}),
+        "index_patterns": canonical(body.get("index_patterns", [])),
+        "composed_of": canonical(body.get("composed_of") or []),
+        "data_stream": canonical(dataStream),
+        "template": _normalizeTemplateBlock(body.get("template") or {}),
+    }
+    return {key: value for key, value in normalized.items() if value is not None}
+
+async def _getPolicy(es: AsyncElasticsearch, name: str) -> dict:
+    return (await es.ilm.get_lifecycle(name=name))[name]["policy"]
+
+async def _getIndexTemplate(es: AsyncElasticsearch, name: str) -> dict:
+    return (await es.indices.get_index_template(name=name))["index_templates"][0]["index_template"]
+
+async def _getComponentTemplate(es: AsyncElasticsearch, name: str) -> dict:
+    return (await es.cluster.get_component_template(name=name))["component_templates"][0]["component_template"]
+
+async def _getRepository(es: AsyncElasticsearch, name: str) -> dict:
+    return (await es.snapshot.get_repository(name=name))[name]
+
+async def _getSlmPolicy(es: AsyncElasticsearch, name: str) -> dict:
+    return (await es.slm.get_lifecycle(policy_id=name))[name]["policy"]
+
+async def _putPolicy(es: AsyncElasticsearch, name: str, body: dict):
+    await es.ilm.put_lifecycle(name=name, policy=body)
+
+async def _putIndexTemplate(es: AsyncElasticsearch, name: str, body: dict):
+    await es.indices.put_index_template(name=name, body=body)
+
+async def _putComponentTemplate(es: AsyncElasticsearch, name: str, body: dict):
+    await es.cluster.put_component_template(name=name, body=body)
+
+async def _putRepository(es: AsyncElasticsearch, name: str, body: dict):
+    await es.snapshot.create_repository(name=name, repository=body)
+
+async def _putSlmPolicy(es: AsyncElasticsearch, name: str, body: dict):
+    await es.slm.put_lifecycle(policy_id=name, body=body)
+
+# kind -> (get, put, normalize)
+KINDS = {
+    "ilm_policy": (_getPolicy, _putPolicy, normalizePolicy),
+    "index_template": (_getIndexTemplate, _putIndexTemplate, normalizeIndexTemplate),
+    "component_template": (_getComponentTemplate, _putComponentTemplate, normalizeComponentTemplate),
+    "snapshot_repository": (_getRepository, _putRepository, canonical),
+    "slm_policy": (_getSlmPolicy, _putSlmPolicy, canonical),
+}
+
+def resourceHash(resource: Resource) -> str:
+    normalized = KINDS[resource.kind][2](resource.body)
+    return hashlib.sha256(json.dumps([resource.key, normalized], sort_keys=True).encode()).hexdigest()
+
+def diffText(current: dict, desired: dict) -> str:
+    return "".join(difflib.unified_diff(
+        json.dumps(current, indent=2, sort_keys=True).splitlines(keepends=True),
+        json.dumps(desired, indent=2, sort_keys=True).splitlines(keepends=True),
+        fromfile="current", tofile="desired"
+    ))
+
+
+class AppliedStateCache:
+    """
+    Hashes of the last applied resources, per cluster (JSON file).
+
+    A resource whose hash matches is skipped without any request. The cache
+    is keyed by cluster_uuid, so a recreated cluster is fully re-applied;
+    changes made by hand on the same cluster are not detected (use --refresh).
+    """
+
+    def __init__(self, path: str, clusterUuid: str):
+        self.path = path
+        self.clusterUuid = clusterUuid
+        try:
+            with open(path, encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            state = {}
+        self.hashes: dict = state.get(clusterUuid, {}) if isinstance(state, dict) else {}
+
+    def isApplied(self, resource: Resource) -> bool:
+        return self.hashes.get(resource.key) == resourceHash(resource)
+
+    def markApplied(self, resource: Resource):
+        self.hashes[resource.key] = resourceHash(resource)
+
+    def save(self):
+        # Only the current cluster is kept; written atomically (temp file + rename)
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".applied-")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({self.clusterUuid: self.hashes}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+
+async def applyResource(es: AsyncElasticsearch, resource: Resource,
+                        dryRun: bool = False, cache: AppliedStateCache | None = None) -> str:
+    """
+    Apply one resource if it differs from the cluster.
+
+    Returns:
+        "cached", "unchanged", "create" or "update" (planned only in dry-run)
+    """
+    get, put, normalize = KINDS[resource.kind]
+    if cache is not None and not dryRun and cache.isApplied(resource):
+        print(f"   = {resource.key} (cached)")
+        return "cached"
+
+    try:
+        current = normalize(await get(es, resource.name))
+    except NotFoundError:
+        current = None
+    desired = normalize(resource.body)
+
+    if current == desired:
+        action = "unchanged"
+        print(f"   = {resource.key} (unchanged)")
+    else:
+        action = "create" if current is None else "update"
+        print(f"   {'+' if current is None else '~'} {resource.key} ({action}{', planned' if dryRun else ''})")
+        if dryRun:
+            for line in diffText(current or {}, desired).splitlines():
+                print(f"      {line}")
+        else:
+            await put(es, resource.name, resource.body)
+
+    if cache is not None and not dryRun:
+        cache.markApplied(resource)
+    return action
+
+async def applyResources(es: AsyncElasticsearch, resources: list[Resource],
+                         dryRun: bool = False, cache: AppliedStateCache | None = None) -> dict[str, str]:
+    """
+    Apply resources concurrently; a resource only waits for its own
+    dependencies (dependsOn), not for the whole batch.
+
+    Returns:
+        {resource key: action}
+    """
+    tasks: dict[str, asyncio.Task] = {}
+
+    async def applyAfterDependencies(resource: Resource) -> str:
+        # A dependency outside the batch is assumed to exist already
+        await asyncio.gather(*(tasks[key] for key in resource.dependsOn if key in tasks))
+        return await applyResource(es, resource, dryRun, cache)
+
+    for resource in resources:
+        tasks[resource.key] = asyncio.ensure_future(applyAfterDependencies(resource))
+    try:
+        actions = await asyncio.gather(*tasks.values())
+    except BaseException:
+        for task in tasks.values():
+            task.cancel()
+        raise
+    return dict(zip(tasks, actions))
@@ -0,0 +1,184 @@
+"""
+Elasticsearch client factory shared by the setup and ops scripts.
+
+Configuration: defaults < YAML file (ES_CLIENT_CONFIG) < environment.
+
+    ES_HOSTS                  https://elasticsearch:9200 (comma-separated)
+    ES_USERNAME / ELASTIC_PASSWORD
+    ES_CA_CERTS               /app/certs/ca_cert.pem
+    ES_VERIFY_CERTS           true
+    ES_CONNECTIONS_PER_NODE   10
+    ES_KEEP_ALIVE             true
+    ES_HTTP_COMPRESS          false
+    ES_REQUEST_TIMEOUT        30 (seconds)
+    ES_MAX_RETRIES            3
+    ES_RETRY_ON_TIMEOUT       true
+    ES_RETRY_ON_STATUS        429,502,503,504
+    ES_RETRY_BACKOFF          0.5 (seconds, doubled on each consecutive failure)
+    ES_MAX_RETRY_BACKOFF      10
+    ES_SNIFF                  false
+    ES_SNIFF_INTERVAL         60 (seconds)
+
+The file uses the same names in lower case without the prefix
+(hosts, connections_per_node, ...); `password` is read from it too.
+"""
+from dataclasses import dataclass, fields, replace
+from elastic_transport import AiohttpHttpNode, ConnectionError, ConnectionTimeout, Urllib3HttpNode
+from elasticsearch import AsyncElasticsearch, Elasticsearch
+import asyncio
+import os
+import random
+import time
+import yaml
+
+
+@dataclass(frozen=True)
+class ClientConfig:
+    hosts: tuple[str, ...] = ("https://elasticsearch:9200",)
+    username: str = "elastic"
+    password: str = "changeme527"
+    ca_certs: str | None = "/app/certs/ca_cert.pem"
+    verify_certs: bool = True
+    # Pooled connections per node: as many as the concurrent requests of the tool
+    connections_per_node: int = 10
+    keep_alive: bool = True
+    http_compress: bool = False
+    request_timeout: float = 30.0
+    max_retries: int = 3
+    retry_on_timeout: bool = True
+    retry_on_status: tuple[int, ...] = (429, 502, 503, 504)
+    retry_backoff: float = 0.5
+    max_retry_backoff: float = 10.0
+    sniff: bool = False
+    sniff_interval: float = 60.0
+
+
+def _parse(value, default):
+    """Env/YAML value -> type of the default value."""
+    if isinstance(default, bool):
+        return value if isinstance(value, bool) else str(value).strip().lower() in ("1", "true", "yes", "on")
+    if isinstance(default, tuple):
+        items = value if isinstance(value, (list, tuple)) else [item.strip() for item in str(value).split(",") if item.strip()]
+        return tuple(int(item) for item in items) if default and isinstance(default[0], int) else tuple(str(item) for item in items)
+    if isinstance(default, (int, float)):
+        return type(default)(value)
+    return None if value in (None, "") else str(value)
+
+def loadClientConfig(path: str | None = None) -> ClientConfig:
+    """Defaults, then the YAML file (`path` or ES_CLIENT_CONFIG), then the environment."""
+    defaults = ClientConfig()
+    values = {}
+    path = path or os.getenv("ES_CLIENT_CONFIG")
+    if path:
+        with open(path, encoding="utf-8") as f:
+            fileValues = yaml.safe_load(f) or {}
+        unknown = set(fileValues) - {field.name for field in fields(ClientConfig)}
+        if unknown:
+            raise ValueError(f"{path}: unknown client option(s): {', '.join(sorted(unknown))}")
+        values.update(fileValues)
+
+    for field in fields(ClientConfig):
+        envName = "ELASTIC_PASSWORD" if field.name == "password" else f"ES_{field.name.upper()}"
+        if os.getenv(envName):  # empty (VAR= in .env) = not set
+            values[field.name] = os.environ[envName]
+    return replace(defaults, **{name: _parse(value, getattr(defaults, name)) for name, value in values.items()})
+
+
+class _Backoff:
+    """
+    Consecutive failures of one node and the delay before its next request.
+
+    The transport retries right away, on the same node when it is the only
+    one: waiting here spaces the retries (exponential, full jitter).
+    """
+
+    def __init__(self, config: ClientConfig):
+        self.config = config
+        self.failures = 0
+
+    def delay(self) -> float:
+        if not self.failures:
+            return 0
+        return random.uniform(0, min(self.config.max_retry_backoff, self.config.retry_backoff * 2 ** (self.failures - 1)))
+
+    def record(self, status: int | None = None, error: Exception | None = None):
+        if isinstance(error, ConnectionTimeout):
+            failed = self.config.retry_on_timeout
+        else:
+            failed = isinstance(error, ConnectionError) or status in self.config.retry_on_status
+        self.failures = self.failures + 1 if failed else 0
+
+
+def _backoffNodeClass(config: ClientConfig):
+    class BackoffNode(Urllib3HttpNode):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.backoff = _Backoff(config)
+
+        def perform_request(self, *args, **kwargs):
+            time.sleep(self.backoff.delay())
+            try:
+                response = super().perform_request(*args, **kwargs)
+            except (ConnectionError, ConnectionTimeout) as e:
+                self.backoff.record(error=e)
+                raise
+            self.backoff.record(status=response.meta.status)
+            return response
+
+    return BackoffNode
+
+def _asyncBackoffNodeClass(config: ClientConfig):
+    class AsyncBackoffNode(AiohttpHttpNode):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.backoff = _Backoff(config)
+
+        async def perform_request(self, *args, **kwargs):
+            await asyncio.sleep(self.backoff.delay())
+            try:
+                response = await super().perform_request(*args, **kwargs)
+            except (ConnectionError, ConnectionTimeout) as e:
+                self.backoff.record(error=e)
+                raise
+            self.backoff.record(status=response.meta.status)
+            return response
+
+    return AsyncBackoffNode
+
+def clientOptions(config: ClientConfig) -> dict:
+    """Keyword arguments of Elasticsearch/AsyncElasticsearch for `config`."""
+    options = {
+        "hosts": list(config.hosts),
+        "basic_auth": (config.username, config.password),
+        "connections_per_node": config.connections_per_node,
+        "http_compress": config.http_compress,
+        "request_timeout": config.request_timeout,
+        "max_retries": config.max_retries,
+        "retry_on_timeout": config.retry_on_timeout,
+        "retry_on_status": list(config.retry_on_status),
+        # A failed node leaves the pool for factor * 2^(failures - 1) seconds when others are alive
+        "dead_node_backoff_factor": config.retry_backoff,
+        "max_dead_node_backoff": config.max_retry_backoff,
+    }
+    # TLS options are rejected for http:// hosts
+    if any(host.startswith("https://") for host in config.hosts):
+        options["verify_certs"] = config.verify_certs
+        if config.verify_certs:
+            options["ca_certs"] = config.ca_certs
+        else:
+            options["ssl_show_warn"] = False
+    if not config.keep_alive:
+        # HTTP/1.1 connections are persistent by default: only opt out
+        options["headers"] = {"connection": "close"}
+    if config.sniff:
+        # publish_address of the nodes must be reachable and covered by their certificate
+        options.update(sniff_on_start=True, sniff_on_node_failure=True, min_delay_between_sniffing=config.sniff_interval)
+    return options
+
+def createClient(config: ClientConfig | None = None) -> Elasticsearch:
+    config = config or loadClientConfig()
+    return Elasticsearch(**clientOptions(config), node_class=_backoffNodeClass(config))
+
+def createAsyncClient(config: ClientConfig | None = None) -> AsyncElasticsearch:
+    config = config or loadClientConfig()
+    return AsyncElasticsearch(**clientOptions(config), node_class=_asyncBackoffNodeClass(config))
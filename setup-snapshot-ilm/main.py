@@ -1,128 +1,298 @@
-from  elasticsearch import Elasticsearch
+from elasticsearch import AsyncElasticsearch, ApiError, TransportError
+from apply_engine import AppliedStateCache, Resource, applyResources
+from es_client import createAsyncClient
+from pathlib import Path
+from policy_builder import buildPolicies, loadPolicies
+from sizing_advisor import DEFAULT_MIN_SHARD_SIZE, DEFAULT_TARGET_SHARD_SIZE, adviseSizing
+import argparse
+import asyncio
 import os
+import random
 import time
 import sys
 
+# path.repo of the elasticsearch service (elasticsearch_snapshots volume)
+SNAPSHOT_REPOSITORY_PATH = "/usr/share/elasticsearch/snapshots"
+# Licenses that include searchable snapshots (the frozen phase)
+SEARCHABLE_SNAPSHOT_LICENSES = {"trial", "enterprise"}
 
-def ilmHotPhase(body: dict, maxSize: str = "1GB", maxAge: str = "3d"):
-    body["phases"]["hot"] = {
-        "min_age": "0ms",
-        "actions": {
-            "rollover": {
-                "max_size": maxSize,
-                "max_age": maxAge
-            },
-            "set_priority": {
-                "priority": 100
-            }
-        }
-    }
 
-def ilmFrozen(body: dict, freezeAfter: str = "2d"):
-    body["phases"]["frozen"] = {
-        "min_age": freezeAfter,
-        "actions": {
-            "searchable_snapshot": {},
-            "set_priority": {
-                "priority": 20
-            }
-        }
+def snapshotRepository(repositoryName: str = "elk-snapshots",
+                       location: str = SNAPSHOT_REPOSITORY_PATH,
+                       maxSnapshotBytesPerSec: str = "40mb",
+                       maxRestoreBytesPerSec: str = "100mb",
+                       chunkSize: str | None = None) -> Resource:
+    """
+    Shared filesystem repository on path.repo.
+
+    The throughput limits are per node: they keep snapshots and restores
+    (including searchable snapshot mounts) from starving ingest disk I/O.
+    """
+    settings = {
+        "location": location,
+        "compress": True,
+        "max_snapshot_bytes_per_sec": maxSnapshotBytesPerSec,
+        "max_restore_bytes_per_sec": maxRestoreBytesPerSec,
     }
+    if chunkSize:
+        settings["chunk_size"] = chunkSize
+    return Resource("snapshot_repository", repositoryName, {"type": "fs", "settings": settings})
 
-def deletePhase(body: dict, deleteAfter: str = "3d"):
-    body["phases"]["delete"] = {
-        "min_age": deleteAfter,
-        "actions": {
-            "delete": {}
+def slmPolicy(slmName: str = "nightly-snapshots",
+              repository: str = "elk-snapshots",
+              schedule: str = "0 30 1 * * ?",
+              expireAfter: str = "30d",
+              minCount: int = 5,
+              maxCount: int = 50) -> Resource:
+    slm_body = {
+        "name": "<nightly-snap-{now/d}>",
+        "schedule": schedule,
+        "repository": repository,
+        "config": {
+            "indices": ["*"],
+            "include_global_state": True
+        },
+        "retention": {
+            "expire_after": expireAfter,
+            "min_count": minCount,
+            "max_count": maxCount
         }
     }
+    return Resource("slm_policy", slmName, slm_body, (f"snapshot_repository/{repository}",))
 
-def ilmPolicy(es: Elasticsearch, 
-              hotPhase: bool = True,
-              deletePhase: bool = True, 
-              freezePhase: bool = True,
-              policyName: str = "snapshot-ilm-policy"):
-    
-    policy_body = {
-        "policy": {
-            "phases": {
+async def waitForElasticsearch(es: AsyncElasticsearch,
+                               timeout: int = 60,
+                               waitForStatus: str = "yellow",
+                               baseDelay: float = 0.5,
+                               maxDelay: float = 8.0) -> bool:
+    """
+    Wait until the cluster reaches `waitForStatus`.
 
-            }
-        }
-    }
-    if hotPhase:
-        ilmHotPhase(policy_body["policy"])
-    if freezePhase:
-        ilmFrozen(policy_body["policy"])
-    if deletePhase:
-        deletePhase(policy_body["policy"])
-    es.ilm.put_lifecycle(policy=policyName, body=policy_body)
-    print(f"✅ ILM Policy '{policyName}' created with phases: {list(policy_body['policy']['phases'].keys())}")
-
-def waitForElasticsearch(es: Elasticsearch, timeout: int = 60):
-    start_time = time.time()
+    Once a node answers, cluster.health holds the request server-side and
+    returns as soon as the status is reached, so there is no blind sleep.
+    Between failed attempts, the delay grows exponentially with full jitter
+    (random between 0 and the current cap).
+    """
+    deadline = time.monotonic() + timeout
+    attempt = 0
     while True:
+        remaining = deadline - time.monotonic()
+        pollTimeout = max(1, int(min(remaining, 10)))
         try:
-            print(f"Attempting to connect to Elasticsearch...")
-            info = es.info()
-            print(f"✅ Elasticsearch is reachable! Cluster: {info['cluster_name']}, Version: {info['version']['number']}")
-            return True
-        except Exception as e:
+            # 408 = wait_for_status not reached within pollTimeout: the body still says why.
+            # No transport retries: this loop already retries, with its own deadline
+            health = await es.options(request_timeout=pollTimeout + 5, ignore_status=408, max_retries=0).cluster.health(
+                wait_for_status=waitForStatus, timeout=f"{pollTimeout}s")
+            if not health["timed_out"]:
+                print(f"✅ Elasticsearch is {health['status']}! Cluster: {health['cluster_name']}, Nodes: {health['number_of_nodes']}")
+                return True
+            print(f"⏳ Cluster status is '{health['status']}', waiting for '{waitForStatus}'...")
+        except (ApiError, TransportError) as e:
             print(f"⏳ Error connecting: {type(e).__name__}: {str(e)[:200]}. Retrying...")
-        
-        if time.time() - start_time > timeout:
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
             print("❌ Timeout waiting for Elasticsearch.")
             return False
-        
-        time.sleep(2)
 
-def createClient() -> Elasticsearch:
-    try:
-        es = Elasticsearch(
-            hosts=["https://elasticsearch:9200"],
-            basic_auth=('elastic', os.getenv('ELASTIC_PASSWORD', "changeme527")),
-            verify_certs=True,
-            ca_certs='/app/certs/ca_cert.pem')
-        return es
-    except Exception as e:
-        raise e
+        delay = random.uniform(0, min(maxDelay, baseDelay * 2 ** attempt))
+        attempt += 1
+        await asyncio.sleep(min(delay, remaining))
+
+async def searchableSnapshotsEnabled(es: AsyncElasticsearch, mode: str = "auto") -> bool:
+    """
+    mode: "on", "off", or "auto": on only when the cluster license includes
+    searchable snapshots. ES rejects a policy with a searchable_snapshot
+    action otherwise, and Logstash waits for this bootstrap to succeed.
+    """
+    if mode != "auto":
+        return mode == "on"
+    license = (await es.license.get())["license"]
+    if license["type"] in SEARCHABLE_SNAPSHOT_LICENSES and license["status"] == "active":
+        return True
+    print(f"ℹ️  '{license['type']}' license: searchable snapshots unavailable, "
+          "searchable_snapshot actions (frozen phase) are left out of the ILM policies")
+    return False
 
-def ilmTemplate(es: Elasticsearch, policyName: str = "snapshot-ilm-policy", 
-                templateName: str = "snapshot-ilm-template", 
-                aliasName: str = "snapshot-ilm-alias",
-                pattern: str = "snapshot-ilm-*"):
+def componentSettings(componentName: str = "logs-elk@settings",
+                      policyName: str = "snapshot-ilm-policy",
+                      numberOfShards: int = 1,
+                      numberOfReplicas: int = 0) -> Resource:
+    component_body = {
+        "template": {
+            "settings": {
+                "number_of_shards": numberOfShards,
+                "number_of_replicas": numberOfReplicas,
+                # Data streams roll over on their own: no rollover_alias
+                "index.lifecycle.name": policyName
+            }
+        },
+        "_meta": {"managed_by": "setup-snapshot-ilm"}
+    }
+    return Resource("component_template", componentName, component_body)
+
+def componentMappings(componentName: str = "logs-elk@mappings") -> Resource:
+    component_body = {
+        "template": {
+            "mappings": {
+                # Strings as keyword only: no text + keyword multi-field per string
+                "dynamic_templates": [
+                    {
+                        "strings_as_keyword": {
+                            "match_mapping_type": "string",
+                            "mapping": {"type": "keyword", "ignore_above": 1024}
+                        }
+                    }
+                ],
+                "properties": {
+                    "@timestamp": {"type": "date"},
+                    "message": {"type": "match_only_text"},
+                    "data_stream": {
+                        "properties": {
+                            "type": {"type": "constant_keyword"},
+                            "dataset": {"type": "constant_keyword"},
+                            "namespace": {"type": "constant_keyword"}
+                        }
+                    }
+                }
+            }
+        },
+        "_meta": {"managed_by": "setup-snapshot-ilm"}
+    }
+    return Resource("component_template", componentName, component_body)
+
+def dataStreamTemplate(templateName: str = "logs-elk",
+                       pattern: str = "logs-elk-*",
+                       componentNames: tuple[str, ...] = ("logs-elk@settings", "logs-elk@mappings"),
+                       customComponent: str = "logs-elk@custom") -> Resource:
     template_body = {
         "index_patterns": [pattern],
-        "settings": {
-            "number_of_shards": 1,
-            "number_of_replicas": 0,
-            "index.lifecycle.name": policyName,
-            "index.lifecycle.rollover_alias": aliasName
-        },
-        "aliases": {
-            aliasName: {}
-        }
+        "data_stream": {},
+        # Above the built-in "logs" template (logs-*-*, priority 100)
+        "priority": 200,
+        # The @custom component is optional: local overrides, applied last
+        "composed_of": [*componentNames, customComponent],
+        "ignore_missing_component_templates": [customComponent],
+        "_meta": {"managed_by": "setup-snapshot-ilm"}
     }
-    es.indices.put_index_template(name=templateName, body=template_body)
-    print(f"✅ ILM Template '{templateName}' created for indices matching '{pattern}' with alias '{aliasName}'")
+    # ES rejects an index template whose (non optional) components do not exist
+    return Resource("index_template", templateName, template_body,
+                    tuple(f"component_template/{name}" for name in componentNames))
+
+async def createDataStream(es: AsyncElasticsearch, dataStreamName: str = "logs-elk-default", dryRun: bool = False):
+    """
+    Create the data stream up front (Logstash would create it on first write)
+    so that it is ready, and measurable by the sizing advisor, before ingest starts.
+    """
+    if dryRun:
+        if await es.indices.exists(index=dataStreamName):
+            print(f"   = data_stream/{dataStreamName} (exists)")
+        else:
+            print(f"   + data_stream/{dataStreamName} (create, planned)")
+        return
+    # Create directly instead of exists() + create(): one round trip, and no race between two runs
+    response = await es.options(ignore_status=400).indices.create_data_stream(name=dataStreamName)
+    if response.body.get("acknowledged"):
+        print(f"✅ Data stream '{dataStreamName}' created")
+    elif response.body.get("error", {}).get("type") == "resource_already_exists_exception":
+        print(f"ℹ️  Data stream '{dataStreamName}' already exists")
+    else:
+        raise RuntimeError(f"Data stream '{dataStreamName}' creation failed: {response.body.get('error')}")
+
+async def bootstrap(policiesFile: Path, dryRun: bool = False, refresh: bool = False, sizing: str = "off",
+                    targetShardSize: str = DEFAULT_TARGET_SHARD_SIZE,
+                    minShardSize: str = DEFAULT_MIN_SHARD_SIZE,
+                    searchableSnapshots: str = "auto") -> bool:
+    # Validated before waiting for the cluster: a broken file fails fast
+    policies = loadPolicies(policiesFile)
+    policyName = policies["data_stream_policy"]
+    # Logstash writes to logs-elk-default (data_stream_dataset/namespace in logstash.conf)
+    templateName = "logs-elk"
+    dataStreamName = "logs-elk-default"
+    repositoryName = os.getenv("SNAPSHOT_REPOSITORY", "elk-snapshots")
+
+    es = createAsyncClient()
+    try:
+        if not await waitForElasticsearch(es, waitForStatus=os.getenv("ES_WAIT_FOR_STATUS", "yellow")):
+            return False
+        healthyAt = time.perf_counter()
+
+        cache = None
+        if not dryRun:
+            # Keyed by cluster_uuid: a recreated cluster does not reuse the hashes of the old one
+            clusterUuid = (await es.info())["cluster_uuid"]
+            cache = AppliedStateCache(os.path.join(os.getenv("ILM_STATE_DIR", "/app/state"), "applied.json"), clusterUuid)
+            if refresh:
+                cache.hashes.clear()
+
+        frozen = await searchableSnapshotsEnabled(es, searchableSnapshots)
+
+        rollovers, shards, replicas = {}, 1, 0
+        if sizing != "off":
+            advice = await adviseSizing(es, dataStreamName, targetShardSize=targetShardSize, minShardSize=minShardSize)
+            if advice is None:
+                print(f"ℹ️  No data in '{dataStreamName}' yet, keeping the default sizing")
+            else:
+                advice.printReport()
+                if sizing == "apply":
+                    rollovers[policyName] = advice.rollover()
+                    shards, replicas = advice.numberOfShards, advice.numberOfReplicas
+
+        # Resources are applied concurrently, each one only waits for its own
+        # dependencies: the ILM and SLM policies wait for the repository, the
+        # index template for its component templates. Components only reference
+        # the ILM policy by name and start right away.
+        print("📋 Dry run, planned changes:" if dryRun else "📋 Applying resources:")
+        actions = await applyResources(es, [
+            snapshotRepository(repositoryName,
+                               maxSnapshotBytesPerSec=os.getenv("SNAPSHOT_MAX_SNAPSHOT_BYTES_PER_SEC", "40mb"),
+                               maxRestoreBytesPerSec=os.getenv("SNAPSHOT_MAX_RESTORE_BYTES_PER_SEC", "100mb"),
+                               chunkSize=os.getenv("SNAPSHOT_CHUNK_SIZE")),
+            slmPolicy(repository=repositoryName,
+                      schedule=os.getenv("SLM_SCHEDULE", "0 30 1 * * ?"),
+                      expireAfter=os.getenv("SLM_EXPIRE_AFTER", "30d")),
+            *buildPolicies(policies, repositoryName, rollovers, searchableSnapshots=frozen),
+            componentSettings(policyName=policyName, numberOfShards=shards, numberOfReplicas=replicas),
+            componentMappings(),
+            dataStreamTemplate(templateName),
+        ], dryRun=dryRun, cache=cache)
+        # The data stream must be created after its template to pick up its settings
+        await createDataStream(es, dataStreamName, dryRun=dryRun)
+
+        if cache is not None:
+            cache.save()
+        if dryRun:
+            return True
+        changed = sum(action in ("create", "update") for action in actions.values())
+        print(f"✅ {changed} resource(s) changed, {len(actions) - changed} already up to date")
+        print(f"🚀 Ingest ready {time.perf_counter() - healthyAt:.2f}s after the cluster became healthy")
+        return True
+    finally:
+        await es.close()
 
 def main():
+    parser = argparse.ArgumentParser(description="Bootstrap ILM policies, templates and indices")
+    parser.add_argument("--policies", type=Path,
+                        default=Path(os.getenv("ILM_POLICIES_FILE", Path(__file__).with_name("ilm_policies.yaml"))),
+                        help="Declarative ILM policies (YAML)")
+    parser.add_argument("--dry-run", action="store_true", help="Show the plan and diffs without applying")
+    parser.add_argument("--refresh", action="store_true", help="Ignore the applied-state cache: compare every resource with the cluster")
+    parser.add_argument("--sizing", choices=["off", "advise", "apply"], default=os.getenv("ILM_SIZING", "off"),
+                        help="Shard/rollover sizing from observed ingest: print it (advise) or use it (apply)")
+    parser.add_argument("--target-shard-size", default=os.getenv("ILM_TARGET_SHARD_SIZE", DEFAULT_TARGET_SHARD_SIZE),
+                        help="Upper edge of the primary shard size band")
+    parser.add_argument("--min-shard-size", default=os.getenv("ILM_MIN_SHARD_SIZE", DEFAULT_MIN_SHARD_SIZE),
+                        help="Lower edge of the primary shard size band")
+    parser.add_argument("--searchable-snapshots", choices=["auto", "on", "off"],
+                        default=os.getenv("ILM_SEARCHABLE_SNAPSHOTS", "auto"),
+                        help="Keep searchable_snapshot actions (frozen phase): auto = when the license allows them")
+    args = parser.parse_args()
+
     try:
-        policyName = "snapshot-ilm-policy"
-        templateName = "snapshot-ilm-template"
-        aliasName = "snapshot-ilm-alias"
-        pattern = "snapshot-ilm-*"
-        
-        es = createClient()
-        if es is not None and waitForElasticsearch(es):
-            ilmPolicy(es, policyName=policyName)
-            ilmTemplate(es, policyName=policyName, templateName=templateName, aliasName=aliasName, pattern=pattern)
-            ilmBootstrapIndex = "snapshot-ilm-000001"
-            if not es.indices.exists(index=ilmBootstrapIndex):
-                es.indices.create(index=ilmBootstrapIndex, aliases={aliasName: {"is_write_index": True}})
-                print(f"✅ Bootstrap index '{ilmBootstrapIndex}' created with alias '{aliasName}'")
-        else:
-            print("Failed to create Elasticsearch client.")
+        if not asyncio.run(bootstrap(args.policies, dryRun=args.dry_run, refresh=args.refresh, sizing=args.sizing,
+                                     targetShardSize=args.target_shard_size, minShardSize=args.min_shard_size,
+                                     searchableSnapshots=args.searchable_snapshots)):
+            print("Failed to bootstrap Elasticsearch.")
             sys.exit(1)
 
     except Exception as e:
@@ -130,4 +300,4 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,308 @@
+"""
+Derive a compact mapping from sampled documents.
+
+Samples documents from an index/data stream or an NDJSON file, infers a
+type per field (keyword vs text, numeric types, dates, ips) and emits a
+component template (logs-elk@custom by default, the optional component of
+the logs-elk index template) with throughput-oriented settings.
+
+With --index, _field_usage_stats tells which fields were never searched
+(index: false) or never aggregated/sorted (doc_values: false).
+
+Usage:
+    uv run mapping_optimizer.py --ndjson sample.ndjson --output custom.json
+    uv run mapping_optimizer.py --index logs-elk-default --usage --apply
+"""
+from apply_engine import Resource, applyResources
+from datetime import datetime
+from elasticsearch import AsyncElasticsearch
+from es_client import createAsyncClient
+from main import componentMappings
+import argparse
+import asyncio
+import ipaddress
+import json
+import random
+import re
+import sys
+import warnings
+
+
+# Strings longer than this, or with several words, are full-text
+TEXT_MIN_LENGTH = 64
+TEXT_MIN_WORDS = 4
+KEYWORD_IGNORE_ABOVE = 1024
+
+_DATE_VALUE = re.compile(r"^\d{4}-\d{2}-\d{2}(T\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[+-]\d{2}:?\d{2})?)?$")
+
+
+def mappedFields(properties: dict, prefix: str = "") -> set[str]:
+    """Dotted names of the leaf fields of a "properties" tree."""
+    fields = set()
+    for name, mapping in properties.items():
+        path = f"{prefix}{name}"
+        if "properties" in mapping:
+            fields |= mappedFields(mapping["properties"], f"{path}.")
+        else:
+            fields.add(path)
+    return fields
+
+# Mapped by logs-elk@mappings (@timestamp, message: match_only_text, data_stream.*:
+# constant_keyword). logs-elk@custom is applied after it and would override
+# their type, so they are left out of the generated mapping.
+MANAGED_FIELDS = mappedFields(componentMappings().body["template"]["mappings"]["properties"])
+
+
+def flattenDocument(document: dict, prefix: str = "") -> dict[str, list]:
+    """{"a": {"b": 1}} -> {"a.b": [1]}; arrays contribute each of their values."""
+    fields: dict[str, list] = {}
+
+    def visit(path: str, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                visit(f"{path}.{key}" if path else key, item)
+        elif isinstance(value, list):
+            for item in value:
+                visit(path, item)
+        elif value is not None:
+            fields.setdefault(path, []).append(value)
+
+    visit(prefix, document)
+    return fields
+
+def isDate(value: str) -> bool:
+    if not _DATE_VALUE.match(value):
+        return False
+    try:
+        datetime.fromisoformat(value.replace("Z", "+00:00"))
+        return True
+    except ValueError:
+        return False
+
+def isIp(value: str) -> bool:
+    try:
+        ipaddress.ip_address(value)
+        return True
+    except ValueError:
+        return False
+
+def inferType(values: list) -> dict:
+    """
+    Smallest mapping that accepts every sampled value.
+
+    Mixed types fall back to keyword (any JSON scalar is accepted as a string).
+    Integer types keep a 10x headroom over the sampled range.
+    """
+    if all(isinstance(value, bool) for value in values):
+        return {"type": "boolean"}
+    if all(isinstance(value, int) and not isinstance(value, bool) for value in values):
+        return {"type": "integer" if max(abs(value) for value in values) * 10 < 2 ** 31 else "long"}
+    if all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in values):
+        return {"type": "float" if max(abs(value) for value in values) < 1e37 else "double"}
+    if all(isinstance(value, str) for value in values):
+        if all(isDate(value) for value in values):
+            return {"type": "date"}
+        if all(isIp(value) for value in values):
+            return {"type": "ip"}
+        if any(len(value) > TEXT_MIN_LENGTH or len(value.split()) >= TEXT_MIN_WORDS for value in values):
+            # No scoring or positions needed to search logs: much smaller than text
+            return {"type": "match_only_text"}
+    return {"type": "keyword", "ignore_above": KEYWORD_IGNORE_ABOVE}
+
+def inferFields(documents: list[dict]) -> tuple[dict[str, dict], list[str]]:
+    """
+    Fields of logs-elk@mappings (MANAGED_FIELDS) are not inferred.
+
+    Returns:
+        {dotted field: mapping}, fields seen both as object and as value
+    """
+    samples: dict[str, list] = {}
+    for document in documents:
+        for path, values in flattenDocument(document).items():
+            if path in MANAGED_FIELDS or any(path.startswith(f"{field}.") for field in MANAGED_FIELDS):
+                continue
+            samples.setdefault(path, []).extend(values)
+
+    # "a" as a value and "a.b" elsewhere cannot both be mapped: neither is
+    conflicts = sorted(path for path in samples if any(other.startswith(f"{path}.") for other in samples))
+    fields = {
+        path: inferType(values)
+        for path, values in samples.items()
+        if not any(path == conflict or path.startswith(f"{conflict}.") for conflict in conflicts)
+    }
+    return fields, conflicts
+
+def applyFieldUsage(fields: dict[str, dict], usage: dict[str, dict]) -> list[str]:
+    """
+    Restrict fields according to _field_usage_stats.
+
+    - never searched (no inverted index or points access): index: false
+    - never aggregated or sorted (no doc_values access): doc_values: false
+
+    Returns:
+        Fields that were restricted
+    """
+    restricted = []
+    for path, mapping in fields.items():
+        if path in MANAGED_FIELDS or mapping["type"] == "match_only_text":
+            continue
+        stats = usage.get(path, {})
+        inverted = stats.get("inverted_index", {})
+        changed = False
+        if not (inverted.get("terms") or inverted.get("postings") or stats.get("points")):
+            mapping["index"] = False
+            changed = True
+        if not stats.get("doc_values"):
+            mapping["doc_values"] = False
+            changed = True
+        if changed:
+            restricted.append(path)
+    return restricted
+
+def buildProperties(fields: dict[str, dict]) -> dict:
+    """Dotted fields -> nested "properties" tree."""
+    properties: dict = {}
+    for path, mapping in sorted(fields.items()):
+        node = properties
+        *parents, leaf = path.split(".")
+        for parent in parents:
+            node = node.setdefault(parent, {"properties": {}})["properties"]
+        node[leaf] = mapping
+    return properties
+
+def componentTemplate(fields: dict[str, dict],
+                      dynamic: str = "false",
+                      refreshInterval: str = "30s",
+                      codec: str | None = None,
+                      fieldLimitFactor: int = 2) -> dict:
+    """
+    Component template body.
+
+    dynamic=false keeps unknown fields in _source without mapping them, and
+    the total field limit (observed fields x fieldLimitFactor) caps mapping
+    growth. refresh_interval trades search freshness for indexing throughput.
+    """
+    settings = {
+        "index.refresh_interval": refreshInterval,
+        "index.mapping.total_fields.limit": max(100, len(fields) * fieldLimitFactor),
+    }
+    if codec:
+        settings["index.codec"] = codec
+    return {
+        "template": {
+            "settings": settings,
+            "mappings": {
+                "dynamic": dynamic,
+                "properties": buildProperties(fields)
+            }
+        },
+        "_meta": {"managed_by": "mapping_optimizer"}
+    }
+
+def sampleNdjson(path: str, size: int) -> list[dict]:
+    """Uniform sample of `size` lines (reservoir sampling: one pass, bounded memory)."""
+    sample = []
+    with open(path, encoding="utf-8") as f:
+        for count, line in enumerate(line for line in f if line.strip()):
+            document = json.loads(line)
+            if count < size:
+                sample.append(document)
+            elif (index := random.randint(0, count)) < size:
+                sample[index] = document
+    return sample
+
+async def sampleIndex(es: AsyncElasticsearch, index: str, size: int) -> list[dict]:
+    response = await es.search(
+        index=index,
+        size=size,
+        query={"function_score": {"query": {"match_all": {}}, "random_score": {}}},
+    )
+    return [hit["_source"] for hit in response["hits"]["hits"]]
+
+async def fieldUsage(es: AsyncElasticsearch, index: str) -> dict[str, dict]:
+    """Per-field access counters summed over all shards of all backing indices."""
+    with warnings.catch_warnings():
+        # Technical preview API: handled here by the "no usage recorded" fallback
+        warnings.filterwarnings("ignore", message="This API is in technical preview")
+        response = await es.indices.field_usage_stats(index=index)
+    usage: dict[str, dict] = {}
+
+    def add(target: dict, counters: dict):
+        for key, value in counters.items():
+            if isinstance(value, dict):
+                add(target.setdefault(key, {}), value)
+            elif isinstance(value, int):
+                target[key] = target.get(key, 0) + value
+
+    for name, stats in response.body.items():
+        if name.startswith("_"):
+            continue
+        for shard in stats.get("shards", []):
+            for field, counters in shard["stats"]["fields"].items():
+                add(usage.setdefault(field, {}), counters)
+    return usage
+
+async def optimize(args) -> dict:
+    es = None
+    if args.index:
+        es = createAsyncClient()
+    try:
+        documents = await sampleIndex(es, args.index, args.sample) if args.index else sampleNdjson(args.ndjson, args.sample)
+        if not documents:
+            raise ValueError("no documents to sample")
+        fields, conflicts = inferFields(documents)
+        print(f"🔍 {len(documents)} documents sampled, {len(fields)} fields", file=sys.stderr)
+        for path in conflicts:
+            print(f"   ⚠️  '{path}' is both an object and a value: left unmapped", file=sys.stderr)
+
+        if args.usage:
+            usage = await fieldUsage(es, args.index)
+            if any(stats.get("any") for stats in usage.values()):
+                restricted = applyFieldUsage(fields, usage)
+                print(f"   📉 {len(restricted)} field(s) restricted from _field_usage_stats: {', '.join(restricted)}", file=sys.stderr)
+            else:
+                # No field was ever accessed: the index was not queried yet, not "nothing is useful"
+                print("   ℹ️  No field usage recorded yet: index/doc_values left enabled", file=sys.stderr)
+
+        body = componentTemplate(fields, args.dynamic, args.refresh_interval, args.codec)
+        if args.apply:
+            await applyResources(es, [Resource("component_template", args.name, body)])
+        return body
+    finally:
+        if es is not None:
+            await es.close()
+
+def main():
+    parser = argparse.ArgumentParser(description="Infer a compact mapping from sampled documents")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--index", help="Index or data stream to sample")
+    source.add_argument("--ndjson", help="NDJSON file to sample")
+    parser.add_argument("--sample", type=int, default=1000, help="Number of documents sampled")
+    parser.add_argument("--usage", action="store_true", help="Use _field_usage_stats (--index only)")
+    parser.add_argument("--dynamic", choices=["true", "false", "strict", "runtime"], default="false")
+    parser.add_argument("--refresh-interval", default="30s")
+    parser.add_argument("--codec", choices=["default", "best_compression"], default=None,
+                        help="index.codec (older phases use the forcemerge index_codec of the ILM policy)")
+    parser.add_argument("--name", default="logs-elk@custom", help="Component template name")
+    parser.add_argument("--output", default=None, help="Write the component template JSON to this file")
+    parser.add_argument("--apply", action="store_true", help="Apply the component template (--index only)")
+    args = parser.parse_args()
+    if (args.usage or args.apply) and not args.index:
+        parser.error("--usage and --apply need --index")
+
+    try:
+        body = asyncio.run(optimize(args))
+    except Exception as e:
+        print(f"An error occurred: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    text = json.dumps(body, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"💾 Component template '{args.name}' written to {args.output}", file=sys.stderr)
+    elif not args.apply:
+        print(text)
+
+if __name__ == "__main__":
+    main()
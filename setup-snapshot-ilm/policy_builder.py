@@ -0,0 +1,124 @@
+from apply_engine import Resource
+from pathlib import Path
+import yaml
+
+PHASES = ("hot", "warm", "cold", "frozen", "delete")
+
+# Actions allowed in each phase (Elasticsearch rules)
+PHASE_ACTIONS = {
+    "hot": {"rollover", "set_priority", "forcemerge", "shrink", "readonly", "downsample", "searchable_snapshot", "unfollow"},
+    "warm": {"set_priority", "allocate", "migrate", "readonly", "forcemerge", "shrink", "downsample", "unfollow"},
+    "cold": {"set_priority", "allocate", "migrate", "readonly", "downsample", "searchable_snapshot", "unfollow"},
+    "frozen": {"searchable_snapshot", "unfollow"},
+    "delete": {"wait_for_snapshot", "delete"},
+}
+
+# In the hot phase, these actions need a rollover (they run on the rolled over index)
+NEEDS_ROLLOVER = {"forcemerge", "shrink", "readonly", "downsample", "searchable_snapshot"}
+
+# Shorthand value -> full action body, e.g. `set_priority: 50`, `readonly: true`
+SHORTHANDS = {
+    "set_priority": lambda value: {"priority": value},
+    "forcemerge": lambda value: {"max_num_segments": value},
+    "shrink": lambda value: {"number_of_shards": value},
+    "downsample": lambda value: {"fixed_interval": value},
+    "readonly": lambda value: {},
+    "delete": lambda value: {},
+    "unfollow": lambda value: {},
+}
+
+
+def expandAction(actionName: str, value) -> dict:
+    if isinstance(value, dict):
+        return value
+    if value is None or actionName not in SHORTHANDS:
+        return {}
+    return SHORTHANDS[actionName](value)
+
+def loadPolicies(path: Path) -> dict:
+    """Read and validate the policy file (see ilm_policies.yaml)."""
+    with open(path, encoding="utf-8") as f:
+        spec = yaml.safe_load(f) or {}
+    validatePolicies(spec)
+    return spec
+
+def validatePolicies(spec: dict):
+    """Check every policy; all errors are reported together (ValueError)."""
+    errors = []
+    policies = spec.get("policies")
+    if not isinstance(policies, dict) or not policies:
+        raise ValueError("ilm policies: 'policies' must map policy names to their phases")
+    if spec.get("data_stream_policy") not in policies:
+        errors.append(f"data_stream_policy '{spec.get('data_stream_policy')}' is not a defined policy")
+
+    for policyName, policy in policies.items():
+        phases = (policy or {}).get("phases")
+        if not isinstance(phases, dict) or not phases:
+            errors.append(f"{policyName}: no phases")
+            continue
+        for phaseName, phase in phases.items():
+            where = f"{policyName}.{phaseName}"
+            if phaseName not in PHASES:
+                errors.append(f"{where}: unknown phase (expected one of {', '.join(PHASES)})")
+                continue
+            actions = {name for name in (phase or {}) if name != "min_age"}
+            if not actions:
+                errors.append(f"{where}: no actions")
+            for actionName in sorted(actions - PHASE_ACTIONS[phaseName]):
+                errors.append(f"{where}: action '{actionName}' is not allowed in the {phaseName} phase")
+            if phaseName == "hot" and actions & NEEDS_ROLLOVER and "rollover" not in actions:
+                errors.append(f"{where}: {', '.join(sorted(actions & NEEDS_ROLLOVER))}: only allowed in the hot phase with a rollover")
+        ordered = [phase for phase in PHASES if phase in phases]
+        if ordered != [phase for phase in phases if phase in PHASES]:
+            errors.append(f"{policyName}: phases must be in order {' -> '.join(PHASES)}")
+
+    if errors:
+        raise ValueError("ilm policies:\n  - " + "\n  - ".join(errors))
+
+def buildPolicy(policyName: str,
+                policy: dict,
+                repository: str,
+                rollover: dict | None = None,
+                searchableSnapshots: bool = True) -> Resource:
+    """
+    ILM policy resource from its declarative form.
+
+    searchable_snapshot without snapshot_repository uses `repository`;
+    `rollover` (sizing advisor) replaces the rollover of the hot phase.
+    Without searchableSnapshots (basic license), searchable_snapshot actions
+    are dropped, and so are the phases left without actions (frozen): data
+    goes from the previous phases straight to delete.
+    """
+    phases = {}
+    repositories = set()
+    for phaseName, phase in policy["phases"].items():
+        phase = dict(phase or {})
+        minAge = phase.pop("min_age", "0ms")
+        actions = {actionName: expandAction(actionName, value) for actionName, value in phase.items()}
+        if not searchableSnapshots:
+            actions.pop("searchable_snapshot", None)
+            if not actions:
+                continue
+        if "searchable_snapshot" in actions:
+            actions["searchable_snapshot"] = {"snapshot_repository": repository, **actions["searchable_snapshot"]}
+            repositories.add(actions["searchable_snapshot"]["snapshot_repository"])
+        if rollover and "rollover" in actions:
+            actions["rollover"] = rollover
+        phases[phaseName] = {"min_age": minAge, "actions": actions}
+
+    body = {"phases": phases}
+    if policy.get("_meta"):
+        body["_meta"] = policy["_meta"]
+    # ES rejects a searchable_snapshot action whose repository does not exist
+    return Resource("ilm_policy", policyName, body, tuple(f"snapshot_repository/{name}" for name in sorted(repositories)))
+
+def buildPolicies(spec: dict,
+                  repository: str,
+                  rollovers: dict[str, dict] | None = None,
+                  searchableSnapshots: bool = True) -> list[Resource]:
+    """All the policies of the file, applied together; rollovers: {policy name: rollover}."""
+    rollovers = rollovers or {}
+    return [
+        buildPolicy(policyName, policy, repository, rollovers.get(policyName), searchableSnapshots)
+        for policyName, policy in spec["policies"].items()
+    ]
@@ -0,0 +1,176 @@
+from dataclasses import dataclass, field
+from elasticsearch import AsyncElasticsearch, NotFoundError
+import asyncio
+import math
+import time
+
+GB = 1024 ** 3
+MB = 1024 ** 2
+DAY = 86400
+
+# Elasticsearch guidance: primary shards between 10 and 50 GB
+DEFAULT_TARGET_SHARD_SIZE = "50gb"
+DEFAULT_MIN_SHARD_SIZE = "10gb"
+# Lucene hard limit is ~2.1 billion docs per shard; stay well below
+MAX_DOCS_PER_SHARD = 200_000_000
+# Searchable snapshot mounts (fully and partially mounted)
+SNAPSHOT_MOUNT_PREFIXES = ("restored-", "partial-")
+
+
+def parseBytes(value: str) -> int:
+    units = {"b": 1, "kb": 1024, "mb": MB, "gb": GB, "tb": 1024 * GB}
+    value = value.strip().lower()
+    for unit in ("kb", "mb", "gb", "tb", "b"):
+        if value.endswith(unit):
+            return int(float(value[:-len(unit)]) * units[unit])
+    return int(value)
+
+def formatBytes(amount: float) -> str:
+    """Rounded down to whole GB (or MB below 1 GB): small variations don't change the policy."""
+    if amount >= GB:
+        return f"{int(amount // GB)}gb"
+    return f"{max(1, int(amount // MB))}mb"
+
+def formatAge(seconds: float) -> str:
+    """Rounded up to whole days (or hours below 1 day)."""
+    if seconds >= DAY:
+        return f"{math.ceil(seconds / DAY)}d"
+    return f"{max(1, math.ceil(seconds / 3600))}h"
+
+
+@dataclass
+class SizingAdvice:
+    numberOfShards: int
+    numberOfReplicas: int
+    maxPrimaryShardSize: str
+    maxAge: str
+    maxDocs: int
+    observed: dict = field(default_factory=dict)
+
+    def rollover(self) -> dict:
+        return {
+            "max_primary_shard_size": self.maxPrimaryShardSize,
+            "max_age": self.maxAge,
+            "max_docs": self.maxDocs,
+        }
+
+    def printReport(self):
+        observed = self.observed
+        print(f"📊 Observed on '{observed['target']}': {observed['indices']} hot index(es), "
+              f"{observed['primary_bytes'] / MB:.1f} MB in {observed['docs']} docs over {observed['elapsed_days']:.2f} day(s)")
+        print(f"   Ingest rate: {observed['bytes_per_day'] / MB:.1f} MB/day, {observed['docs_per_day']:.0f} docs/day, "
+              f"{observed['avg_doc_bytes']:.0f} B/doc, {observed['data_nodes']} data node(s)")
+        print(f"💡 Recommended: {self.numberOfShards} primary shard(s), {self.numberOfReplicas} replica(s), "
+              f"rollover at max_primary_shard_size={self.maxPrimaryShardSize}, max_age={self.maxAge}, max_docs={self.maxDocs}")
+        if observed["expected_shard_bytes"] < observed["min_shard_bytes"]:
+            print(f"   ⚠️  Ingest too low to reach {formatBytes(observed['min_shard_bytes'])} per shard "
+                  f"within max_age: shards will stay around {formatBytes(observed['expected_shard_bytes'])}")
+
+
+async def collectStats(es: AsyncElasticsearch, target: str) -> list[dict]:
+    """
+    Primary size, doc count and creation date of each index behind `target`
+    (rollover alias, data stream or pattern) that is still in the hot phase.
+
+    Later phases don't reflect ingest: warm indices are force-merged (and
+    shrunk), cold/frozen ones are mounted from snapshots (`restored-`,
+    `partial-`), so their size is not what was written.
+    """
+    try:
+        stats, indices, explain = await asyncio.gather(
+            es.indices.stats(index=target, metric=["docs", "store"]),
+            es.cat.indices(index=target, format="json", h=["index", "creation.date"]),
+            es.ilm.explain_lifecycle(index=target),
+        )
+    except NotFoundError:
+        return []
+    created = {row["index"]: int(row["creation.date"]) / 1000 for row in indices}
+    # Indices without a policy are never force-merged nor mounted: measured as hot
+    hot = {
+        name for name, lifecycle in explain["indices"].items()
+        if (lifecycle.get("phase") == "hot" if lifecycle.get("managed") else True)
+        and not name.startswith(SNAPSHOT_MOUNT_PREFIXES)
+    }
+    return [
+        {
+            "index": name,
+            "created": created[name],
+            "primary_bytes": index["primaries"]["store"]["size_in_bytes"],
+            "docs": index["primaries"]["docs"]["count"],
+        }
+        for name, index in stats["indices"].items()
+        if name in created and name in hot
+    ]
+
+def computeAdvice(indices: list[dict],
+                  dataNodes: int,
+                  target: str = "",
+                  targetShardSize: str = DEFAULT_TARGET_SHARD_SIZE,
+                  minShardSize: str = DEFAULT_MIN_SHARD_SIZE,
+                  rolloverPeriodDays: float = 1,
+                  maxAgeDays: float = 30,
+                  now: float | None = None) -> SizingAdvice | None:
+    """
+    Size shards so they land between minShardSize and targetShardSize.
+
+    - primary shards: enough for one rollover period of ingest to fit in
+      targetShardSize per shard, at most one per data node
+    - max_age: the rollover period, extended (up to maxAgeDays) when ingest
+      is too low for shards to reach minShardSize in that period
+    - max_primary_shard_size: targetShardSize, the upper edge of the band
+    - max_docs: the same limit expressed with the observed document size
+
+    Returns:
+        None when there is no data to measure yet
+    """
+    docs = sum(index["docs"] for index in indices)
+    primaryBytes = sum(index["primary_bytes"] for index in indices)
+    if not indices or docs == 0:
+        return None
+
+    now = now or time.time()
+    # At least one hour, so that a brand new index doesn't give an absurd rate
+    elapsed = max(now - min(index["created"] for index in indices), 3600)
+    bytesPerDay = primaryBytes / elapsed * DAY
+    avgDocBytes = primaryBytes / docs
+    targetBytes = parseBytes(targetShardSize)
+    minBytes = parseBytes(minShardSize)
+
+    periodBytes = bytesPerDay * rolloverPeriodDays
+    shards = min(max(1, math.ceil(periodBytes / targetBytes)), max(1, dataNodes))
+
+    maxAge = rolloverPeriodDays * DAY
+    if bytesPerDay > 0 and periodBytes / shards < minBytes:
+        maxAge = min(minBytes * shards / bytesPerDay * DAY, maxAgeDays * DAY)
+    expectedShardBytes = min(bytesPerDay * maxAge / DAY / shards, targetBytes)
+
+    docsPerShard = min(int(targetBytes / avgDocBytes), MAX_DOCS_PER_SHARD)
+    # Rounded to 2 significant digits: the recommendation stays stable between runs
+    maxDocs = shards * docsPerShard
+    maxDocs = int(round(maxDocs, 2 - len(str(maxDocs))))
+
+    return SizingAdvice(
+        numberOfShards=shards,
+        numberOfReplicas=min(1, max(0, dataNodes - 1)),
+        maxPrimaryShardSize=formatBytes(targetBytes),
+        maxAge=formatAge(maxAge),
+        maxDocs=maxDocs,
+        observed={
+            "target": target,
+            "indices": len(indices),
+            "docs": docs,
+            "primary_bytes": primaryBytes,
+            "elapsed_days": elapsed / DAY,
+            "bytes_per_day": bytesPerDay,
+            "docs_per_day": docs / elapsed * DAY,
+            "avg_doc_bytes": avgDocBytes,
+            "data_nodes": dataNodes,
+            "expected_shard_bytes": expectedShardBytes,
+            "min_shard_bytes": minBytes,
+        },
+    )
+
+async def adviseSizing(es: AsyncElasticsearch, target: str, **options) -> SizingAdvice | None:
+    """Read _stats/_cat/indices/_ilm/explain for `target` and compute the sizing advice (options: see computeAdvice)."""
+    indices, health = await asyncio.gather(collectStats(es, target), es.cluster.health())
+    return computeAdvice(indices, health["number_of_data_nodes"], target=target, **options)
@@ -1,27 +1,212 @@
+"""
+Connection check and latency/throughput probe for Elasticsearch.
+
+Measures, over a persistent connection pool:
+  - TLS connect time (TCP + handshake), with and without certificate verification
+  - ping / info / search / bulk latency percentiles
+  - throughput of concurrent requests for 1..N workers
+  - request latency with verify_certs on vs off
+
+Usage:
+    uv run test_conn.py                      # full probe, summary table
+    uv run test_conn.py --quick --json       # fewer iterations, JSON on stdout
+    uv run test_conn.py --output probe.json --workers 16
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from datetime import datetime, timezone
 from elasticsearch import Elasticsearch
-import os
+from es_client import ClientConfig, createClient, loadClientConfig
+from urllib.parse import urlparse
+import argparse
+import json
+import socket
 import ssl
+import statistics
+import sys
+import time
+
+PROBE_INDEX = "probe-conn"
+
+
+def createProbeClient(config: ClientConfig, verifyCerts: bool = True, connections: int = 10) -> Elasticsearch:
+    # No retries: a retried request would hide its failure in the latency
+    return createClient(replace(config, verify_certs=verifyCerts, connections_per_node=connections, max_retries=0))
+
+def summarize(durations: list[float]) -> dict:
+    ordered = sorted(durations)
+
+    def percentile(p: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(p * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+        "p50_ms": percentile(0.50),
+        "p90_ms": percentile(0.90),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def timed(operation, iterations: int) -> list[float]:
+    operation()  # warm-up: the pooled connection is opened here, not measured
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        operation()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+def probeTls(host: str, ca: str, iterations: int, verify: bool) -> dict:
+    """New TCP connection + TLS handshake each time (what a client without a pool pays per request)."""
+    url = urlparse(host)
+    context = ssl.create_default_context(cafile=ca if verify else None)
+    if not verify:
+        context.check_hostname = False
+        context.verify_mode = ssl.CERT_NONE
+    tcp, handshake = [], []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        with socket.create_connection((url.hostname, url.port or 443)) as sock:
+            connected = time.perf_counter()
+            with context.wrap_socket(sock, server_hostname=url.hostname) as tls:
+                done = time.perf_counter()
+                version = tls.version()
+        tcp.append(connected - start)
+        handshake.append(done - connected)
+    return {"tls_version": version, "tcp": summarize(tcp), "handshake": summarize(handshake)}
+
+def probeOperations(es: Elasticsearch, iterations: int, bulkSize: int) -> dict:
+    documents = [{"@timestamp": datetime.now(timezone.utc).isoformat(), "message": f"probe {i}", "value": i} for i in range(bulkSize)]
+    bulkBody = [line for document in documents for line in ({"index": {"_index": PROBE_INDEX}}, document)]
+    operations = {
+        "ping": lambda: es.ping(),
+        "info": lambda: es.info(),
+        "bulk": lambda: es.bulk(operations=bulkBody),
+        "search": lambda: es.search(index=PROBE_INDEX, size=10, query={"match": {"message": "probe"}}),
+    }
+    results = {}
+    for name, operation in operations.items():
+        results[name] = summarize(timed(operation, iterations))
+        if name == "bulk":
+            es.indices.refresh(index=PROBE_INDEX)  # the search probe then hits the bulk documents
+    results["bulk"]["docs_per_request"] = bulkSize
+    return results
+
+def probeConcurrency(es: Elasticsearch, maxWorkers: int, requestsPerWorker: int) -> list[dict]:
+    """Search throughput for 1, 2, 4... maxWorkers threads sharing the connection pool."""
+    def worker(_) -> list[float]:
+        return timed(lambda: es.search(index=PROBE_INDEX, size=10, query={"match": {"message": "probe"}}), requestsPerWorker)
+
+    results = []
+    workers = 1
+    while True:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            start = time.perf_counter()
+            durations = [duration for batch in pool.map(worker, range(workers)) for duration in batch]
+            elapsed = time.perf_counter() - start
+        results.append({"workers": workers, "requests_per_second": round(len(durations) / elapsed, 1), **summarize(durations)})
+        if workers >= maxWorkers:
+            return results
+        workers = min(workers * 2, maxWorkers)
+
+def printTable(report: dict):
+    def row(name: str, stats: dict, extra: str = ""):
+        print(f"   {name:<26} {stats['p50_ms']:>9.3f} {stats['p90_ms']:>9.3f} {stats['p99_ms']:>9.3f} {stats['max_ms']:>9.3f}  {extra}")
+
+    print(f"\n📊 Latency (ms) over {report['iterations']} iterations")
+    print(f"   {'':<26} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}")
+    row("tcp connect", report["tls"]["verify"]["tcp"])
+    for mode in ("verify", "no_verify"):
+        tls = report["tls"][mode]
+        row(f"tls handshake ({mode})", tls["handshake"], tls["tls_version"])
+    for name, stats in report["operations"].items():
+        row(name, stats, f"{stats['docs_per_request']} docs" if name == "bulk" else "")
+    row("info (no_verify)", report["no_verify_info"])
+
+    print("\n🚀 Concurrent search throughput")
+    print(f"   {'workers':>7} {'req/s':>10} {'p50':>9} {'p99':>9}")
+    for result in report["concurrency"]:
+        print(f"   {result['workers']:>7} {result['requests_per_second']:>10.1f} {result['p50_ms']:>9.3f} {result['p99_ms']:>9.3f}")
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Elasticsearch connection check and latency/throughput probe")
+    parser.add_argument("--config", default=None, help="Client configuration file (default: ES_CLIENT_CONFIG, see es_client.py)")
+    parser.add_argument("--host", default=None, help="Probed node (default: first configured host)")
+    parser.add_argument("--ca", default=None, help="CA certificate (default: configured ca_certs)")
+    parser.add_argument("--iterations", type=int, default=200, help="Measured requests per operation")
+    parser.add_argument("--workers", type=int, default=8, help="Maximum concurrent workers")
+    parser.add_argument("--bulk-size", type=int, default=100, help="Documents per bulk request")
+    parser.add_argument("--quick", action="store_true", help="20 iterations, at most 4 workers")
+    parser.add_argument("--keep-index", action="store_true", help=f"Keep the '{PROBE_INDEX}' index")
+    parser.add_argument("--json", action="store_true", help="Print the JSON report instead of the table")
+    parser.add_argument("--output", default=None, help="Write the JSON report to this file")
+    args = parser.parse_args()
+    if args.quick:
+        args.iterations, args.workers = 20, min(args.workers, 4)
+    config = loadClientConfig(args.config)
+    # One node: the probe measures a connection, not the load balancing between nodes
+    args.host = args.host or config.hosts[0]
+    args.ca = args.ca or config.ca_certs
+    config = replace(config, hosts=(args.host,), ca_certs=args.ca, sniff=False)
+
+    log = sys.stderr if args.json else sys.stdout
+    print('SSL version:', ssl.OPENSSL_VERSION, file=log)
+    print('Connecting to Elasticsearch...', file=log)
+
+    es = createProbeClient(config, connections=args.workers)
+    try:
+        # Test ping
+        ping_result = es.ping()
+        print(f'Ping result: {ping_result}', file=log)
+
+        # Test info
+        info = es.info()
+        print(f'Connected! Cluster: {info["cluster_name"]}', file=log)
+        print(f'Version: {info["version"]["number"]}', file=log)
+
+        print("⏱️  Probing...", file=log)
+        report = {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "host": args.host,
+            "cluster": info["cluster_name"],
+            "version": info["version"]["number"],
+            "openssl": ssl.OPENSSL_VERSION,
+            "iterations": args.iterations,
+            "tls": {
+                "verify": probeTls(args.host, args.ca, args.iterations, verify=True),
+                "no_verify": probeTls(args.host, args.ca, args.iterations, verify=False),
+            },
+            "operations": probeOperations(es, args.iterations, args.bulk_size),
+            "concurrency": probeConcurrency(es, args.workers, max(1, args.iterations // 4)),
+        }
+        noVerify = createProbeClient(config, verifyCerts=False)
+        try:
+            report["no_verify_info"] = summarize(timed(lambda: noVerify.info(), args.iterations))
+        finally:
+            noVerify.close()
+    except Exception as e:
+        print(f'Error: {type(e).__name__}: {e}', file=sys.stderr)
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        try:
+            if not args.keep_index:
+                es.options(ignore_status=404).indices.delete(index=PROBE_INDEX)
+        except Exception as e:
+            print(f"⚠️  Could not delete '{PROBE_INDEX}': {e}", file=sys.stderr)
+        es.close()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        printTable(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}", file=log)
+    return 0
 
-print('SSL version:', ssl.OPENSSL_VERSION)
-print('Connecting to Elasticsearch...')
-
-es = Elasticsearch(
-    hosts=["https://elasticsearch:9200"],
-    basic_auth=('elastic', os.getenv('ELASTIC_PASSWORD')),
-    verify_certs=True,
-    ca_certs='/app/certs/ca_cert.pem'
-)
-
-try:
-    # Test ping
-    ping_result = es.ping()
-    print(f'Ping result: {ping_result}')
-    
-    # Test info
-    info = es.info()
-    print(f'Connected! Cluster: {info["cluster_name"]}')
-    print(f'Version: {info["version"]["number"]}')
-except Exception as e:
-    print(f'Error: {type(e).__name__}: {e}')
-    import traceback
-    traceback.print_exc()
+if __name__ == "__main__":
+    sys.exit(main())